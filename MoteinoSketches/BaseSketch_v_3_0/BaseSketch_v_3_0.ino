@@ -0,0 +1,635 @@
+// This is a sketch written for a base. The base is a moteino that acts as a gateway between
+// a PC and other moteinos. It is connected to the PC through a serial port and relays info
+// to and from the radio network.
+
+// The sketch is a mash up between the gateway, struct send and the struct recieve sketches
+// of the moteino library.
+
+// Written by Steinarr
+////////////////////////////////////////////////////////////////////////////////////////////
+/*
+
+  When PC wants to send something it sends (through the serial port):
+      (send2id)(ack_requested)(retries)(seq)(struct)
+      meaning:
+                send2id - to whom should this be sent
+                ack_requested - whether we want an ack back or not
+                retries - amount of retries
+                seq - a sequence number the PC picks, 0 for none
+                struct - the data to be sent
+  if ack_requested (or if seq isn't 0) base responds with:
+      (baseID)(send2id)(ack_received)(rssi)(seq)
+      meaning:
+                baseID - too indicate that we are not receiving anything but rather reporting back
+                rssi - the rssi measured during ack reception
+                send2id - whom we sent to
+                ack_received - if we received an ack or not (always 0 without an ack request)
+                seq - the seq of the frame this is about
+
+
+  when something is received we send (through the serial port):
+      (senderID)(send2id)(rssi)(datalen)(struct)
+      meaning:
+                senderID - who sent this
+                send2id - who ws supposed to receive this
+                rssi - the rssi measured during reception
+                datalen - how many bytes were received (version 2.3 sent all
+                          61 bytes of the radio buffer and no datalen)
+                struct - the data received, only datalen bytes of it
+
+
+  when the PC wants some info from the base it sends:
+      (baseID)
+
+  and the base will respond with:
+      (0xFF)(rssi)(temperature)
+
+      to begin with
+
+
+  The base can send these frames in two ways, the PC picks one with the last
+  byte of the init string:
+      0 - HEX, every byte as two HEX characters and a newline after each frame,
+          the same as version 2.3
+      1 - COBS, the bytes themselves followed by a CRC16 of them (little endian),
+          COBS encoded so that the frame contains no zeros, and then a zero.
+          The CRC is CRC-16/CCITT-FALSE, _crc_xmodem_update() starting at 0xFFFF.
+          An 'X' right after a zero (or as the very first byte) restarts the base,
+          no frame can start with it since no frame is 87 bytes long.
+  The wakeup sign, the init string and "Ready" are always plain lines.
+
+  The byte after that in the init string asks the base to switch
+  to one of the BaudRates below, right after "Ready". The PC then sends
+  BAUD_TEST_LENGTH bytes which the base echoes back and if they came back right the
+  PC sends a 'Y'. If the base gets anything else, or nothing within a second, it
+  goes back to 115200 and the PC will restart it and try a lower baudrate.
+  0 keeps it at 115200, without a test.
+
+  The base reads everything that has arrived between sends and
+  queues up to QUEUE_LENGTH frames, which it sends in order. The PC can therefore
+  have that many frames waiting in the base and tells the reports apart by their seq.
+  If the queue is full the frame is reported as not acked right away.
+
+  Frames without an ack request are reported on as well when they have a seq, once
+  they have been sent, so the PC knows when there is room in the queue.
+*/
+
+
+#define debug(a) //(Serial.print(a))
+
+#include <RFM69.h>
+#include <SPI.h>
+#include <util/crc16.h>
+byte self_id = 0xff; // default but changable through python
+RFM69 radio;
+
+#define PROTOCOL_HEX 0
+#define PROTOCOL_COBS 1
+byte protocol = PROTOCOL_HEX;
+
+const unsigned long BaudRates[] = {115200, 230400, 250000, 500000, 1000000};
+#define NOF_BAUDRATES 5
+#define BAUD_TEST_LENGTH 128
+#define BAUD_TEST_TIMEOUT 1000
+
+// Incoming and Outgoing buffers:
+typedef struct {
+  byte x[61];
+} Payload;
+Payload RadioBuffer;
+byte SerialBuffer[67];
+
+// the longest frame is (4 bytes)(61 bytes)(2 bytes of CRC), COBS adds one byte and the zero
+byte CobsBuffer[70];
+byte CobsCounter = 0;
+byte OutBuffer[67];
+byte OutCounter = 0;
+
+typedef struct {
+  byte sender;
+  byte send2;
+  byte rssi;
+} RadioStruct;
+
+typedef struct {
+  byte send2id;
+  bool ack_requested;
+  byte retries;
+  byte seq;
+  byte buffer[61];
+} SerialStruct;
+
+// the frames waiting to be sent, Queue[QueueHead] goes first
+#define QUEUE_LENGTH 4
+SerialStruct Queue[QUEUE_LENGTH];
+byte QueueLen[QUEUE_LENGTH]; // how many bytes of the buffer are used
+byte QueueHead = 0;
+byte QueueCount = 0;
+
+RadioStruct r;
+
+void setup()
+{ // Setup runs once
+  Serial.begin(115200);
+  delay(10);
+  Serial.println("moteinopy basesketch v3.0");
+  byte buff[50] = {0};
+  byte i = 0;
+  bool first_hex_done = false;
+  char first_hex = 0;
+  while (i < 50)
+  {
+    if (Serial.available())
+    {
+      byte in = Serial.read();
+      if (in == '\n')
+      {
+        break;
+      }
+      else if (in == 'X')
+      {
+        asm volatile ("  jmp 0");
+      }
+      else if (isHexCharacter(in))
+      {
+        if (first_hex_done)
+        {
+          buff[i] = first_hex * 16 + hexval(in);
+          i++;
+        }
+        else
+        {
+          first_hex = hexval(in);
+        }
+        first_hex_done = !first_hex_done;
+      }
+    }
+  }
+  typedef struct {
+    byte frequency;
+    byte base_id;
+    byte network_id;
+    bool high_power;
+    char encryption_key[16];
+    bool promiscous_mode;
+    byte protocol;
+    byte baudrate;
+  } init_struct;
+  init_struct init_info = *(init_struct*)buff;
+
+  self_id = init_info.base_id;
+  protocol = init_info.protocol;
+
+  bool encrypt_key_is_empty = true;
+  for (int i = 0; i < 16; i++)
+  {
+    if (init_info.encryption_key[i] != 0)
+    {
+      encrypt_key_is_empty = false;
+    }
+  }
+
+  radio.initialize(init_info.frequency, init_info.base_id, init_info.network_id);
+  if (init_info.high_power)
+  {
+    radio.setHighPower(); //only for RFM69HW!
+  }
+  if (!encrypt_key_is_empty)
+  {
+    radio.encrypt(init_info.encryption_key);
+  }
+  radio.promiscuous(init_info.promiscous_mode);
+  digitalWrite(9, HIGH);
+  delay(25);
+  Serial.println("Ready");
+  digitalWrite(9, LOW);
+  if (init_info.baudrate > 0 && init_info.baudrate < NOF_BAUDRATES)
+  {
+    switchBaudrate(BaudRates[init_info.baudrate]);
+  }
+}
+
+void switchBaudrate(unsigned long baudrate)
+{
+  Serial.flush(); // "Ready" goes out at the old baudrate
+  Serial.begin(baudrate);
+
+  // echo the test pattern back
+  byte n = 0;
+  unsigned long t = millis();
+  while (n < BAUD_TEST_LENGTH && millis() - t < BAUD_TEST_TIMEOUT)
+  {
+    if (Serial.available())
+    {
+      Serial.write(Serial.read());
+      n++;
+    }
+  }
+
+  // and stay only if the PC says it came back right
+  t = millis();
+  while (n == BAUD_TEST_LENGTH && millis() - t < BAUD_TEST_TIMEOUT)
+  {
+    if (Serial.available())
+    {
+      if (Serial.read() == 'Y')
+      {
+        return;
+      }
+      break;
+    }
+  }
+  Serial.flush();
+  Serial.begin(BaudRates[0]);
+}
+// Global variables to recieve incoming serial messages
+char FirstHex;
+boolean FirstHexDone = 0;
+byte SerialCounter = 0; // Counter keeps count of how many bytes have been recieved.
+byte SerialBufferLen = 0;
+byte datalen = 0;
+
+
+void loop()
+{ //loop runs over and over forever
+  // we want to do 2 thing at once, Listen to the Serial port and the radio. We can't
+  // actually do both at the 'same' time but we can do one and then the other, extremely fast.
+
+  // So, lets first process any serial input:
+  checkOnSerial();
+
+  // and then check on the radio:
+  // The radio is always listening and recieving but doesn't respond on its own,
+  // We have to constantly check if something has been recieved and answer with an ACK
+  checkOnRadio();
+
+  // and then send the next frame in the queue, if there is one
+  sendNext();
+}
+
+void checkOnSerial()
+{
+  // everything that is waiting is read, as long as there is room in the queue
+  while (Serial.available() > 0 && QueueCount < QUEUE_LENGTH)
+  {
+    if (protocol == PROTOCOL_COBS)
+    {
+      checkOnSerialCobs();
+    }
+    else
+    {
+      checkOnSerialHex();
+    }
+  }
+}
+
+void checkOnSerialHex()
+{
+  char incoming = Serial.read(); // reads one char from the buffer
+  if (incoming == '\n')
+  { // if the line is over
+    handleSerialFrame();
+    SerialCounter = 0;
+  }
+  else if (incoming == 'X')
+  {
+    asm volatile ("  jmp 0");
+  }
+  else if (isHexCharacter(incoming) && SerialCounter < sizeof(SerialBuffer))
+  {
+    // each byte is represented as 2 hex characters
+    if (FirstHexDone)
+    {
+      FirstHexDone = false;
+      SerialBuffer[SerialCounter] = (FirstHex << 4) | hexval(incoming);
+      SerialCounter++;
+    }
+    else
+    {
+      FirstHex = hexval(incoming);
+      FirstHexDone = true;
+    }
+  }
+}
+
+void checkOnSerialCobs()
+{
+  byte incoming = Serial.read();
+  if (incoming == 0)
+  { // the frame is over
+    if (CobsCounter > 0 && cobsDecode() && SerialCounter > 2)
+    {
+      // the last two bytes are the CRC
+      SerialCounter -= 2;
+      uint16_t crc = crc16(SerialBuffer, SerialCounter);
+      if (SerialBuffer[SerialCounter] == lowByte(crc) && SerialBuffer[SerialCounter + 1] == highByte(crc))
+      {
+        handleSerialFrame();
+      }
+    }
+    CobsCounter = 0;
+    SerialCounter = 0;
+  }
+  else if (incoming == 'X' && CobsCounter == 0)
+  {
+    asm volatile ("  jmp 0");
+  }
+  else if (CobsCounter < sizeof(CobsBuffer))
+  {
+    CobsBuffer[CobsCounter] = incoming;
+    CobsCounter++;
+  }
+}
+
+bool cobsDecode()
+{
+  // decodes CobsBuffer into SerialBuffer, returns false if it isn't valid
+  byte i = 0;
+  SerialCounter = 0;
+  while (i < CobsCounter)
+  {
+    byte code = CobsBuffer[i];
+    if (i + code > CobsCounter)
+    {
+      return false;
+    }
+    for (byte j = i + 1; j < i + code; j++)
+    {
+      if (SerialCounter >= sizeof(SerialBuffer))
+      {
+        return false;
+      }
+      SerialBuffer[SerialCounter++] = CobsBuffer[j];
+    }
+    i += code;
+    if (code < 0xFF && i < CobsCounter)
+    {
+      if (SerialCounter >= sizeof(SerialBuffer))
+      {
+        return false;
+      }
+      SerialBuffer[SerialCounter++] = 0;
+    }
+  }
+  return true;
+}
+
+void handleSerialFrame()
+{
+  if ((SerialCounter == 1) && (SerialBuffer[0] == self_id))
+  {
+    printStatus();
+  }
+  else if (SerialCounter >= 4)
+  {
+    enqueue();
+  }
+}
+
+void enqueue()
+{
+  SerialStruct* s = (SerialStruct*)(SerialBuffer);
+  if (QueueCount == QUEUE_LENGTH)
+  {
+    // the PC shouldn't send more than fits, but if it does it hears about it
+    if (s->ack_requested || s->seq != 0)
+    {
+      report(s->send2id, false, s->seq);
+    }
+    return;
+  }
+  byte i = (QueueHead + QueueCount) % QUEUE_LENGTH;
+  byte n = min(SerialCounter, sizeof(SerialStruct));
+  memcpy(&Queue[i], SerialBuffer, n);
+  QueueLen[i] = n - 4;
+  QueueCount++;
+}
+
+void sendNext()
+{
+  if (QueueCount > 0)
+  {
+    sendTheStuff(Queue[QueueHead], QueueLen[QueueHead]);
+    QueueHead = (QueueHead + 1) % QUEUE_LENGTH;
+    QueueCount--;
+  }
+}
+
+void checkOnRadio()
+{
+  if (radio.receiveDone())
+  {
+    // First lets put what we recieved into IncomingData. We have to do this before we
+    // send the ACK because the radio.DATA cache will be overwritten when sending the ACK.
+    RadioBuffer = *(Payload*)radio.DATA;
+    r.sender = radio.SENDERID;
+    r.send2 = radio.TARGETID;
+    r.rssi = rssi();
+    datalen = radio.DATALEN;
+    if (radio.ACKRequested())
+    {
+      radio.sendACK();
+    }
+    printTheStuff();
+  }
+}
+
+void printTheStuff()
+{
+  frameByte(r.sender);
+  frameByte(r.send2);
+  frameByte(r.rssi);
+  frameByte(datalen);
+  for (int i = 0; i < datalen; i++)
+  {
+    frameByte(RadioBuffer.x[i]);
+  }
+  endFrame();
+}
+
+void sendTheStuff(SerialStruct& s, byte len)
+{
+  debug("sending to: ");
+  debug(s.send2id);
+  if (s.ack_requested)
+  {
+    debug("\tAck requeested");
+  }
+  debug("\n");
+
+  if (s.ack_requested)
+  {
+    bool success = radio.sendWithRetry(s.send2id, (const void*)(&s.buffer), len, s.retries, 2000);
+    report(s.send2id, success, s.seq);
+  }
+  else
+  {
+    radio.send(s.send2id, (const void*)(&s.buffer), len);
+    if (s.seq != 0)
+    {
+      report(s.send2id, false, s.seq);
+    }
+  }
+}
+
+void report(byte send2id, bool success, byte seq)
+{
+  frameByte(self_id);
+  frameByte(send2id);
+  frameByte(success);
+  frameByte(rssi());
+  frameByte(seq);
+  endFrame();
+}
+
+
+typedef struct {
+  int rssi;
+  int temp;
+} PrintStatusStruct;
+PrintStatusStruct print_status_struct;
+
+void printStatus()
+{
+  print_status_struct.temp = (int)radio.readTemperature(0);
+  print_status_struct.rssi = radio.readRSSI();
+  byte b[4] = {0};
+  memcpy(b, (const void*)&print_status_struct, 4);
+  frameByte(0xFF);
+  for (int i = 0; i < 4; i++)
+  {
+    frameByte(b[i]);
+  }
+  endFrame();
+}
+
+void frameByte(byte b)
+{
+  // adds a byte to the frame being sent to the PC
+  if (protocol == PROTOCOL_COBS)
+  {
+    OutBuffer[OutCounter++] = b;
+  }
+  else
+  {
+    hexprint(b);
+  }
+}
+
+void endFrame()
+{
+  // ends the frame being sent to the PC
+  if (protocol == PROTOCOL_COBS)
+  {
+    uint16_t crc = crc16(OutBuffer, OutCounter);
+    OutBuffer[OutCounter++] = lowByte(crc);
+    OutBuffer[OutCounter++] = highByte(crc);
+    cobsWrite(OutBuffer, OutCounter);
+    OutCounter = 0;
+  }
+  else
+  {
+    Serial.println();
+  }
+}
+
+void cobsWrite(const byte* data, byte len)
+{
+  // writes data COBS encoded, followed by a zero, to the serial port
+  byte encoded[70];
+  byte code_index = 0;
+  byte n = 1;
+  byte code = 1;
+  for (byte i = 0; i < len; i++)
+  {
+    if (data[i] == 0)
+    {
+      encoded[code_index] = code;
+      code_index = n++;
+      code = 1;
+    }
+    else
+    {
+      encoded[n++] = data[i];
+      code++;
+      if (code == 0xFF)
+      {
+        encoded[code_index] = code;
+        code_index = n++;
+        code = 1;
+      }
+    }
+  }
+  encoded[code_index] = code;
+  encoded[n++] = 0;
+  Serial.write(encoded, n);
+}
+
+uint16_t crc16(const byte* data, byte len)
+{
+  uint16_t crc = 0xFFFF;
+  for (byte i = 0; i < len; i++)
+  {
+    crc = _crc_xmodem_update(crc, data[i]);
+  }
+  return crc;
+}
+
+byte rssi()
+{
+  return radio.RSSI + 0x7F;
+}
+
+bool isHexCharacter(char c)
+{
+  if (c < '0')
+  {
+    return false;
+  }
+  else if (c <= '9')
+  {
+    return true;
+  }
+  else if (c < 'A')
+  {
+    return false;
+  }
+  else if (c <= 'F')
+  {
+    return true;
+  }
+  else if (c < 'a')
+  {
+    return false;
+  }
+  else if (c <= 'f')
+  {
+    return true;
+  }
+  return false;
+}
+
+void hexprint(byte b)
+{
+  if (b < 16)
+  {
+    Serial.print('0');
+  }
+  Serial.print(b, HEX);
+}
+
+byte hexval(char c)
+{
+  if (c <= '9')
+  {
+    return c - '0';
+  }
+  else if (c <= 'F')
+  {
+    return 10 + c - 'A';
+  }
+  else
+  {
+    return 10 + c - 'a';
+  }
+}
@@ -13,8 +13,14 @@ bool promiscuousMode = false; //set to 'true' to sniff all packets on the same n
 
 // Here we define our struct.
 // The radio always sends 64 bytes of data. The RFM69 library uses 3 bytes as a header
-// so that leaves us with 61 bytes. You'll have to fit every peaca of info into 61 bytes
-// since multiple structs to single nodes hasn't been implemented into moteinopy.
+// so that leaves us with 61 bytes. You'll have to fit every peaca of info into 61 bytes.
+// Bitfields, e.g. "byte Mode:3;", can be used to squeeze more in, just declare them
+// the same way in the structstring on the python side.
+// A node can also have several messages (see Node.add_message() in moteinopy), each
+// frame then starts with a type byte followed by that message's struct, e.g.:
+//   typedef struct { byte Type; union { StatusMessage Status; CommandMessage Command; }; } Frame;
+// and only 1 + sizeof(the message) bytes need to be sent. If the node has a struct of
+// its own on the python side as well, that one is type 0.
 typedef struct{
   int Command;
   byte Numbers[8];
@@ -26,6 +32,13 @@ Payload OutgoingData;
 Payload IncomingData;
 byte BaseID = 1;
 
+// Set to true if node.sparse_updates is True on the python side. Then only the
+// parts that were passed to node.send() are sent, after a mask saying which ones.
+#define SPARSE_UPDATES false
+// The sizes of the parts of Payload, in the same order as in Payload.
+const byte PartSizes[] = {sizeof(int), 8*sizeof(byte), sizeof(long)};
+const byte NofParts = sizeof(PartSizes);
+
 // Command values:
 const int Status = 99;
 const int Demo1 = 23;
@@ -67,7 +80,14 @@ void checkOnRadio()
    if (radio.receiveDone())
   {
     // receive the data into IncomingData
-    IncomingData = *(Payload*)radio.DATA;
+    if (SPARSE_UPDATES)
+    {
+      applySparseUpdate((byte*)radio.DATA, radio.DATALEN, (byte*)&IncomingData);
+    }
+    else
+    {
+      IncomingData = *(Payload*)radio.DATA;
+    }
 
     // send ack if requested
     if (radio.ACKRequested())
@@ -93,6 +113,29 @@ void checkOnRadio()
   }
 }
 
+// Copies the parts present in a sparse update, (mask)(present parts), into target.
+// Bit i of the mask says whether the i-th part is present, parts that are not
+// present keep their value.
+void applySparseUpdate(const byte* data, byte datalen, byte* target)
+{
+  byte masklen = (NofParts + 7)/8;
+  byte pos = masklen;
+  byte offset = 0;
+  for (byte i = 0; i < NofParts; i++)
+  {
+    if (data[i/8] & (1 << (i%8)))
+    {
+      if (pos + PartSizes[i] > datalen)
+      {
+        return;  // malformed update
+      }
+      memcpy(target + offset, data + pos, PartSizes[i]);
+      pos += PartSizes[i];
+    }
+    offset += PartSizes[i];
+  }
+}
+
 void demo1()
 {
   Serial.println("demo1");
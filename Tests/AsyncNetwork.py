@@ -0,0 +1,130 @@
+from moteinopy.aio import AsyncMoteinoNetwork
+from moteinopy.moteino import BaseQueueLength, NoAckAirtime
+from FakeBase import FakeBase
+import asyncio
+import functools
+import os
+import threading
+import time
+
+
+async def main():
+    base = FakeBase(nodes=[10, 11])
+    base.Responses[11] = lambda payload: (payload + b'\x00')[:2] + b'\x01\x00'  # trailing zeros aren't sent
+    network = await AsyncMoteinoNetwork.create(base.Port, receive_queue_size=5)
+    node = network.add_node(10, "int Command; int Value;", "node10")
+    network.add_node(11, "int Command; int Value;", "node11")
+    network.add_node(12, "int Command;", "node12")
+    network.add_node(13, "int Command;", "node13")
+    command = node.add_message(3, "byte led;", "Command")
+
+    assert await network.send(node, 1, 2) is True
+    assert base.Sent[-1] == (10, True, 3, b'\x00\x01\x00\x02')  # node10 has messages, its own struct is type 0
+    assert await network.send("node12", 1, max_wait=100) is False
+    assert await network.send(command, led=1) is True
+    assert base.Sent[-1] == (10, True, 3, b'\x03\x01')
+
+    answer = await network.send_and_receive(11, Command=7)
+    assert answer['Command'] == 7 and answer['Value'] == 1 and answer['SenderName'] == 'node11'
+    assert await network.send_and_receive(10, Command=7, max_wait=100) is None
+    del base.Responses[11]
+
+    # the blocking sends work as well, but not from the event loop's thread
+    loop = asyncio.get_event_loop()
+    assert await loop.run_in_executor(None, functools.partial(node.send, 4, 5)) is True
+    assert base.Sent[-1] == (10, True, 3, b'\x00\x04\x00\x05')
+    assert await loop.run_in_executor(None, functools.partial(network.nodes[12].send, 1, max_wait=100)) is False
+    assert (await asyncio.wrap_future(network.send_async(11, 6))).acked is True
+    try:
+        node.send(1, 2)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("a blocking send from the event loop's thread should raise")
+
+    # many sends waiting at once don't need any threads
+    threads = threading.active_count()
+    results = await asyncio.gather(*[network.send(10 + i % 2, i) for i in range(1000)])
+    assert all(results) and threading.active_count() == threads
+    assert [((p[1:] if n == 10 else p) + b'\x00')[:2] for (n, _, _, p) in base.Sent[-1000:]] == \
+           [bytes(bytearray((i % 256, i // 256))) for i in range(1000)]
+
+    # frames without an ack request get a seq too and wait for room in the base like the others
+    base.Airtime = 0.01
+    queued = list()
+    write = network.Writer.write
+    network.Writer.write = lambda data: queued.append(len(network._AckTransactions)) or write(data)
+    results = await asyncio.gather(*[network.send(11, i, request_ack=i % 2 == 0) for i in range(20)])
+    assert results == [True, None]*10 and all(base.Seqs[-20:])
+    assert max(queued) == BaseQueueLength
+    network.Writer.write = write
+    base.Airtime = 0
+    await asyncio.sleep(0.1)
+    assert not network._AckTransactions
+
+    # they take turns from the Scheduler with the blocking sends, by priority and deadline
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        network.Scheduler.acquire()
+        held.set()
+        release.wait()
+        network.Scheduler.release()
+    threading.Thread(target=hold).start()
+    await loop.run_in_executor(None, held.wait)
+    sent = len(base.Sent)
+    dropped = network.Scheduler.Stats['normal'].Dropped
+    sends = [asyncio.ensure_future(network.send(10, 1, priority='low')),
+             asyncio.ensure_future(network.send(10, 2, deadline=50)),
+             asyncio.ensure_future(network.send(10, 3, priority='high'))]
+    await asyncio.sleep(0.2)
+    assert sends[1].done() and sends[1].result() is False and len(base.Sent) == sent
+    assert network.Scheduler.Stats['normal'].Dropped == dropped + 1
+    release.set()
+    assert await asyncio.gather(*sends) == [True, False, True]
+    assert [p for (_, _, _, p) in base.Sent[sent:]] == [b'\x00\x03', b'\x00\x01']
+    try:
+        await network.send(10, 1, priority='urgent')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("an unknown priority should raise")
+
+    # whatever the nodes send goes to the async iterator, the oldest are dropped when it is full
+    for i in range(7):
+        base.inject(13, bytearray((i, 0)))
+    await asyncio.sleep(0.2)
+    received = list()
+    async for record in network:
+        received.append(record['Command'])
+        if len(received) == 5:
+            break
+    assert received == [2, 3, 4, 5, 6] and network.Dropped == 2
+    network.shut_down()
+
+
+async def older_base():
+    # older bases don't report on frames without an ack request, they are paced
+    base = FakeBase(version=(2, 3), nodes=[10])
+    network = await AsyncMoteinoNetwork.create(base.Port)
+    network.add_node(10, "int Command;", "node10")
+    start = time.time()
+    results = await asyncio.gather(*[network.send(10, i, request_ack=False) for i in range(20)])
+    assert results == [None]*20 and time.time() - start > 10*NoAckAirtime/1000.
+    assert await network.send(10, 1) is True
+    assert [p for (_, _, _, p) in base.Sent] == [bytes(bytearray((i,))) for i in range(20)] + [b'\x01']
+    network.shut_down()
+
+
+def run(coroutine):
+    return asyncio.run(coroutine) if hasattr(asyncio, 'run') else \
+        asyncio.get_event_loop().run_until_complete(coroutine)
+
+run(main())
+run(older_base())
+
+print("---------------------------------------------"
+      "\nAll tests on the asyncio network performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
@@ -0,0 +1,42 @@
+from moteinopy import MoteinoNetwork
+from FakeBase import FakeBase
+import os
+import time
+
+# the fastest baudrate both sides support is picked
+base = FakeBase(nodes=[10])
+mn = MoteinoNetwork(base.Port)
+assert mn.BaudRate == base.BaudRate == 1000000
+assert mn._Serial.baudrate == 1000000
+assert mn.SerialThroughput > 0
+assert mn.add_node(10, "int Command;").send(1) is True
+mn.shut_down()
+
+# but not above max_baudrate, None stays at the first one
+for max_baudrate, expected in [(300000, 250000), (None, 115200), (115200, 115200)]:
+    base = FakeBase()
+    t = time.time()
+    mn = MoteinoNetwork(base.Port, max_baudrate=max_baudrate)
+    assert mn.BaudRate == base.BaudRate == expected
+    if expected == 115200:
+        # without testing the link
+        assert mn.SerialThroughput is None and base.Resets == 1 and time.time() - t < 1.5
+    mn.shut_down()
+
+# a link that garbles the test pattern falls back to a lower baudrate
+base = FakeBase(nodes=[10], max_baudrate=500000)
+mn = MoteinoNetwork(base.Port)
+assert mn.BaudRate == base.BaudRate == 500000 and base.Resets == 2
+assert mn.add_node(10, "int Command;").send(1) is True
+mn.shut_down()
+
+# older bases stay where they are
+base = FakeBase(version=(2, 3))
+mn = MoteinoNetwork(base.Port)
+assert mn.BaudRate == 115200 and mn.SerialThroughput is None
+mn.shut_down()
+
+print("---------------------------------------------"
+      "\nAll tests on baudrate negotiation performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
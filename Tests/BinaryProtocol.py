@@ -0,0 +1,83 @@
+from moteinopy import MoteinoNetwork
+from moteinopy.framing import crc16, cobs_encode, cobs_decode, HexProtocol, CobsProtocol
+from FakeBase import FakeBase
+import os
+import time
+
+# the codec itself
+assert crc16(b"123456789") == 0x29B1
+for raw, encoded in [(b'\x00', b'\x01\x01'),
+                     (b'\x00\x00', b'\x01\x01\x01'),
+                     (b'\x11\x22\x00\x33', b'\x03\x11\x22\x02\x33'),
+                     (b'\x11\x00\x00\x00', b'\x02\x11\x01\x01\x01'),
+                     (bytes(bytearray(range(1, 255))), b'\xff' + bytes(bytearray(range(1, 255)))),
+                     (bytes(bytearray(range(1, 256))), b'\xff' + bytes(bytearray(range(1, 255))) + b'\x02\xff')]:
+    assert cobs_encode(raw) == encoded
+    assert cobs_decode(encoded) == raw
+for data in [b'', b'\x00'*300, bytes(bytearray(range(256)))*3]:
+    assert cobs_decode(cobs_encode(data)) == data
+
+# frames can arrive in any chunks and bad ones are dropped
+for protocol in [HexProtocol(), CobsProtocol()]:
+    frames = [b'\x0a\x01\x03\x00\x05', b'\x00', b'\x01\x02']
+    stream = b''.join(protocol.encode(f) for f in frames)
+    got = list()
+    for i in range(len(stream)):
+        got.extend(protocol.feed(stream[i:i + 1]))
+    assert got == frames, got
+    bad = bytearray(protocol.encode(frames[0]))
+    if protocol.Name == 'cobs':
+        bad[1] ^= 0x01  # the CRC catches this
+    else:
+        bad[2] = ord('z')  # HEX lines can only catch this
+    assert protocol.feed(bytes(bad) + protocol.encode(frames[2])) == [frames[2]]
+    assert protocol.Errors == 1 and protocol.Frames == 4
+
+# newer bases speak COBS
+base = FakeBase(nodes=[10])
+base.Responses[10] = lambda payload: b'\x2a\x00' + payload[:2]
+mn = MoteinoNetwork(base.Port, base_id=3, network_id=7, encryption_key="0123456789abcdef")
+assert mn.BaseSketchVersion >= (3, 0) and base.Init['protocol'] == 'cobs'
+assert base.Init['base_id'] == 3 and base.Init['network_id'] == 7
+node = mn.add_node(10, "int Command; int Value;", "node10")
+mn.add_node(11, "int Command;", "node11")
+mn.bind_default(no_ack=lambda d: None)
+
+assert node.send(Command=1, Value=-2) is True
+assert base.Sent[-1] == (10, True, 3, b'\x01\x00\xfe\xff')
+assert mn.nodes['node11'].send(5) is False
+time.sleep(0.1)  # node10 answers everything, let the answer to the first send go to the receive function
+
+answer = node.send_and_receive(Command=7)
+assert answer['Command'] == 42 and answer['Value'] == 7 and answer['RSSI'] == -40
+
+received = list()
+node.bind(receive=lambda d: received.append(d))
+base.inject(10, b'\x05\x00')
+base.write(b'\x03\x01garbage\x00')  # a corrupted frame is dropped
+time.sleep(0.2)
+assert len(received) == 1 and received[0]['Command'] == 5
+assert mn._Protocol.Errors == 1
+assert mn.Base.report() == (-40, 21)
+mn.shut_down()
+
+# an old base falls back to HEX lines, as does asking for them
+for version, protocol in [((2, 3), None), ((3, 0), 'hex')]:
+    base = FakeBase(version=version, nodes=[10])
+    mn = MoteinoNetwork(base.Port, protocol=protocol)
+    assert base.Init['protocol'] == 'hex' and mn._Protocol.Name == 'hex'
+    assert mn.add_node(10, "int Command;").send(513) is True
+    assert base.Sent[-1] == (10, True, 3, b'\x01\x02')
+    mn.shut_down()
+
+try:
+    MoteinoNetwork(FakeBase(version=(2, 3)).Port, protocol='cobs')
+except ValueError:
+    pass
+else:
+    raise AssertionError("a v2.3 base can't speak COBS")
+
+print("---------------------------------------------"
+      "\nAll tests on the binary protocol performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
@@ -0,0 +1,53 @@
+from moteinopy import Struct
+from random import randint as r
+
+s = Struct("byte mode:3; bool on:1; int offset:4; int a; bool flags[8]:1; unsigned int big:12; byte b;")
+# mode, on and offset share a byte, flags and big fit in 3 bytes
+assert s.NofBytes == 1 + 2 + 3 + 1
+
+for _ in range(200):
+    d = {'mode': r(0, 7),
+         'on': r(0, 1) == 1,
+         'offset': r(-8, 7),
+         'a': r(-2**15, 2**15 - 1),
+         'flags': [r(0, 1) == 1 for _ in range(8)],
+         'big': r(0, 2**12 - 1),
+         'b': r(0, 255)}
+    assert s.decode(s.encode(d)) == d
+
+# bits are packed least significant bit first, like avr-gcc does
+assert s.pack({'mode': 5, 'on': True, 'offset': -1})[:1] == bytearray([0b11111101])
+assert s.pack({'flags': [True] + [False]*7, 'big': 1})[3:6] == bytearray([0x01, 0x01, 0x00])
+
+for bad in [{'mode': 8}, {'offset': 8}, {'offset': -9}, {'on': 1}, {'flags': [True]*9}]:
+    try:
+        s.encode(bad)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("encoding " + str(bad) + " should have failed")
+
+for bad in ["byte a:9;", "char c:3;", "int a:x;"]:
+    try:
+        Struct(bad)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError(bad + " should not be a valid struct")
+
+d = {'mode': 3, 'on': True, 'offset': -3, 'a': -5, 'flags': [True, False]*4, 'big': 4000, 'b': 7}
+try:
+    import numpy
+except ImportError:
+    numpy = None
+if numpy is not None:
+    a = s.decode_many([s.encode(d)]*3)
+    for key, value in d.items():
+        if key == 'flags':
+            assert list(a[key][0]) == value
+        else:
+            assert a[key][2] == value
+
+print("---------------------------------------------"
+      "\nAll tests on bitfields performed successfully"
+      "\n---------------------------------------------")
@@ -0,0 +1,67 @@
+from moteinopy import MoteinoNetwork
+from FakeBase import FakeBase
+import os
+import threading
+import time
+
+node_ids = list(range(10, 30))
+base = FakeBase(nodes=node_ids)
+mn = MoteinoNetwork(base.Port)
+received = list()
+mn.bind_default(receive=received.append, no_ack=lambda d: None)
+for node_id in node_ids:
+    mn.add_node(node_id, "byte Seq; int Value;")
+
+
+def answer_later(node_id, delay):
+    # the node takes a while to answer, like a real one that has to measure something
+    def respond(payload):
+        seq = bytearray(payload + b'\x00')[0]
+        threading.Timer(delay, base.inject, (node_id, bytearray((seq, node_id, seq)))).start()
+    return respond
+
+for node_id in node_ids:
+    base.Responses[node_id] = answer_later(node_id, 0.2)
+
+# many threads query different nodes at once, everyone gets their own answer
+answers = dict()
+
+
+def query(node_id, seq):
+    answers[(node_id, seq)] = mn.send_and_receive(node_id, Seq=seq, max_wait=2000)
+
+t = time.time()
+threads = [threading.Thread(target=query, args=(node_id, seq)) for node_id in node_ids for seq in (1, 2)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+elapsed = time.time() - t
+for (node_id, seq), answer in answers.items():
+    assert answer is not None and answer['SenderID'] == node_id and answer['RSSI'] == -40, (node_id, seq, answer)
+assert len(answers) == 40 and not received
+assert elapsed < 40*0.2/4, elapsed  # the answers were waited for side by side, not one after another
+
+# with a tag only the answer that echoes what was sent is taken
+node = mn.nodes[10]
+base.Responses[10] = lambda payload: None
+base.Responses[11] = lambda payload: (payload + b'\x00')[:1] + b'\x05\x00'
+threading.Timer(0.05, base.inject, (10, b'\x07\x01\x00')).start()  # an answer to somebody else
+threading.Timer(0.1, base.inject, (10, b'\x08\x02\x00')).start()
+assert node.send_and_receive(Seq=8, tag='Seq')['Value'] == 2
+time.sleep(0.1)
+assert [d['Value'] for d in received] == [1]
+assert mn.send_and_receive(11, Seq=3, tag='Seq') == {'Seq': 3, 'Value': 5, 'SenderID': 11, 'RSSI': -40,
+                                                     'SenderName': 'Node-11', 'Sender': mn.nodes[11]}
+
+# no answer, no ack
+assert node.send_and_receive(Seq=9, max_wait=100) is None
+assert mn.send_and_receive(mn.add_node(40, "byte Seq;"), 1, max_wait=100) is None
+assert mn.Base.report() == (-40, 21)
+assert not mn._Transactions
+mn.shut_down()
+
+print("---------------------------------------------"
+      "\nAll tests on concurrent queries performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
@@ -41,6 +41,24 @@ for _ in range(50):
     v = a.hex2dec(s)
     assert i == v
 
+# whole arrays give the same hex as their elements one by one, padded with zeros
+for subtype, values in [(Byte(), [1, 255]), (Int(), [-2, 300]), (UnsignedInt(), [65535]),
+                        (Long(), [-2**31 + 1, 7]), (UnsignedLong(), [2**32 - 1]), (Bool(), [True, False, True])]:
+    a = Array(subtype, 4)
+    s = a.hexprints(values)
+    assert s == "".join(subtype.hexprints(v) for v in values) + "00"*subtype.NofBytes*(4 - len(values))
+    assert a.hex2dec(s) == values + [subtype.ReturnType(0)]*(4 - len(values))
+    assert a.hexprints() == "00"*a.NofBytes and len(values) < 4  # the caller's list isn't padded
+a = Array(Char(), 4)
+assert a.hexprints("ab") == "61622020" and a.hex2dec("61622020") == "ab  "
+for bad in [[1]*5, [256], [-1]]:
+    try:
+        Array(Byte(), 4).hexprints(bad)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError(str(bad) + " should not fit in byte[4]")
+
 print("---------------------------------------------"
       "\nAll tests on Datatypes performed successfully"
       "\n---------------------------------------------")
\ No newline at end of file
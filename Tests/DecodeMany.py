@@ -0,0 +1,32 @@
+from moteinopy import Struct
+from random import randint as r
+
+s = Struct("int Command; byte Numbers[8]; unsigned long Uptime; bool Door; char Name[4];")
+assert s.dtype.itemsize == s.NofBytes
+
+values = [{'Command': r(-2**15, 2**15 - 1),
+           'Numbers': [r(0, 255) for _ in range(8)],
+           'Uptime': r(0, 2**32 - 1),
+           'Door': r(0, 1) == 1,
+           'Name': "".join([chr(r(97, 122)) for _ in range(4)])} for _ in range(100)]
+frames = [s.encode(v) for v in values]
+
+for a in [s.decode_many(frames),
+          s.decode_many([f.encode('ascii') for f in frames]),
+          s.decode_many([s.pack(v) for v in values], raw=True)]:
+    assert len(a) == len(values)
+    for record, v in zip(a, values):
+        assert record['Command'] == v['Command']
+        assert list(record['Numbers']) == v['Numbers']
+        assert record['Uptime'] == v['Uptime']
+        assert record['Door'] == v['Door']
+        assert record['Name'].decode('latin-1') == v['Name']
+    # vectorized operations work on whole columns
+    assert a['Uptime'].max() == max([v['Uptime'] for v in values])
+
+# short frames are padded with zeros
+assert s.decode_many(["0100"])['Command'][0] == 1
+
+print("---------------------------------------------"
+      "\nAll tests on Struct.decode_many performed successfully"
+      "\n---------------------------------------------")
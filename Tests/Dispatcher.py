@@ -0,0 +1,81 @@
+from moteinopy import MoteinoNetwork
+from moteinopy.dispatch import Dispatcher
+from FakeBase import FakeBase
+import os
+import threading
+import time
+
+# a full queue either drops the newest, drops the oldest or blocks
+for overflow, expected in [('drop-newest', [0, 1]), ('drop-oldest', [3, 4])]:
+    gate = threading.Event()
+    done = list()
+    d = Dispatcher(workers=1, max_queue=2, overflow=overflow)
+    d.submit(gate.wait)
+    time.sleep(0.05)  # the worker is now stuck at the gate
+    accepted = [d.submit(done.append, i) for i in range(5)]
+    assert d.QueueDepth == d.MaxQueueDepth == 2 and d.Dropped == 3
+    gate.set()
+    d.stop()
+    assert sorted(done) == expected, done
+    assert d.Processed == 3 and d.Submitted == 6
+    assert accepted == ([True, True, False, False, False] if overflow == 'drop-newest' else [True]*5)
+
+gate = threading.Event()
+d = Dispatcher(workers=1, max_queue=1)
+d.submit(gate.wait)
+time.sleep(0.05)
+d.submit(int)
+blocked = threading.Thread(target=d.submit, args=(int,))
+blocked.start()
+blocked.join(0.1)
+assert blocked.is_alive() and d.Dropped == 0
+gate.set()
+blocked.join(1)
+assert not blocked.is_alive()
+
+# exceptions are counted and don't kill the worker
+d = Dispatcher(workers=2)
+d.submit(lambda: 1/0)
+d.submit(int)
+d.stop()
+assert d.Errors == 1 and d.Processed == 2
+
+for bad in [dict(workers=0), dict(max_queue=0), dict(overflow='shrug')]:
+    try:
+        Dispatcher(**bad)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError(str(bad) + " should not be allowed")
+
+# a burst of frames is handled by the workers, not a thread each
+base = FakeBase(nodes=[10])
+mn = MoteinoNetwork(base.Port, dispatch_workers=3)
+node = mn.add_node(10, "int Value;")
+received = list()
+node.bind(receive=lambda d: (time.sleep(0.01), received.append(d['Value'])))
+threads = threading.active_count()
+for i in range(200):
+    base.inject(10, bytearray((i, 0)))
+time.sleep(0.1)
+assert threading.active_count() == threads
+while mn.Dispatcher.QueueDepth:
+    time.sleep(0.05)
+time.sleep(0.1)
+assert sorted(received) == list(range(200)) and mn.Dispatcher.Dropped == 0
+assert mn.Dispatcher.MaxQueueDepth > 3
+
+# acks are handled by the listening thread while the workers are busy
+gate = threading.Event()
+node.bind(receive=lambda d: gate.wait())
+for i in range(3):
+    base.inject(10, b'\x00\x00')
+time.sleep(0.1)
+assert node.send(1) is True
+gate.set()
+mn.shut_down()
+
+print("---------------------------------------------"
+      "\nAll tests on the dispatcher performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
@@ -0,0 +1,174 @@
+"""
+A stand-in for a moteino running the BaseSketch, on a pseudo terminal, so
+MoteinoNetwork can be tested through a real serial port without any hardware:
+
+    base = FakeBase(version=(3, 0))
+    mn = MoteinoNetwork(base.Port, base_id=1)
+
+It answers the reset sign, the init string and status requests like the
+BaseSketch does. Nodes whose IDs are in base.Nodes ack everything sent to
+them and base.Responses[node_id] can be a function that gets the payload
+and returns what the node answers with (or None). Everything sent through
+the base is kept in base.Sent as (send2id, ack_requested, retries, payload)
+and with version 3.0 the seq of each frame in base.Seqs, it reports on frames
+without an ack request as well if they have a seq.
+The pseudo terminal works at any baudrate, pass max_baudrate to make the
+test pattern come back wrong above it. Pass airtime (seconds) to make sending
+take a while, base.Pipelined counts the frames that were already waiting
+when the base was done sending the one before.
+"""
+import os
+import pty
+import select
+import struct
+import threading
+import time
+import tty
+from moteinopy.framing import HexProtocol, CobsProtocol
+
+Versions = {(2, 3): b"moteinopy basesketch v2.3",
+            (3, 0): b"moteinopy basesketch v3.0"}
+BaudRates = (115200, 230400, 250000, 500000, 1000000)
+BaudTestLength = 128
+
+
+class FakeBase(threading.Thread):
+    def __init__(self, version=(3, 0), nodes=(), rssi=-40, temperature=21, max_baudrate=None, airtime=0):
+        threading.Thread.__init__(self, name="FakeBase")
+        self.daemon = True
+        self.Version = version
+        self.Nodes = set(nodes)
+        self.Responses = dict()
+        self.RSSI = rssi
+        self.Temperature = temperature
+        self.Sent = list()
+        self.Seqs = list()
+        self.BytesWritten = 0
+        self.Init = None
+        self.Protocol = None
+        self.Resets = 0
+        self.MaxBaudRate = max_baudrate
+        self.Airtime = airtime
+        self.Pipelined = 0
+        self._Left = 0  # bytes read but not handled yet
+        self.BaudRate = BaudRates[0]
+        self._BaudTest = None
+        self._Line = b''
+        self._FrameStart = True
+        self._Master, self._Slave = pty.openpty()
+        tty.setraw(self._Slave)
+        self.Port = os.ttyname(self._Slave)
+        self._Stop = False
+        self.start()
+
+    def stop(self):
+        self._Stop = True
+
+    def write(self, data):
+        self.BytesWritten += len(data)
+        os.write(self._Master, bytes(data))
+
+    def inject(self, sender, payload, send2id=None):
+        """
+        Makes it look like the base received payload from sender
+        """
+        if send2id is None:
+            send2id = self.Init['base_id']
+        header = bytearray((sender, send2id, self.RSSI + 0x7F))
+        if self.Version >= (3, 0):
+            header.append(len(payload))
+        else:
+            payload = bytes(payload) + b'\x00'*(61 - len(payload))  # older ones print all 61 bytes
+        self.write(self.Protocol.encode(header + payload))
+
+    def run(self):
+        while not self._Stop:
+            if not select.select([self._Master], [], [], 0.05)[0]:
+                continue
+            data = bytearray(os.read(self._Master, 1024))
+            for i, b in enumerate(data):
+                self._Left = len(data) - i - 1
+                self._receive(b)
+
+    def _receive(self, b):
+        if self._BaudTest is not None:
+            self._baud_test(b)
+        elif self.Protocol is None:
+            # waiting for the reset sign or reading the init string
+            if b == ord('X'):
+                self._reset()
+            elif self.Init is False:
+                if b == ord('\n'):
+                    self._init(bytearray.fromhex(self._Line.decode('ascii')))
+                else:
+                    self._Line += bytes(bytearray((b,)))
+        elif isinstance(self.Protocol, HexProtocol):
+            if b == ord('X'):
+                self._reset()
+            else:
+                self._frames(bytes(bytearray((b,))))
+        else:
+            # in the COBS protocol an 'X' is only a reset sign at the start of a frame
+            if b == ord('X') and self._FrameStart:
+                self._reset()
+            else:
+                self._FrameStart = b == 0
+                self._frames(bytes(bytearray((b,))))
+
+    def _reset(self):
+        self.Resets += 1
+        self.Protocol = None
+        self.Init = False
+        self._Line = b''
+        self.write(Versions[self.Version] + b'\r\n')
+
+    def _init(self, values):
+        self.Init = dict(frequency=values[0], base_id=values[1], network_id=values[2],
+                         high_power=bool(values[3]), encryption_key=bytes(values[4:20]),
+                         promiscous_mode=bool(values[20]))
+        protocol = HexProtocol
+        if self.Version >= (3, 0):
+            protocol = [HexProtocol, CobsProtocol][values[21]]
+        self.Init['protocol'] = protocol.Name
+        self.write(b'Ready\r\n')
+        self.Protocol = protocol()
+        self._FrameStart = True
+        if self.Version >= (3, 0) and values[22]:
+            self.BaudRate = BaudRates[values[22]]
+            self._BaudTest = bytearray()
+
+    def _baud_test(self, b):
+        if len(self._BaudTest) < BaudTestLength:
+            self._BaudTest.append(b)
+            if self.MaxBaudRate is not None and self.BaudRate > self.MaxBaudRate:
+                b ^= 0x10
+            self.write(bytearray((b,)))
+        else:
+            self._BaudTest = None
+            if b != ord('Y'):
+                self.BaudRate = BaudRates[0]
+
+    def _frames(self, data):
+        base_id = self.Init['base_id']
+        for frame in self.Protocol.feed(data):
+            if len(frame) == 1 and frame[0] == base_id:
+                self.write(self.Protocol.encode(b'\xff' + struct.pack('<hh', self.RSSI, self.Temperature)))
+                continue
+            send2id, ack_requested, retries, payload = frame[0], bool(frame[1]), frame[2], bytes(frame[3:])
+            report = bytearray((base_id, send2id, ack_requested and send2id in self.Nodes, self.RSSI + 0x7F))
+            if self.Version >= (3, 0):
+                self.Seqs.append(frame[3])
+                report.append(frame[3])
+                payload = payload[1:]
+            self.Sent.append((send2id, ack_requested, retries, payload))
+            acked = send2id in self.Nodes
+            if self.Airtime:
+                time.sleep(self.Airtime)
+                if self._Left or select.select([self._Master], [], [], 0)[0]:
+                    self.Pipelined += 1
+            if ack_requested or (self.Version >= (3, 0) and frame[3]):
+                self.write(self.Protocol.encode(report))
+            if acked and send2id in self.Responses:
+                response = self.Responses[send2id](payload)
+                if response is not None:
+                    self.inject(send2id, response)
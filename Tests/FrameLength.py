@@ -0,0 +1,42 @@
+from moteinopy import MoteinoNetwork
+from FakeBase import FakeBase
+import os
+import time
+
+# a v3.0 base only sends the bytes that were received, a v2.3 one all 61 of them
+for version in [(3, 0), (2, 3)]:
+    for protocol in (['cobs', 'hex'] if version >= (3, 0) else ['hex']):
+        base = FakeBase(version=version)
+        mn = MoteinoNetwork(base.Port, protocol=protocol)
+        assert mn._BaseV3 == (version >= (3, 0))
+        received = list()
+        node = mn.add_node(10, "int Command; byte Numbers[3];")
+        node.bind(receive=lambda d: received.append(d))
+        lengths = list()
+        send2parent = node.send2parent
+        node.send2parent = lambda payload, *args: (lengths.append(len(payload)), send2parent(payload, *args))
+
+        before = base.BytesWritten
+        base.inject(10, b'\x05\x00')
+        time.sleep(0.2)
+        nofbytes = base.BytesWritten - before
+        assert received[-1]['Command'] == 5 and received[-1]['Numbers'] == [0, 0, 0]
+        if version >= (3, 0):
+            assert lengths == [2]
+            assert nofbytes == {'cobs': 10, 'hex': 13}[protocol], nofbytes
+        else:
+            assert lengths == [61]
+            assert nofbytes == {'cobs': 68, 'hex': 129}[protocol], nofbytes
+
+        if version >= (3, 0):
+            # frames shorter than they say they are are dropped
+            base.write(base.Protocol.encode(b'\x0a\x01\x7f\x05\x01\x02'))
+            base.inject(10, b'\x07\x00\x01\x02\x03')
+            time.sleep(0.2)
+            assert len(received) == 2 and received[-1]['Numbers'] == [1, 2, 3]
+        mn.shut_down()
+
+print("---------------------------------------------"
+      "\nAll tests on frame lengths performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
@@ -0,0 +1,42 @@
+from moteinopy import MoteinoNetwork
+from moteinopy.moteino import Record
+import os
+
+mn = MoteinoNetwork("", init_base=False, base_id=100, lazy_records=True)
+node = mn.add_node(1, "int Command; byte Numbers[3]; char Name[4];")
+node.add_translation('Command', ('on', 1))
+
+s = node.Struct
+raw = s.pack({'Command': 1, 'Numbers': [1, 2, 3], 'Name': "abcd"})
+record = Record(s, raw, node._DecodeTables)
+
+# nothing is decoded until it is accessed
+assert record._Values == {}
+assert record['Command'] == 'on'
+assert list(record._Values.keys()) == ['Command']
+
+# but it behaves like the dict decode() returns
+record['RSSI'] = -40
+d = s.decode(s.encode({'Command': 1, 'Numbers': [1, 2, 3], 'Name': "abcd"}), node._CompiledTranslations)
+d['RSSI'] = -40
+assert dict(record) == d
+assert list(record.keys()) == list(d.keys())
+assert 'Name' in record and 'Sender' not in record
+assert record.get('Sender') is None
+del record['Name']
+assert 'Name' not in record and len(record) == 3
+
+# short payloads are padded with zeros
+assert Record(s, b'\x05')['Command'] == 5
+
+
+received = list()
+node.bind(receive=lambda d: received.append(d))
+node.send2parent(s.pack({'Command': 1}))
+assert isinstance(received[0], Record)
+assert received[0]['Command'] == 'on' and received[0]['SenderID'] == 1
+
+print("---------------------------------------------"
+      "\nAll tests on lazy records performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
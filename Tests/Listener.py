@@ -0,0 +1,58 @@
+from moteinopy import MoteinoNetwork
+from moteinopy.moteino import parse_frame
+from moteinopy.framing import HexProtocol, CobsProtocol, Frame
+from FakeBase import FakeBase
+import os
+import time
+
+# the protocols split frames out of one buffer that they keep
+for protocol in [HexProtocol(), CobsProtocol()]:
+    buf = protocol._Buffer
+    stream = b''.join(protocol.encode(bytearray((i, 1, 2))) for i in range(1, 50))
+    frames = protocol.feed(stream[:100]) + protocol.feed(stream[100:])
+    assert frames == [bytearray((i, 1, 2)) for i in range(1, 50)]
+    assert protocol._Buffer is buf and not buf
+
+base = FakeBase(nodes=range(10, 20))
+mn = MoteinoNetwork(base.Port)
+node = mn.add_node(10, "int Temperature;", "node")
+received = list()
+node.bind(receive=received.append)
+
+# frames from the base become Frames, the payload is a view of the frame
+frame = parse_frame(mn, bytearray((10, 1, 0x7f - 40, 2, 0x15, 0x00, 0xee)))
+assert isinstance(frame, Frame) and (frame.Sender, frame.Target, frame.RSSI) == (10, 1, -40)
+assert isinstance(frame.Payload, memoryview) and bytes(frame.Payload) == b'\x15\x00'
+assert repr(frame) == "Frame(sender=10, target=1, rssi=-40, payload={!r})".format(b'\x15\x00')
+frame = parse_frame(mn, bytearray((1, 10, 1, 0x7f - 40)))
+assert (frame.Sender, frame.Target, frame.RSSI, bytes(frame.Payload)) == (1, None, None, b'\x0a\x01\x57')
+assert parse_frame(mn, bytearray((10, 1, 0x7f, 5, 1))) is None  # shorter than it says
+
+# a burst of frames is read in large chunks while the listener waits on the port
+listener = mn._serial_listening_thread
+assert listener._Wakeup is not None
+n = 300
+base.write(b''.join(base.Protocol.encode(bytearray((10, 1, 0x7f - 40, 2, i & 0xff, i >> 8))) for i in range(n)))
+time.sleep(0.5)
+assert [d['Temperature'] for d in received] == list(range(n))
+assert all(d['RSSI'] == -40 for d in received)
+assert mn._Protocol.Frames >= n and not mn._Protocol.Errors
+
+# reports it can't make sense of don't stop it
+mn.send2base(99, True, 3, "01", max_wait=200)  # not a known node
+report = mn.Base.send2parent
+mn.Base.send2parent = lambda payload: 1/0
+assert node.send(1, max_wait=100) is False
+mn.Base.send2parent = report
+assert listener.is_alive() and node.send(2) is True
+
+# and stops right away when asked
+t = time.time()
+mn.shut_down()
+listener.join(1)
+assert not listener.is_alive() and time.time() - t < 1
+
+print("---------------------------------------------"
+      "\nAll tests on the listener performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
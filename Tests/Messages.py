@@ -0,0 +1,68 @@
+from moteinopy import MoteinoNetwork
+import binascii
+import os
+
+mn = MoteinoNetwork("", init_base=False, base_id=100)
+
+node = mn.add_node(10, None, "node1")
+status = node.add_message(1, "int temperature; unsigned long uptime; byte numbers[20];", "Status")
+command = node.add_message(2, "byte led;", "Command")
+node.add_translation('led', ('on', 1))
+
+sent = list()
+mn._write2serial = lambda frame, *args, **kwargs: sent.append(binascii.hexlify(frame[3:]).decode())
+
+# each message only carries its own bytes, after the type byte
+command.send('on')
+assert sent[-1] == "0201"
+assert node.LastSent['MessageType'] == "Command"
+
+try:
+    node.send(1)
+except ValueError:
+    pass
+else:
+    raise AssertionError("a node without a struct of its own should not send")
+
+for bad in [(1, "int a;"), (300, "int a;")]:
+    try:
+        node.add_message(*bad)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError(str(bad) + " should not be a valid message")
+
+# received frames are dispatched on their type byte
+received = dict()
+node.bind(receive=lambda d: received.__setitem__('node', d))
+status.bind(receive=lambda d: received.__setitem__('status', d))
+node.send2parent(b"\x01" + status.Struct.pack({'temperature': -4, 'uptime': 1000}))
+node.send2parent(b"\x02" + command.Struct.pack({'led': 1}))
+node.send2parent(b"\x07")  # unknown types are ignored
+assert received['status']['temperature'] == -4 and received['status']['MessageType'] == 'Status'
+assert received['node'] == dict(led='on', MessageType='Command', SenderID=10, SenderName='node1',
+                                Sender=node, RSSI=0)
+
+# a node with a struct of its own as well sends and receives it as type 0
+node2 = mn.add_node(11, "int a;", "node2")
+node2.send(5)
+assert sent[-1] == "05"
+led = node2.add_message(1, "byte led;", "Led")
+node2.send(5)
+assert sent[-1] == "0005"
+try:
+    node2.add_message(0, "byte b;")
+except ValueError:
+    pass
+else:
+    raise AssertionError("type 0 is node2's own struct")
+node2.bind(receive=lambda d: received.__setitem__('node2', d))
+node2.send2parent(b"\x00\x06\x00")
+assert received['node2']['a'] == 6 and 'MessageType' not in received['node2']
+node2.send2parent(b"\x01\x01")
+assert received['node2']['led'] == 1 and received['node2']['MessageType'] == 'Led'
+
+print("---------------------------------------------"
+      "\nAll tests on messages performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
@@ -0,0 +1,105 @@
+from moteinopy import MultiBaseNetwork
+from FakeBase import FakeBase
+import os
+import threading
+import time
+
+house = FakeBase(nodes=range(10, 20))
+barn = FakeBase(nodes=range(10, 20))
+mn = MultiBaseNetwork([dict(port=house.Port, name='house', network_id=1),
+                       dict(port=barn.Port, name='barn', network_id=2)])
+assert list(mn.Bases) == ['house', 'barn'] and mn.DefaultBase == 'house'
+assert house.Init['network_id'] == 1 and barn.Init['network_id'] == 2
+light = mn.add_node(10, "int Temperature;", "light")
+pump = mn.add_node(11, "int Temperature;", "pump", base='barn')
+heater = mn.add_node(12, "int Temperature;", "heater")
+received = list()
+mn.bind_default(receive=received.append)
+
+# a node no base has heard goes through the default base, a node with a base through that one
+assert mn.route(light) is mn.Bases['house'] and mn.route("pump") is mn.Bases['barn']
+assert light.send(1) and pump.send(1)
+assert len(house.Sent) == 1 and house.Sent[0][0] == 10
+assert len(barn.Sent) == 1 and barn.Sent[0][0] == 11
+
+# then through the base that heard it best
+barn.RSSI = -50
+barn.inject(10, b'\x15\x00')
+time.sleep(0.1)
+house.RSSI = -70
+house.inject(10, b'\x16\x00')
+time.sleep(0.1)
+assert [(d['Temperature'], d['Base']) for d in received] == [(21, 'barn'), (22, 'house')]
+assert mn.route(10) is mn.Bases['barn']
+assert light.send(2)
+assert barn.Sent[-1] == (10, True, 3, b'\x02') and len(house.Sent) == 1
+house.RSSI = -52
+house.inject(10, b'\x17\x00')
+time.sleep(0.1)
+assert mn.route(10) in (mn.Bases['barn'], mn.Bases['house'])  # within the margin, the least busy one
+mn.RSSIMargin = 0
+assert mn.route(10) is mn.Bases['barn']
+assert mn.route(pump) is mn.Bases['barn']  # no matter who hears it
+assert mn.route(11) is mn.Bases['barn']
+
+# the same record heard by both bases is only received once
+del received[:]
+house.RSSI = -30
+house.inject(12, b'\x20\x00')
+barn.inject(12, b'\x20\x00')
+time.sleep(0.1)
+assert len(received) == 1 and received[0]['Temperature'] == 32
+barn.inject(12, b'\x20\x00')  # the same base again is a new record
+time.sleep(0.2)
+house.inject(12, b'\x20\x00')  # and so is one after the window
+time.sleep(0.1)
+assert len(received) == 3
+
+# a reply goes to the send waiting for it, whichever base hears it, and not to the receive function
+del received[:]
+house.Responses[12] = lambda payload: barn.inject(12, b'\x21\x00') or b'\x21\x00'
+answer = mn.send_and_receive(heater, 1)
+assert answer['Temperature'] == 33
+house.Responses[12] = lambda payload: barn.inject(12, b'\x22\x00')  # only barn hears it
+answer = mn.send_and_receive(heater, 2, max_wait=200)
+assert answer is not None and answer['Temperature'] == 34 and answer['Base'] == 'barn'
+time.sleep(0.2)
+assert not received
+
+# a reply only resolves one send, if that one lets it through so does the network
+answers = list()
+waiting = threading.Thread(target=lambda: answers.append(mn.Bases['barn'].nodes[12].send_and_receive(9, max_wait=300)))
+waiting.start()
+time.sleep(0.05)
+house.Responses[12] = lambda payload: b'\x23\x00'
+assert mn.Bases['house'].nodes[12].send(8, expect_response=True)
+waiting.join()
+assert answers == [None] and [d['Temperature'] for d in received] == [35]
+del house.Responses[12]
+del received[:]
+
+# a batch is divided between the bases
+results = mn.send_many([(light, [3]), (pump, [4]), (12, [5])])
+assert [(node.Name, r.acked) for (node, r) in results] == [('light', True), ('pump', True), ('heater', True)]
+assert barn.Sent[-2:] == [(10, True, 3, b'\x03'), (11, True, 3, b'\x04')] and house.Sent[-1][0] == 12
+
+utilisation = mn.utilisation()
+assert utilisation['house'].sends == 4 and utilisation['barn'].sends == 4
+assert utilisation['house'].received >= 5 and utilisation['barn'].received >= 6
+assert 0 < utilisation['house'].serial_load < 1 and not utilisation['barn'].queue_depth
+mn.reset_counters()
+assert mn.utilisation()['barn'].sends == 0
+assert 'house' in str(mn)
+
+try:
+    mn.add_node(13, "byte Command;", base='attic')
+except ValueError:
+    pass
+else:
+    raise AssertionError("there is no base called attic")
+mn.shut_down()
+
+print("---------------------------------------------"
+      "\nAll tests on the multi-base network performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
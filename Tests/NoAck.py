@@ -0,0 +1,54 @@
+from moteinopy import MoteinoNetwork
+from moteinopy.moteino import BaseQueueLength, NoAckAirtime
+from FakeBase import FakeBase
+import os
+import threading
+import time
+
+n = 30
+for version in [(2, 3), (3, 0)]:
+    base = FakeBase(version=version, nodes=range(10, 20), airtime=0.005)
+    mn = MoteinoNetwork(base.Port)
+    node = mn.add_node(10, "byte Command;")
+    calls = list()
+    mn.bind_default(ack=calls.append, no_ack=calls.append)
+
+    in_flight = list()
+    done = threading.Event()
+
+    def watch():
+        while not done.is_set():
+            in_flight.append(len(mn._AckTransactions))
+            time.sleep(0.001)
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+
+    # sends without an ack request don't wait for the radio, only for room in the base
+    t = time.time()
+    for i in range(n):
+        node.send(i, request_ack=False)
+    elapsed = time.time() - t
+    done.set()
+    watcher.join()
+    if version < (3, 0):
+        # paced by how long the base should take, all but a serial buffer full of them
+        assert 0.2 < elapsed < n*NoAckAirtime/1000. + 0.2, elapsed
+    else:
+        # the base says when it is done with each one
+        assert elapsed < n*0.005 + 0.2, elapsed
+        assert max(in_flight) == BaseQueueLength
+    time.sleep(0.2)
+    assert [p for (_, _, _, p) in base.Sent] == [bytes(bytearray((i,))) for i in range(n)]
+    assert all(not ack_requested for (_, ack_requested, _, _) in base.Sent)
+    assert not mn._AckTransactions and not calls
+
+    # and a send with an ack request after them gets its own report
+    assert node.send(1) is True
+    time.sleep(0.1)
+    assert len(calls) == 1
+    mn.shut_down()
+
+print("---------------------------------------------"
+      "\nAll tests on sends without an ack request performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
@@ -0,0 +1,49 @@
+from moteinopy import MoteinoNetwork
+import os
+
+mn = MoteinoNetwork("", init_base=False, base_id=100, payload_cache_size=2)
+node = mn.add_node(10, "int Command; byte Numbers[3];")
+node.add_translation('Command', ('on', 1), ('off', 0))
+
+sent = list()
+mn._write2serial = lambda frame, *args, **kwargs: sent.append(frame)
+
+node.send("on")
+node.send("on")
+assert sent[0] == sent[1] == b"\x0a\x01\x03\x01"
+assert (mn.PayloadCache.Hits, mn.PayloadCache.Misses) == (1, 1)
+
+# values that are equal but encode differently don't share a frame
+node.send(Numbers=[1, 2])
+node.send(Numbers=(1, 2))
+assert mn.PayloadCache.Hits == 2
+node.send(Command=1)
+try:
+    node.send(Command=True)  # not a hit for Command=1, a bool isn't an int
+except ValueError:
+    pass
+else:
+    raise AssertionError("a bool should not be sent as an int")
+assert mn.PayloadCache.Hits == 2
+
+# the cache is bounded, least recently used frames go first
+assert len(mn.PayloadCache) == 2
+node.send("on")
+assert mn.PayloadCache.Hits == 2
+
+# and cleared when translations change
+node.add_translation('Command', ('on', 2))
+node.send("on")
+assert sent[-1] == b"\x0a\x01\x03\x02"
+mn.add_global_translation('Command', ('on', 3))
+node.send("on")
+assert sent[-1] == b"\x0a\x01\x03\x03"
+
+# retries and request_ack are part of the key
+node.send("on", retries=5)
+assert sent[-1] == b"\x0a\x01\x05\x03"
+
+print("---------------------------------------------"
+      "\nAll tests on the payload cache performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
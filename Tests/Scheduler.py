@@ -0,0 +1,98 @@
+from moteinopy import MoteinoNetwork
+from moteinopy.scheduler import SendScheduler
+from FakeBase import FakeBase
+import os
+import threading
+import time
+
+# higher classes go first, within a class the keys take turns
+s = SendScheduler()
+assert s.acquire()
+order = list()
+
+
+def wait_for_turn(name, key, priority, timeout=None):
+    if s.acquire(key, priority, None if timeout is None else time.time() + timeout):
+        order.append(name)
+        s.release()
+    else:
+        order.append(name + " dropped")
+
+for args in [('a1', 'a', 'normal'), ('a2', 'a', 'normal'), ('a3', 'a', 'normal'), ('l1', 'l', 'low'),
+             ('b1', 'b', 'normal'), ('c1', 'c', 'normal', 0.1), ('h1', 'h', 'high')]:
+    threading.Thread(target=wait_for_turn, args=args).start()
+    time.sleep(0.02)
+assert s.QueueDepth == 7 and s.preempted('normal') and not s.preempted('high')
+time.sleep(0.15)
+assert order == ['c1 dropped'] and s.QueueDepth == 6
+s.release()
+time.sleep(0.1)
+assert order == ['c1 dropped', 'h1', 'a1', 'b1', 'a2', 'a3', 'l1'], order
+assert s.Stats['normal'].Sent == 5 and s.Stats['normal'].Dropped == 1
+assert s.Stats['low'].MeanWait > 100 and s.Stats['high'].MaxWait > 50
+assert not s.QueueDepth and s.acquire()
+s.release()
+
+# request() doesn't wait, the callback is told when the turn comes or the send is dropped
+granted = list()
+assert s.request(granted.append).Granted
+late = s.request(lambda ok: granted.append(('late', ok)), 'x', 'normal', time.time() + 0.01)
+cancelled = s.request(granted.append, 'y')
+high = s.request(lambda ok: granted.append(('high', ok)), 'z', 'high')
+assert not late.Granted and s.QueueDepth == 3
+assert s.cancel(cancelled) and not s.cancel(cancelled) and s.QueueDepth == 2
+time.sleep(0.02)
+s.release()
+assert granted == [('high', True)] and high.Granted and not s.cancel(high)
+s.release()
+assert granted == [('high', True), ('late', False)] and late.Dropped and not s.QueueDepth
+assert s.Stats['normal'].Dropped == 3 and s.acquire()
+s.release()
+
+try:
+    s.acquire(priority='urgent')
+except ValueError:
+    pass
+else:
+    raise AssertionError("there is no 'urgent' priority")
+
+# a high priority send doesn't wait for a low priority batch to finish
+base = FakeBase(nodes=range(10, 40), airtime=0.04)
+mn = MoteinoNetwork(base.Port)
+nodes = [mn.add_node(node_id, "byte Command;") for node_id in range(10, 40)]
+batch = threading.Thread(target=mn.send_many, args=([(node, [1]) for node in nodes[:25]],),
+                         kwargs=dict(priority='low'))
+batch.start()
+time.sleep(0.1)
+t = time.time()
+assert nodes[29].send(7, priority='high') is True
+assert time.time() - t < 0.5  # only the frames already in the base go first
+assert not nodes[28].send(3, priority='low', deadline=20)  # too late, the batch is still going
+batch.join()
+sent = [(node_id, p) for (node_id, _, _, p) in base.Sent]
+assert sent.index((39, b'\x07')) < sent.index((34, b'\x01'))
+assert (38, b'\x03') not in sent
+assert mn.Scheduler.Stats['low'].Dropped == 1 and mn.Scheduler.Stats['high'].Sent == 1
+
+# the nodes take turns, one with a lot to send doesn't hold up the others
+done = list()
+busy = threading.Thread(target=lambda: [done.append(nodes[0].send(i)) for i in range(10)])
+busy.start()
+time.sleep(0.05)
+t = time.time()
+assert nodes[1].send(1) is True
+assert time.time() - t < 0.1 and len(done) < 5
+busy.join()
+mn.shut_down()
+
+try:
+    MoteinoNetwork(None, send_fairness='whoever')
+except ValueError:
+    pass
+else:
+    raise AssertionError("send_fairness must be 'node' or 'caller'")
+
+print("---------------------------------------------"
+      "\nAll tests on the send scheduler performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
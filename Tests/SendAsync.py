@@ -0,0 +1,103 @@
+from moteinopy import MoteinoNetwork
+from moteinopy.moteino import BaseQueueLength
+from FakeBase import FakeBase
+from concurrent.futures import as_completed
+import os
+import threading
+import time
+
+base = FakeBase(nodes=[10, 11])
+mn = MoteinoNetwork(base.Port)
+node10 = mn.add_node(10, "int Command; int Value;", "node10")
+node11 = mn.add_node(11, "int Command;", "node11")
+node12 = mn.add_node(12, "int Command;", "node12")
+command = node10.add_message(3, "byte led;", "Command")
+no_acks = list()
+mn.bind_default(no_ack=no_acks.append)
+
+# one thread queues sends to many nodes and collects the results as they come
+futures = dict()
+for i in range(20):
+    futures[node10.send_async(i, 2)] = 10
+    futures[mn.send_async("node11", Command=i)] = 11
+    futures[mn.send_async(12, i, max_wait=50)] = 12
+results = dict()
+for future in as_completed(futures, timeout=10):
+    results.setdefault(futures[future], list()).append(future.result())
+assert all(r.acked is True and r.rssi == -40 and r.rtt > 0 for r in results[10] + results[11]), results
+assert all(r.acked is False and r.rtt is None for r in results[12])
+assert [p for (n, _, _, p) in base.Sent if n == 11] == [bytes(bytearray((i,))) for i in range(20)]
+assert not no_acks  # the futures get the results, not the no_ack function
+
+# without an ack there is nothing to wait for
+assert node11.send_async(1, request_ack=False).result(1) == (None, None, None)
+time.sleep(0.05)
+assert base.Sent[-1] == (11, False, 3, b'\x01')
+
+# messages can be sent the same way
+assert command.send_async(led=1).result(1).acked is True
+assert base.Sent[-1] == (10, True, 3, b'\x03\x01')
+
+# sends still waiting for their turn can be cancelled
+threads = threading.active_count()
+slow = [mn.send_async(node12, i, max_wait=100) for i in range(3)]
+cancelled = mn.send_async(node11, 99)
+assert cancelled.cancel()
+assert [f.result(1).acked for f in slow] == [False]*3 and cancelled.cancelled()
+assert base.Sent[-1][0] == 12 and threading.active_count() == threads
+
+# the most urgent send waiting goes next, one whose deadline passes while it waits is dropped
+dropped = mn.Scheduler.Stats['normal'].Dropped
+mn.Scheduler.acquire()  # hold the serial port until they are all queued
+slow = [mn.send_async(node12, i) for i in range(3)]
+late = mn.send_async(node11, 98, deadline=50)
+urgent = mn.send_async(node11, 99, priority='high', deadline=500)
+time.sleep(0.1)
+mn.Scheduler.release()
+assert urgent.result(1).acked is True and late.result(1) == (False, None, None)
+assert [f.result(1).acked for f in slow] == [False]*3
+assert mn.Scheduler.Stats['normal'].Dropped == dropped + 1
+sent = [(n, p) for (n, _, _, p) in base.Sent[-4:]]  # slow[0] may have had its turn before the others came
+assert sent.index((11, b'\x63')) < sent.index((12, b'\x01')) < sent.index((12, b'\x02')) and (11, b'\x62') not in sent
+
+# however many sends are waiting, send_async() doesn't block
+mn.Scheduler.acquire()
+queued = list()
+queuing = threading.Thread(target=lambda: queued.extend(mn.send_async(node11, i & 0xff) for i in range(1500)))
+queuing.start()
+queuing.join(1)
+assert not queuing.is_alive() and len(queued) == 1500
+mn.Scheduler.release()
+assert all(f.result(10).acked for f in queued)
+assert [p for (n, _, _, p) in base.Sent[-1500:]] == [bytes(bytearray((i & 0xff,))) for i in range(1500)]
+
+# the base gets the next frames while it is still sending the first
+base.Airtime = 0.02
+base.Pipelined = 0
+in_flight = list()
+write = mn.Writer.write
+mn.Writer.write = lambda data: in_flight.append(len(mn._AckTransactions)) or write(data)
+t = time.time()
+assert all(f.result(5).acked for f in [mn.send_async(node10, i) for i in range(20)])
+assert time.time() - t < 20*base.Airtime + 0.3
+assert base.Pipelined > 0 and max(in_flight) == BaseQueueLength
+mn.Writer.write = write
+base.Airtime = 0
+
+# the blocking send still works alongside
+assert node10.send(5, 5) is True and node12.send(1, max_wait=50) is False
+time.sleep(0.1)  # the no_ack function runs on a dispatcher worker
+assert len(no_acks) == 1
+
+try:
+    mn.send_async("node13", 1)
+except ValueError:
+    pass
+else:
+    raise AssertionError("node13 doesn't exist")
+mn.shut_down()
+
+print("---------------------------------------------"
+      "\nAll tests on send_async performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
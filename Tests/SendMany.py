@@ -0,0 +1,57 @@
+from moteinopy import MoteinoNetwork
+from moteinopy.moteino import SendResult
+from FakeBase import FakeBase
+import os
+import threading
+import time
+
+airtime = 0.01
+base = FakeBase(nodes=range(10, 40), airtime=airtime)
+mn = MoteinoNetwork(base.Port)
+no_acks = list()
+mn.bind_default(no_ack=no_acks.append)
+lights = [mn.add_node(node_id, "byte Command; int Brightness;", "light" + str(node_id)) for node_id in range(10, 50)]
+dimmer = lights[0].add_message(2, "byte Level;", "Dim")
+
+# everything is encoded first and then streamed to the base
+t = time.time()
+results = mn.send_many([(light, {'Command': 1, 'Brightness': light.ID}) for light in lights[:30]])
+elapsed = time.time() - t
+assert [node for (node, _) in results] == lights[:30]
+assert all(r.acked is True and r.rssi == -40 and r.rtt > 0 for (_, r) in results)
+# light10 has a message as well so its own struct goes with type byte 0
+assert [p for (_, _, _, p) in base.Sent[-30:]] == [b'\x00\x01\x0a'] + [bytes(bytearray((1, i))) for i in range(11, 40)]
+assert elapsed < 30*airtime + 0.2, elapsed
+assert base.Pipelined > 0  # the base had the next frame before it was done with the one before
+
+# nodes that don't ack, sends without an ack, messages and values in order
+results = mn.send_many([(lights[0], [2, 300]), ("light45", {'Command': 3}), (dimmer, {'Level': 7}),
+                        (11, {'Command': 4, 'request_ack': False})], max_wait=100)
+assert [r for (_, r) in results][1:] == [SendResult(False, -40, None), results[2][1], SendResult(None, None, None)]
+assert results[0][1].acked and results[2][1].acked
+time.sleep(0.1)  # the last one doesn't wait for the base
+assert base.Sent[-4:] == [(10, True, 3, b'\x00\x02\x2c\x01'), (45, True, 3, b'\x03'),
+                          (10, True, 3, b'\x02\x07'), (11, False, 3, b'\x04')]
+assert not no_acks  # the results say what wasn't acked
+
+# other threads wait until the batch is done
+batch = threading.Thread(target=mn.send_many, args=([(light, [5]) for light in lights[:20]],))
+batch.start()
+time.sleep(0.05)
+assert lights[0].send(6) is True
+batch.join()
+assert [p for (_, _, _, p) in base.Sent[-21:]] == [b'\x00\x05'] + [b'\x05']*19 + [b'\x00\x06']
+
+try:
+    mn.send_many([(lights[0], [1]), ("light99", [1])])
+except ValueError:
+    pass
+else:
+    raise AssertionError("light99 doesn't exist")
+assert base.Sent[-1][3] == b'\x00\x06'  # nothing was sent
+mn.shut_down()
+
+print("---------------------------------------------"
+      "\nAll tests on send_many performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
@@ -0,0 +1,94 @@
+from moteinopy import MoteinoNetwork
+from moteinopy.moteino import BaseQueueLength
+from FakeBase import FakeBase
+import os
+import threading
+import time
+
+airtime = 0.02
+base = FakeBase(version=(3, 0), nodes=range(10, 30), airtime=airtime)
+mn = MoteinoNetwork(base.Port)
+assert mn.BaseSketchVersion == (3, 0) and mn._BaseV3
+nodes = [mn.add_node(node_id, "byte Command;") for node_id in range(10, 40)]
+no_acks = list()
+mn.bind_default(no_ack=no_acks.append)
+
+# every frame carries a seq and the report says which frame it is about
+assert nodes[0].send(1) is True
+assert nodes[25].send(1) is False
+assert base.Sent[-2:] == [(10, True, 3, b'\x01'), (35, True, 3, b'\x01')]
+assert 0 not in base.Seqs and len(set(base.Seqs)) == 2
+time.sleep(0.1)
+assert [d['send2id'] for d in no_acks] == [35]
+
+# sends from different threads wait in the base instead of for each other
+in_flight = list()
+
+
+def watch():
+    while not done.is_set():
+        in_flight.append(len(mn._AckTransactions))
+        time.sleep(0.002)
+
+results = dict()
+done = threading.Event()
+watcher = threading.Thread(target=watch)
+watcher.start()
+threads = [threading.Thread(target=lambda n: results.__setitem__(n.ID, n.send(2)), args=(node,))
+           for node in nodes[:24]]
+t = time.time()
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+elapsed = time.time() - t
+done.set()
+watcher.join()
+assert results == dict((node.ID, node.ID < 30) for node in nodes[:24]), results
+assert elapsed < 24*airtime + 0.3, elapsed
+assert base.Pipelined > 0 and max(in_flight) == BaseQueueLength
+
+# and so do the frames of a batch
+base.Pipelined = 0
+results = mn.send_many([(node, [3]) for node in nodes])
+assert [r.acked for (_, r) in results] == [node.ID < 30 for node in nodes]
+assert base.Pipelined > 0
+
+# seqs are picked as the frames of a batch are written, so a send that goes out
+# between them never gets one that a frame still in the base has
+base.Pipelined = 0
+del base.Seqs[:]
+batch_results = list()
+batch = threading.Thread(target=lambda: batch_results.extend(mn.send_many([(nodes[i % 20], [i & 0xff])
+                                                                           for i in range(300)])))
+batch.start()
+while len(base.Seqs) < 40:
+    time.sleep(0.001)
+assert nodes[0].send(9, priority='high') is True
+batch.join()
+assert len(batch_results) == 300 and all(r.acked for (_, r) in batch_results)
+assert all(seq not in base.Seqs[max(0, i - BaseQueueLength):i] for i, seq in enumerate(base.Seqs))
+
+# a report about another frame to the same node doesn't settle a send
+base.Nodes.discard(11)
+real_write = base.write
+
+
+def stale_first(data):
+    if base.Sent and base.Sent[-1][0] == 11:
+        seq = (base.Seqs[-1] + 100) % 255 + 1
+        real_write(base.Protocol.encode(bytearray((1, 11, True, base.RSSI + 0x7F, seq))))
+    real_write(data)
+base.write = stale_first
+assert nodes[1].send(4) is False
+base.write = real_write
+
+# frames written as they are still work
+mn.print2serial("0c010305")
+assert base.Sent[-1] == (12, True, 3, b'\x05') and base.Seqs[-1] == 0
+mn.shut_down()
+
+print("---------------------------------------------"
+      "\nAll tests on sequenced acks performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
@@ -0,0 +1,55 @@
+from moteinopy import MoteinoNetwork
+from moteinopy.writer import SerialWriter
+from FakeBase import FakeBase
+import os
+
+
+class Port(object):
+    def __init__(self):
+        self.Written = list()
+
+    def write(self, data):
+        self.Written.append(bytes(data))
+
+# queued frames are written together, through the same buffer every time
+port = Port()
+w = SerialWriter(port, size=16)
+buf = w._Buffer
+w.queue(b'abc')
+w.queue(b'defg')
+assert w.Queued == 7 and port.Written == []
+w.write(b'h')
+assert port.Written == [b'abcdefgh'] and w.Queued == 0
+w.queue(b'0123456789')
+w.queue(b'0123456789')  # doesn't fit with the one before
+assert port.Written[1:] == [b'0123456789'] and w.Queued == 10
+w.write(b'x'*20)  # larger than the buffer
+assert port.Written[2:] == [b'0123456789', b'x'*20]
+w.flush()
+assert len(port.Written) == 4 and w._Buffer is buf
+assert w.Frames == 6 and w.Writes == 4 and w.BytesWritten == 48
+assert w.BytesPerSecond > 0 and w.WritesPerSecond > 0
+w.reset_counters()
+assert w.Frames == w.Writes == w.BytesWritten == 0
+
+# send_many() writes the frames that fit in the base's buffer with one write
+base = FakeBase(nodes=range(10, 30), airtime=0.01)
+mn = MoteinoNetwork(base.Port)
+nodes = [mn.add_node(node_id, "byte Command;") for node_id in range(10, 30)]
+mn.Writer.reset_counters()
+results = mn.send_many([(node, [1]) for node in nodes])
+assert all(result.acked for (_, result) in results)
+assert mn.Writer.Frames == 20 and mn.Writer.Writes < 10, str(mn.Writer)
+# (send2id)(ack)(retries)(seq)(Command)
+assert mn.Writer.BytesWritten == sum(len(mn._Protocol.encode(bytearray((node.ID, 1, 3, 1, 1)))) for node in nodes)
+
+# a single send is a single write
+mn.Writer.reset_counters()
+assert nodes[0].send(2) is True
+assert mn.Writer.Frames == mn.Writer.Writes == 1
+mn.shut_down()
+
+print("---------------------------------------------"
+      "\nAll tests on the serial writer performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
@@ -0,0 +1,79 @@
+from moteinopy import MoteinoNetwork
+from moteinopy.dispatch import Dispatcher
+from FakeBase import FakeBase
+import os
+import random
+import threading
+import time
+
+# work under one key runs in order, under keys in different shards in parallel
+d = Dispatcher(workers=4)
+done = dict((key, list()) for key in range(8))
+for i in range(50):
+    for key in range(8):
+        d.submit_ordered(key, lambda key, i: (time.sleep(random.random()/1000), done[key].append(i)), key, i)
+d.stop()
+assert all(done[key] == list(range(50)) for key in done)
+
+barrier = threading.Barrier(2, timeout=1) if hasattr(threading, 'Barrier') else None
+if barrier is not None:
+    d = Dispatcher(workers=2)
+    assert d.shard(0) != d.shard(1)
+    d.submit_ordered(0, barrier.wait)
+    d.submit_ordered(1, barrier.wait)
+    d.stop()
+    assert d.Errors == 0  # both waited at the barrier at the same time
+
+# the assignment can be changed and there can be more shards than workers
+d = Dispatcher(workers=2, shards=6, shard_of=lambda key: key // 10)
+assert [d.shard(key) for key in (3, 15, 27, 61)] == [0, 1, 2, 0]
+running = list()
+d.submit_ordered(10, lambda: (running.append(1), time.sleep(0.1)))
+d.submit_ordered(30, lambda: running.append(3))  # shard 3 shares the worker with shard 1
+time.sleep(0.05)
+assert running == [1]
+d.stop()
+assert running == [1, 3]
+
+try:
+    Dispatcher(workers=3, shards=2)
+except ValueError:
+    pass
+else:
+    raise AssertionError("every worker should need a shard")
+
+# readings from each node reach the receive function in order
+base = FakeBase()
+mn = MoteinoNetwork(base.Port, dispatch_workers=3)
+received = dict()
+for node_id in (10, 11, 12, 13):
+    received[node_id] = list()
+    mn.add_node(node_id, "int Reading;").bind(
+        receive=lambda d: (time.sleep(random.random()/500), received[d['SenderID']].append(d['Reading'])))
+for i in range(50):
+    for node_id in (10, 11, 12, 13):
+        base.inject(node_id, bytearray((i, 0)))
+time.sleep(0.2)
+while mn.Dispatcher.QueueDepth:
+    time.sleep(0.05)
+time.sleep(0.1)
+assert all(readings == list(range(50)) for readings in received.values()), received
+
+# a receive function can send_and_receive() to a node in its own shard
+node14 = mn.add_node(14, "int Reading;")
+assert mn.Dispatcher.shard(14) == mn.Dispatcher.shard(11)
+base.Nodes.add(14)
+base.Responses[14] = lambda payload: b'\x2a\x00'
+answers = list()
+mn.nodes[11].bind(receive=lambda d: answers.append((node14.send_and_receive(1, max_wait=1000), time.time())))
+node14.bind(receive=lambda d: answers.append(None))
+start = time.time()
+base.inject(11, b'\x01\x00')
+time.sleep(0.3)
+assert len(answers) == 1 and answers[0][0]['Reading'] == 42 and answers[0][1] - start < 0.2, answers
+mn.shut_down()
+
+print("---------------------------------------------"
+      "\nAll tests on sharded dispatch performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
@@ -0,0 +1,35 @@
+from moteinopy import MoteinoNetwork, Struct
+import binascii
+import os
+
+s = Struct("int Command; byte Numbers[20]; unsigned long Uptime; byte mode:3; bool on:1; int Speed;")
+
+# only the mask (5 units -> 1 byte) and the given parts are sent
+assert s.encode_sparse({'Speed': 300}) == "102c01"
+assert s.decode_sparse(s.encode_sparse({'Speed': 300})) == {'Speed': 300}
+
+d = {'Command': -5, 'Uptime': 123456, 'mode': 5, 'on': True}
+assert s.decode_sparse(s.encode_sparse(d)) == d
+assert len(s.pack_sparse(d)) == 1 + 2 + 4 + 1
+
+try:
+    s.encode_sparse({'mode': 1})  # bitfields sharing a byte must come together
+except ValueError:
+    pass
+else:
+    raise AssertionError("a sparse update with only some of the bitfields should fail")
+
+mn = MoteinoNetwork("", init_base=False, base_id=100)
+node = mn.add_node(10, "int Command; byte Numbers[20]; int Speed;")
+node.add_translation('Command', ('go', 1))
+node.sparse_updates = True
+sent = list()
+mn._write2serial = lambda frame, *args, **kwargs: sent.append(binascii.hexlify(frame[3:]).decode())
+node.send(Speed=300)
+node.send('go')
+assert sent == ["042c01", "010100"]
+
+print("---------------------------------------------"
+      "\nAll tests on sparse updates performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
@@ -0,0 +1,48 @@
+"""
+Compares the per frame cost of the compiled Struct codec against the old
+way of encoding and decoding one DataType at a time.
+
+run with: python Tests/StructBenchmark.py
+"""
+import timeit
+from moteinopy import Struct
+
+s = Struct("int Command; byte Numbers[8]; unsigned long Uptime; int Temperature; bool Door; char Name[8];")
+values = {'Command': 99, 'Numbers': [i*i for i in range(8)], 'Uptime': 123456789,
+          'Temperature': -12, 'Door': True, 'Name': "kitchen"}
+frame = s.encode(values).encode('ascii')
+
+
+def legacy_encode(d):
+    returner = str()
+    for (Type, Name) in s.Parts:
+        if Name in d:
+            returner += Type.hexprints(d[Name])
+        else:
+            returner += Type.hexprints()
+    while len(returner) > 2 and returner[-2:] == "00":
+        returner = returner[:-2]
+    return returner
+
+
+def legacy_decode(h):
+    if len(h) < s.LengthInHex:
+        h = h + ("0"*(s.LengthInHex - len(h))).encode('ascii')
+    returner = dict()
+    for (Type, Name) in s.Parts:
+        returner[Name] = Type.hex2dec(h[:2*Type.NofBytes])
+        h = h[2*Type.NofBytes:]
+    return returner
+
+
+def bench(name, legacy, compiled, n=20000):
+    t_legacy = min(timeit.repeat(legacy, number=n, repeat=7))/n
+    t_compiled = min(timeit.repeat(compiled, number=n, repeat=7))/n
+    print("{:8s} legacy: {:7.2f} us/frame   compiled: {:7.2f} us/frame   speedup: {:5.1f}x"
+          "".format(name, t_legacy*1e6, t_compiled*1e6, t_legacy/t_compiled))
+
+
+if __name__ == '__main__':
+    print(str(s) + ", " + str(s.NofBytes) + " bytes")
+    bench("encode", lambda: legacy_encode(values), lambda: s.encode(values))
+    bench("decode", lambda: legacy_decode(frame), lambda: s.decode(frame))
@@ -0,0 +1,71 @@
+from moteinopy import Struct, get_struct
+from random import randint as r
+
+
+def legacy_encode(s, d):
+    # the way Struct.encode used to do it, one DataType.hexprints() per part
+    returner = str()
+    for (Type, Name) in s.Parts:
+        if Name in d:
+            returner += Type.hexprints(d[Name])
+        else:
+            returner += Type.hexprints()
+    while len(returner) > 2 and returner[-2:] == "00":
+        returner = returner[:-2]
+    return returner
+
+
+s = Struct("int a; byte b[3]; char c[4]; unsigned long d; long e; bool f; char g; unsigned int h; bool i[2];")
+assert s.NofBytes == 23
+assert s.LengthInHex == 46
+
+for _ in range(200):
+    d = {'a': r(-2**15, 2**15 - 1),
+         'b': [r(0, 255) for _ in range(r(0, 3))],
+         'c': "".join([chr(r(32, 126)) for _ in range(4)]),
+         'd': r(0, 2**32 - 1),
+         'e': r(-2**31 + 1, 2**31 - 1),
+         'f': r(0, 1) == 1,
+         'g': chr(r(33, 126)),
+         'h': r(0, 2**16 - 1),
+         'i': [r(0, 1) == 1, r(0, 1) == 1]}
+    for key in list(d.keys()):
+        if key != 'i' and r(0, 3) == 0:
+            del d[key]
+
+    e = s.encode(d)
+    assert e == legacy_encode(s, d)
+
+    v = s.decode(e)
+    assert v == s.decode(e.encode('ascii'))
+    assert v == s.unpack(s.pack(d))
+    for key in d:
+        if key == 'b':
+            assert v[key][:len(d[key])] == d[key]
+        elif key == 'g':  # a single char is received as an int
+            assert v[key] == ord(d[key])
+        else:
+            assert v[key] == d[key]
+
+# values that don't fit should raise ValueError naming the part
+for bad in [{'a': 2**15}, {'a': "on"}, {'b': [1, 2, 3, 4]}, {'c': "too long"},
+            {'a': True}, {'d': 1.0}, {'f': 1}, {'b': [True]}, {'i': [1, 0]}, {'g': 65}]:
+    try:
+        s.encode(bad)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("encoding " + str(bad) + " should have failed")
+
+# frames longer than the struct are cut and shorter ones padded with zeros
+assert s.decode("0100")['a'] == 1
+assert s.unpack(s.pack({'h': 5}) + b'\x01\x02')['h'] == 5
+
+# structs with the same layout are shared
+assert get_struct("int a;byte  b [3]") is get_struct("int a; byte b[3];")
+assert get_struct("int a; byte b[3]").StructString == "int a; byte b[3];"
+assert get_struct("int a;") is not get_struct("int b;")
+
+print("---------------------------------------------"
+      "\nAll tests on Struct performed successfully"
+      "\n---------------------------------------------")
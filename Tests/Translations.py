@@ -0,0 +1,41 @@
+from moteinopy import MoteinoNetwork
+import gc
+import os
+
+mn = MoteinoNetwork("", init_base=False, base_id=100)
+
+mn.add_global_translation('Command', ('one', 1), ('two', 2))
+node1 = mn.add_node(1, "int Command; int a;")
+node2 = mn.add_node(2, "int Command; int a;")
+node3 = mn.add_node(3, "int a;")
+
+# nodes with the same translations share the same table
+assert node1._CompiledTranslations[0][5] is node2._CompiledTranslations[0][5]
+# and a node whose struct doesn't contain the part pays nothing for it
+assert node3._CompiledTranslations is None
+
+s = node1.Struct
+t = node1._CompiledTranslations
+assert s.encode({'Command': 'two'}, t) == s.encode({'Command': 2})
+# translations don't inverse when they shouldn't
+assert s.encode({'Command': 1}, t) == s.encode({'Command': 1})
+# received values are translated
+assert s.decode(s.encode({'Command': 1, 'a': 1}), t) == {'Command': 'one', 'a': 1}
+
+# adding to a single node gives it its own table
+node1.add_translation('a', ('on', 1))
+assert node1._CompiledTranslations[0][5] is node2._CompiledTranslations[0][5]
+assert node1._CompiledTranslations[1][5] == {'on': 1}
+assert s.decode(s.encode({'Command': 'one', 'a': 'on'}, node1._CompiledTranslations),
+                node1._CompiledTranslations) == {'Command': 'one', 'a': 'on'}
+
+# tables that were replaced aren't kept
+for i in range(100):
+    node1.add_translation('a', ('number' + str(i), i + 2))
+gc.collect()
+assert len(mn._TranslationTables) == 2, len(mn._TranslationTables)
+
+print("---------------------------------------------"
+      "\nAll tests on translations performed successfully"
+      "\n---------------------------------------------")
+os._exit(0)
@@ -1,3 +1,7 @@
+import array
+import binascii
+import sys
+
 def _hexprints(n):
     """
     Returns a hex sting of length 2 that represents the number n
@@ -29,10 +33,66 @@ def _hex2dec(s):
         return int(s, base=16)
 
 
+# Arrays are encoded and decoded with array.array, the payload is little endian
+_big_endian = sys.byteorder == 'big'
+# typecode of a 4 byte int for array.array
+_long_typecode = 'i' if array.array('i').itemsize == 4 else 'l'
+
+if sys.version_info[0] < 3:
+    def _array2bytes(a):
+        return a.tostring()
+else:
+    def _array2bytes(a):
+        return a.tobytes()
+
+
+def _bytes2int(b):
+    """
+    returns the int that the little endian bytes b represent
+    """
+    if not b:
+        return 0
+    return int(binascii.hexlify(b[::-1]), 16)
+
+
+def _int2bytes(i, n):
+    """
+    returns the non negative int i as n little endian bytes
+    """
+    return binascii.unhexlify('%0*x' % (2*n, i))[::-1]
+
+
+def _checked(return_type):
+    """
+    Returns a ToStruct that only lets values of return_type through, the same
+    check as DataType.hexprints() (so e.g. a bool isn't packed as an int)
+    """
+    def to_struct(i):
+        if type(i) is not return_type:
+            raise ValueError("Wrong Datatype, expected " + str(return_type) + " but got " + str(type(i)))
+        return i
+    return to_struct
+
+
 class DataType(object):
     NofBytes = None
     ReturnType = None
 
+    # Used by moteino.Struct to compile a whole struct into a single
+    # struct module format. Format is the little endian format code,
+    # Count is how many items it packs into and Default is the packed
+    # value used when a part is not given. ToStruct and FromStruct convert
+    # values to and from what the struct module expects, None means no
+    # conversion is needed. DType is the matching numpy dtype and TypeCode
+    # the matching array.array typecode, used by Array.
+    Format = None
+    DType = None
+    TypeCode = None
+    Count = 1
+    Default = 0
+    ToStruct = None
+    FromStruct = None
+
     @staticmethod
     def hex(i):
         pass
@@ -52,6 +112,10 @@ class Byte(DataType):
     """
     NofBytes = 1
     ReturnType = int
+    Format = 'B'
+    DType = 'u1'
+    TypeCode = 'B'
+    ToStruct = staticmethod(_checked(int))
 
     @staticmethod
     def hex(i=None):
@@ -69,6 +133,11 @@ class Byte(DataType):
 class Char(DataType):
     ReturnType = str
     NofBytes = 1
+    Format = 'B'
+    DType = 'u1'
+    TypeCode = 'B'
+    Default = ord('0')
+    ToStruct = staticmethod(ord)  # a single char is given as a str but received as an int, like hex2dec()
 
     @staticmethod
     def hex(i=None):
@@ -89,6 +158,10 @@ class UnsignedInt(DataType):
     """
     NofBytes = 2
     ReturnType = int
+    Format = 'H'
+    DType = '<u2'
+    TypeCode = 'H'
+    ToStruct = staticmethod(_checked(int))
 
     @staticmethod
     def hex(i=None):
@@ -106,6 +179,10 @@ class UnsignedInt(DataType):
 class Int(DataType):
     NofBytes = 2
     ReturnType = int
+    Format = 'h'
+    DType = '<i2'
+    TypeCode = 'h'
+    ToStruct = staticmethod(_checked(int))
 
     @staticmethod
     def hex(i=None):
@@ -129,6 +206,10 @@ class Int(DataType):
 class UnsignedLong(DataType):
     NofBytes = 4
     ReturnType = int
+    Format = 'I'
+    DType = '<u4'
+    TypeCode = _long_typecode.upper()
+    ToStruct = staticmethod(_checked(int))
 
     @staticmethod
     def hex(i=None):
@@ -154,6 +235,10 @@ class UnsignedLong(DataType):
 class Long(DataType):
     NofBytes = 4
     ReturnType = int
+    Format = 'i'
+    DType = '<i4'
+    TypeCode = _long_typecode
+    ToStruct = staticmethod(_checked(int))
 
     @staticmethod
     def hex(i=None):
@@ -184,6 +269,11 @@ class Long(DataType):
 class Bool(DataType):
     NofBytes = 1
     ReturnType = bool
+    Format = '?'
+    DType = '?'
+    TypeCode = 'B'
+    Default = False
+    ToStruct = staticmethod(_checked(bool))
 
     @staticmethod
     def hex(i=None):
@@ -221,40 +311,163 @@ class Array(DataType):
             self.ReturnType = list
         self.N = n
         self.NofBytes = subtype.NofBytes*n
+        if self.ReturnType is str:
+            # char arrays are packed as a single string
+            self.Format = str(n) + 's'
+            self.DType = 'S' + str(n)
+            self.Default = b' '*n
+        else:
+            self.Format = str(n) + subtype.Format
+            self.DType = (subtype.DType, (n,))
+            self.Count = n
+            self.Default = subtype.Default
+
+    def ToStruct(self, l):
+        if self.ReturnType is str:
+            if len(l) > self.N:
+                raise ValueError("Array.ToStruct() got " + str(len(l)) + " characters but only room for " +
+                                 str(self.N))
+            if not isinstance(l, bytes):
+                l = l.encode('latin-1')
+            return l.ljust(self.N, b' ')
+        if len(l) > self.N:
+            raise ValueError("Array.ToStruct() got " + str(len(l)) + " elements but only room for " +
+                             str(self.N))
+        return_type = self.SubType.ReturnType
+        for L in l:
+            if type(L) is not return_type:
+                raise ValueError("Wrong Datatype, expected " + str(return_type) + " but got " + str(type(L)))
+        return list(l) + [self.Default]*(self.N - len(l))
+
+    def FromStruct(self, t):
+        if self.ReturnType is str:
+            return t.decode('latin-1')
+        if self.SubType.FromStruct is not None:
+            return [self.SubType.FromStruct(T) for T in t]
+        return list(t)
 
     def hexprints(self, l=None):
+        """
+        Encodes the whole array at once, char arrays straight from the string
+        and other arrays through array.array
+        """
+        if not l:
+            l = self.ReturnType()
+        if len(l) > self.N:
+            raise ValueError("Array.hexprints() got " + str(len(l)) + " elements but only room for " +
+                             str(self.N))
+        if self.ReturnType is str:
+            return binascii.hexlify(self.ToStruct(l)).decode('ascii')
+        l = [self.SubType.ToStruct(L) for L in l]  # the same type check as each element's hexprints()
+        try:
+            a = array.array(self.SubType.TypeCode, l)
+        except (OverflowError, TypeError) as e:
+            raise ValueError("Array.hexprints() couldn't fit " + str(l) + " into " + str(self.N) + " " +
+                             self.SubType.__class__.__name__ + ", " + str(e))
+        if len(l) < self.N:
+            a.extend([0]*(self.N - len(l)))
+        if _big_endian:
+            a.byteswap()
+        return binascii.hexlify(_array2bytes(a)).decode('ascii')
 
+    def hex2dec(self, s):
+        """
+        Decodes the whole array at once, char arrays straight into a string
+        and other arrays through array.array
+        """
+        raw = binascii.unhexlify(s[:2*self.NofBytes])
         if self.ReturnType is str:
-            returner = str()
-            if not l:
-                l = str()
-            while len(l) < self.N:
-                l += " "
-            for L in l:
-                returner += self.SubType.hexprints(L)
-            return returner
+            return raw.decode('latin-1')
+        a = array.array(self.SubType.TypeCode, raw)
+        if _big_endian:
+            a.byteswap()
+        if self.SubType.ReturnType is bool:
+            return [L != 0 for L in a]
+        return a.tolist()
+
+class BitField(DataType):
+    """
+    A class to describe a bitfield, e.g. "byte mode:3;" or "bool flags[8]:1;"
+
+    A bitfield only takes Bits bits (per element if it is an array). moteino.Struct
+    packs consecutive bitfields tightly together, least significant bit first,
+    the same way avr-gcc lays out bitfields. Arrays of bitfields are not valid C
+    so the node has to pick those bits out itself.
+    """
+    Count = 0  # tells moteino.Struct that this part shares bytes with other bitfields
+
+    def __init__(self, subtype, bits, n=None):
+        if subtype.ReturnType not in (int, bool):
+            raise ValueError("problem in BitField.__init__(), " + subtype.__class__.__name__ +
+                             " can't be a bitfield")
+        if not 0 < bits <= 8*subtype.NofBytes:
+            raise ValueError("problem in BitField.__init__(), a " + subtype.__class__.__name__ +
+                             " bitfield can't have " + str(bits) + " bits")
+        self.SubType = subtype
+        self.Bits = bits
+        self.N = n
+        self.Width = bits*(n or 1)
+        self.NofBytes = (self.Width + 7)//8
+        if n is None:
+            self.ReturnType = subtype.ReturnType
+            self.DType = subtype.DType
+        else:
+            self.ReturnType = list
+            self.DType = (subtype.DType, (n,))
+        self._Mask = 2**bits - 1
+        self._Signed = subtype.Format in ('h', 'i')
+        if self._Signed:
+            self._Min, self._Max = -2**(bits - 1), 2**(bits - 1) - 1
         else:
-            returner = str()
-            if not l:
-                l = list()
-            while len(l) < self.N:
-                l.append(0)
-            for L in l:
-                returner += self.SubType.hexprints(L)
-            return returner
+            self._Min, self._Max = 0, self._Mask
+
+    def _element2bits(self, i):
+        if self.SubType.ReturnType is bool:
+            if type(i) is not bool:
+                raise ValueError("BitField expected bool but got " + str(type(i)))
+        elif type(i) is not int:
+            raise ValueError("BitField expected int but got " + str(type(i)))
+        if not self._Min <= i <= self._Max:
+            raise ValueError(str(i) + " doesn't fit in a " + str(self.Bits) + " bit " +
+                             self.SubType.__class__.__name__)
+        return i & self._Mask
+
+    def _bits2element(self, i):
+        i &= self._Mask
+        if self.SubType.ReturnType is bool:
+            return i != 0
+        if self._Signed and i > self._Max:
+            i -= 2**self.Bits
+        return i
+
+    def ToStruct(self, value):
+        """
+        returns the value as an unshifted int of Width bits
+        """
+        if self.N is None:
+            return self._element2bits(value)
+        if len(value) > self.N:
+            raise ValueError("BitField got " + str(len(value)) + " elements but only room for " + str(self.N))
+        returner = 0
+        for k, v in enumerate(value):
+            returner |= self._element2bits(v) << (k*self.Bits)
+        return returner
+
+    def FromStruct(self, i):
+        """
+        returns the value represented by the lowest Width bits of i
+        """
+        if self.N is None:
+            return self._bits2element(i)
+        return [self._bits2element(i >> (k*self.Bits)) for k in range(self.N)]
+
+    def hexprints(self, value=None):
+        if value is None:
+            value = [] if self.N else self.SubType.ReturnType()
+        return binascii.hexlify(_int2bytes(self.ToStruct(value), self.NofBytes)).decode('ascii')
 
     def hex2dec(self, s):
-        returner = list()
-        for i in range(self.N):
-            returner.append(self.SubType.hex2dec(s[:self.SubType.NofBytes*2]))
-            s = s[self.SubType.NofBytes*2:]
-        if type(self.SubType) is Char:
-            return_str = str()
-            for i in returner:
-                return_str += chr(i)
-            return return_str
-        else:
-            return returner
+        return self.FromStruct(_bytes2int(binascii.unhexlify(s[:2*self.NofBytes])))
 
 # a dictionary of known datatypes to more easily call them
 types = {
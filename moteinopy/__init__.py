@@ -1,3 +1,4 @@
 # from moteinopyCode.moteino import MoteinoNetwork
 import moteinopy.DataTypes as DataTypes
-from moteinopy.moteino import MoteinoNetwork, Struct, look_for_base
+from moteinopy.moteino import MoteinoNetwork, Struct, get_struct, look_for_base
+from moteinopy.multibase import MultiBaseNetwork
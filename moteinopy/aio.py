@@ -0,0 +1,324 @@
+"""
+An asyncio version of MoteinoNetwork, Python 3.5 and newer only:
+
+    network = await AsyncMoteinoNetwork.create('/dev/ttyUSB0')
+    node = network.add_node(10, "int Command; int Temperature;", "node1")
+    acked = await network.send(node, Command=1)
+    answer = await network.send_and_receive("node1", Command=2)
+    async for record in network:
+        print(record)
+
+The serial port is read through the event loop (loop.add_reader()) so
+waiting for acks and answers takes no threads, however many coroutines are
+waiting. Nodes, messages, structs and translations are the same as with
+MoteinoNetwork but received frames go to the async iterator instead of the
+receive functions, and sends return their results instead of calling the
+ack and no_ack functions. Sends wait for room in the base the same way as
+with MoteinoNetwork, for its reports with BaseSketch v3.0 or paced with older
+ones, without blocking the loop, and take their turns from the network's
+Scheduler along with the blocking ones (priority= and deadline= work the
+same). The blocking sends (Node.send(), send_async(),
+send_many(), ...) work as well but not from the event loop's thread, which
+they would block.
+"""
+import asyncio
+import functools
+import logging
+import threading
+import time
+from moteinopy import moteino
+from moteinopy.moteino import MoteinoNetwork, BaseQueueLength, handle_frame, parse_frame
+
+__author__ = 'SteinarrHrafn'
+
+logger = logging.getLogger(__name__)
+
+_current_task = getattr(asyncio, 'current_task', None) or asyncio.Task.current_task
+
+
+def _resolve(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+class _Transaction(moteino._Transaction):
+    """
+    A send that a coroutine is waiting on, AckFuture and ResponseFuture are
+    resolved along with the events (the frames are handled in the event loop)
+    """
+    def __init__(self, loop, node_id, request_ack, diction, response_expected, **options):
+        moteino._Transaction.__init__(self, node_id, request_ack, diction, response_expected, callbacks=False,
+                                      **options)
+        self.AckFuture = loop.create_future()
+        self.ResponseFuture = loop.create_future() if response_expected else None
+
+    def resolve_ack(self, acked, rssi):
+        moteino._Transaction.resolve_ack(self, acked, rssi)
+        if not self.AckFuture.done():
+            self.AckFuture.set_result(self.Acked)
+
+    def resolve_response(self, d):
+        moteino._Transaction.resolve_response(self, d)
+        if not self.ResponseFuture.done():
+            self.ResponseFuture.set_result(d)
+
+
+class AsyncMoteinoNetwork(MoteinoNetwork):
+    """
+    Takes the same arguments as MoteinoNetwork (but needs a real serial port)
+    as well as:
+
+            loop - the event loop to read the serial port in, default is the current one
+
+            receive_queue_size - default is 1000, how many received records can wait
+                                 for the async iterator, the oldest ones are dropped
+                                 (and counted in network.Dropped) after that
+
+    Initiating the base blocks for a while so use
+    await AsyncMoteinoNetwork.create(port, ...) which does it in an executor.
+    """
+    def __init__(self, port, loop=None, receive_queue_size=1000, **kwargs):
+        if not port:
+            raise ValueError("AsyncMoteinoNetwork needs a serial port to read through the event loop")
+        self._Loop = loop or asyncio.get_event_loop()
+        self._ReceiveQueueSize = receive_queue_size
+        self._Received = None
+        self._WindowOpened = None
+        self._LoopThread = None
+        self._Reading = False
+        self.Dropped = 0
+        # the dispatcher isn't used, the event loop does its work
+        kwargs.setdefault('dispatch_workers', 1)
+        MoteinoNetwork.__init__(self, port, **kwargs)
+
+    @classmethod
+    async def create(cls, port, **kwargs):
+        """
+        Creates the network in an executor, since initiating the base blocks
+        :return: AsyncMoteinoNetwork
+        """
+        loop = asyncio.get_event_loop()
+        kwargs.setdefault('loop', loop)
+        network = await loop.run_in_executor(None, functools.partial(cls, port, **kwargs))
+        await asyncio.sleep(0)  # let the reader be added
+        return network
+
+    def start_listening(self):
+        self._Loop.call_soon_threadsafe(self._start_reading)
+
+    def _start_reading(self):
+        if self._Reading:
+            return
+        self._Received = asyncio.Queue(self._ReceiveQueueSize)
+        self._WindowOpened = asyncio.Event()
+        self._LoopThread = threading.current_thread().ident
+        self._Serial.timeout = 0  # reads return what is waiting and never block the loop
+        self._Loop.add_reader(self._Serial.Serial.fileno(), self._read)
+        self._Reading = True
+        logger.debug("Reading the serial port through the event loop")
+
+    def stop_listening(self):
+        if self._Reading:
+            self._Reading = False
+            self._Loop.remove_reader(self._Serial.Serial.fileno())
+            self._Serial.close()
+            logger.info("Stopped reading the serial port")
+
+    def shut_down(self):
+        self.stop_listening()
+        self.Dispatcher.stop(timeout=1)
+
+    def _read(self):
+        incoming = self._Serial.read(self._Serial.in_waiting or 1)
+        for frame in self._Protocol.feed(incoming):
+            if frame:
+                frame = parse_frame(self, frame)
+                if frame is not None:
+                    self._handle_frame(frame)
+
+    def _handle_frame(self, frame):
+        sender_id = frame.Sender
+        if sender_id == 0xFF or sender_id == self.Base.ID:
+            # the reports resolve the sends waiting for them, blocking ones as well
+            handle_frame(self, frame)
+            return
+        if sender_id not in self.nodes:
+            logger.warning("Received a frame from ID: " + str(sender_id) + " which is not a known node, "
+                           "the raw data was: " + repr(bytes(frame.Payload)))
+            return
+        self.RSSI = frame.RSSI
+        decoded = self.nodes[sender_id].decode_payload(frame.Payload, self.RSSI)
+        if decoded is None:
+            return
+        d = decoded[0]
+        if self._answer(sender_id, d, frame.Payload):
+            return
+        if self._Received.full():
+            self._Received.get_nowait()
+            self.Dropped += 1
+        self._Received.put_nowait(d)
+
+    def _write2serial(self, frame, max_wait=None, transaction=None, acquired=False):
+        if threading.current_thread().ident == self._LoopThread:
+            raise RuntimeError("A blocking send would block the event loop that its ack comes through, "
+                               "await network.send() or network.send_and_receive() instead")
+        return MoteinoNetwork._write2serial(self, frame, max_wait, transaction, acquired)
+
+    def _acked(self, node_id, seq=None):
+        transaction = MoteinoNetwork._acked(self, node_id, seq)
+        if transaction is not None:
+            self._WindowOpened.set()
+        return transaction
+
+    async def _await_turn(self, transaction):
+        """
+        The coroutine version of _acquire(), waits for the Scheduler to give transaction
+        its turn (resolving a future from whichever thread releases the serial port)
+        and marks it Stale if it doesn't
+        :return: bool, whether it got the turn
+        """
+        loop = self._Loop
+        key = transaction.NodeID if self._SendFairness == 'node' else _current_task()
+        granted = loop.create_future()
+        turn = self.Scheduler.request(lambda ok: loop.call_soon_threadsafe(_resolve, granted, ok),
+                                      key, transaction.Priority, transaction.Deadline)
+        if not turn.Granted:
+            timeout = None
+            if transaction.Deadline is not None:
+                timeout = max(0, transaction.Deadline - time.time())
+            try:
+                await asyncio.wait_for(asyncio.shield(granted), timeout)
+            except asyncio.TimeoutError:
+                self.Scheduler.cancel(turn)
+            except asyncio.CancelledError:
+                if not self.Scheduler.cancel(turn) and turn.Granted:
+                    self.Scheduler.release()
+                raise
+        if turn.Granted:
+            return True
+        logger.warning("Dropped " + str(transaction.Diction) + ", its deadline passed before its turn")
+        transaction.Stale = True
+        transaction.Acked = False
+        return False
+
+    async def _await_window(self):
+        """
+        The coroutine version of _wait_for_window(), waits until the base has room for another frame
+        :return: int, the number of frames the base hasn't reported on yet
+        """
+        while True:
+            with self._WindowCondition:
+                timeout = self._expire_flow_tokens()
+                if len(self._AckTransactions) < BaseQueueLength:
+                    return len(self._AckTransactions)
+                self._WindowOpened.clear()
+            # blocking sends in other threads that stop waiting don't set it
+            if timeout is None or timeout > self.default_max_wait/1000.:
+                timeout = self.default_max_wait/1000.
+            try:
+                await asyncio.wait_for(self._WindowOpened.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _await_pace(self, length, request_ack):
+        """
+        The coroutine version of _pace(), for bases older than BaseSketch v3.0
+        """
+        wait = self._pace_wait(length, request_ack)
+        while wait:
+            await asyncio.sleep(wait)
+            wait = self._pace_wait(length, request_ack)
+
+    async def _await_ack(self, transaction, max_wait):
+        """
+        Waits (at most max_wait) for the base to report whether transaction was acked
+        """
+        try:
+            await asyncio.wait_for(transaction.AckFuture, max_wait/1000.)
+        except asyncio.TimeoutError:
+            with self._WindowCondition:
+                if self._AckTransactions.get(transaction.Seq) is transaction:
+                    del self._AckTransactions[transaction.Seq]
+                    self._WindowCondition.notify_all()
+                    self._WindowOpened.set()
+        if not transaction.Acked:
+            transaction.Acked = False
+
+    async def _transact(self, node, args, kwargs, response_expected):
+        node, message = self._resolve_node(node)
+        frame, max_wait, request_ack, diction = node._frame(message, args, kwargs)
+        if max_wait is None:
+            max_wait = self.default_max_wait
+        deadline = kwargs.get('deadline')
+        if deadline is not None:
+            deadline = time.time() + deadline/float(1000)
+        transaction = _Transaction(self._Loop, node.ID, request_ack, diction, response_expected,
+                                   priority=node._priority(kwargs), deadline=deadline)
+        if response_expected:
+            # registered before writing, the answer can come before the ack is handled
+            with self._TransactionLock:
+                self._Transactions.append(transaction)
+        try:
+            ahead = 0
+            if not await self._await_turn(transaction):
+                return False, None
+            try:
+                if self._BaseV3:
+                    # every frame gets a seq, the base reports on each one when it is done with it
+                    ahead = await self._await_window()
+                data = self._encode(frame, transaction)
+                if not self._BaseV3:
+                    await self._await_pace(len(data), request_ack)
+                self._write_transaction(data, transaction)
+                if request_ack and not self._BaseV3:
+                    # older bases take one send at a time
+                    await self._await_ack(transaction, max_wait)
+            finally:
+                self.Scheduler.release()
+            if request_ack and self._BaseV3:
+                # the frames ahead of it in the base go first
+                await self._await_ack(transaction, max_wait*(1 + ahead))
+            if request_ack and not transaction.Acked:
+                logger.warning("No ack received when " + str(diction) + " was sent")
+                return False, None
+            if transaction.ResponseFuture is None:
+                return transaction.Acked, None
+            try:
+                return transaction.Acked, await asyncio.wait_for(transaction.ResponseFuture, max_wait/1000.)
+            except asyncio.TimeoutError:
+                return transaction.Acked, None
+        finally:
+            if response_expected:
+                with self._TransactionLock:
+                    self._Transactions.remove(transaction)
+
+    async def send(self, node, *args, **kwargs):
+        """
+        Sends to node (a Node, one of its Messages, a name or an ID),
+        takes the same arguments as Node.send()
+        :return: bool, whether an ack was received (None if none was requested)
+        """
+        acked, _ = await self._transact(node, args, kwargs, False)
+        return acked
+
+    async def send_and_receive(self, node, *args, **kwargs):
+        """
+        Sends to node and returns what it answers with,
+        or None if it doesn't answer within max_wait
+        :return: dict
+        """
+        _, response = await self._transact(node, args, kwargs, True)
+        return response
+
+    async def receive(self):
+        """
+        Waits for the next record that isn't an answer to send_and_receive()
+        :return: dict
+        """
+        return await self._Received.get()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.receive()
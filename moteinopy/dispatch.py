@@ -0,0 +1,184 @@
+"""
+Runs the work that comes in over the serial port (decoding frames and the
+receive, ack and no_ack functions) on a fixed pool of worker threads,
+instead of a new thread for every frame.
+"""
+import threading
+import logging
+from collections import deque
+
+__author__ = 'SteinarrHrafn'
+
+logger = logging.getLogger(__name__)
+
+
+class Dispatcher(object):
+    """
+    A fixed pool of worker threads fed through bounded queues, called shards.
+
+    Each shard is served by exactly one worker so work submitted with
+    submit_ordered() under the same key (the network uses the sender ID) is
+    run strictly in the order it was submitted, while work under keys in
+    other shards runs in parallel on the other workers. By default there are
+    as many shards as workers and a key goes to shard key % shards, pass
+    shard_of (a function of the key that returns a shard index) to change that.
+
+    When a shard is full the overflow policy decides what happens:
+        'block'       - submit() waits until there is room, so a slow receive
+                        function slows down reading from the serial port
+        'drop-oldest' - the oldest work waiting in the shard is thrown away
+        'drop-newest' - the work being submitted is thrown away
+
+    Counters: Submitted, Processed, Dropped and Errors (work that raised an
+    exception, which is logged), QueueDepth is the number of items waiting
+    right now and MaxQueueDepth the most there have been in one shard.
+    """
+    BLOCK = 'block'
+    DROP_OLDEST = 'drop-oldest'
+    DROP_NEWEST = 'drop-newest'
+    OverflowPolicies = (BLOCK, DROP_OLDEST, DROP_NEWEST)
+
+    def __init__(self, workers=4, max_queue=1000, overflow=BLOCK, name="moteinopy.Dispatcher",
+                 shards=None, shard_of=None):
+        """
+        :param workers: int
+        :param max_queue: int, for each shard
+        :param overflow: str, one of Dispatcher.OverflowPolicies
+        :param name: str
+        :param shards: int, default is one for each worker
+        :param shard_of: function, key -> shard index
+        """
+        if workers < 1:
+            raise ValueError("A Dispatcher needs at least one worker, not {}".format(workers))
+        if shards is None:
+            shards = workers
+        if shards < workers:
+            raise ValueError("Every worker needs a shard, {} shards are too few for {} workers"
+                             "".format(shards, workers))
+        if max_queue < 1:
+            raise ValueError("max_queue must be at least 1, not {}".format(max_queue))
+        if overflow not in self.OverflowPolicies:
+            raise ValueError("Unknown overflow policy '{}', use one of {}".format(overflow, self.OverflowPolicies))
+        self.MaxQueue = max_queue
+        self.Overflow = overflow
+        self.Shards = shards
+        self.shard_of = shard_of
+        self.Submitted = 0
+        self.Processed = 0
+        self.Dropped = 0
+        self.Errors = 0
+        self.MaxQueueDepth = 0
+        self._Queues = [deque() for _ in range(shards)]
+        self._Lock = threading.Lock()
+        # worker i serves shards i, i + workers, i + 2*workers, ...
+        self._NotEmpty = [threading.Condition(self._Lock) for _ in range(workers)]
+        self._NotFull = threading.Condition(self._Lock)
+        self._Next = 0  # for round robin over the shards in submit()
+        self._Stop = False
+        self._Workers = [threading.Thread(target=self._work, args=(i,), name=name + "-" + str(i))
+                         for i in range(workers)]
+        for worker in self._Workers:
+            worker.daemon = True
+            worker.start()
+
+    @property
+    def QueueDepth(self):
+        return sum(len(q) for q in self._Queues)
+
+    def shard(self, key):
+        """
+        Returns the index of the shard that work submitted under key goes to
+        """
+        if self.shard_of is not None:
+            return self.shard_of(key) % self.Shards
+        return key % self.Shards
+
+    def submit(self, function, *args):
+        """
+        Queues function(*args) to be run by one of the workers,
+        the shards take turns
+        :return: bool, False if it was dropped
+        """
+        with self._Lock:
+            shard = self._Next
+            self._Next = (shard + 1) % self.Shards
+        return self._submit(shard, function, args)
+
+    def submit_ordered(self, key, function, *args):
+        """
+        Queues function(*args) to be run after everything
+        that has been submitted under the same key
+        :return: bool, False if it was dropped
+        """
+        return self._submit(self.shard(key), function, args)
+
+    def _submit(self, shard, function, args):
+        queue = self._Queues[shard]
+        with self._Lock:
+            if self._Stop:
+                return False
+            self.Submitted += 1
+            if len(queue) >= self.MaxQueue:
+                if self.Overflow == self.DROP_NEWEST:
+                    self.Dropped += 1
+                    logger.warning("Dispatcher shard {} is full, dropped {}".format(shard, repr(function)))
+                    return False
+                elif self.Overflow == self.DROP_OLDEST:
+                    dropped = queue.popleft()
+                    self.Dropped += 1
+                    logger.warning("Dispatcher shard {} is full, dropped {}".format(shard, repr(dropped[0])))
+                else:
+                    while len(queue) >= self.MaxQueue and not self._Stop:
+                        self._NotFull.wait()
+                    if self._Stop:
+                        return False
+            queue.append((function, args))
+            self.MaxQueueDepth = max(self.MaxQueueDepth, len(queue))
+            self._NotEmpty[shard % len(self._Workers)].notify()
+        return True
+
+    def _work(self, i):
+        queues = self._Queues[i::len(self._Workers)]
+        not_empty = self._NotEmpty[i]
+        turn = 0
+        while True:
+            with self._Lock:
+                while not any(queues) and not self._Stop:
+                    not_empty.wait()
+                if not any(queues):
+                    return
+                # the worker's shards take turns so a busy one doesn't starve the others
+                while not queues[turn % len(queues)]:
+                    turn += 1
+                function, args = queues[turn % len(queues)].popleft()
+                turn += 1
+                self._NotFull.notify_all()
+            failed = False
+            try:
+                function(*args)
+            except Exception:
+                failed = True
+                logger.exception("Exception in " + repr(function))
+            with self._Lock:
+                self.Processed += 1
+                self.Errors += failed
+
+    def stop(self, timeout=None):
+        """
+        Stops taking work, the workers finish what is queued and then stop
+        :param timeout: float, seconds to wait for each worker
+        """
+        with self._Lock:
+            self._Stop = True
+            for not_empty in self._NotEmpty:
+                not_empty.notify_all()
+            self._NotFull.notify_all()
+        current = threading.current_thread()
+        for worker in self._Workers:
+            if worker is not current:
+                worker.join(timeout)
+
+    def __str__(self):
+        return "Dispatcher({} workers, {} shards, queue {}/{} each, {} submitted, {} processed, " \
+               "{} dropped, {} errors)".format(len(self._Workers), self.Shards, self.QueueDepth, self.MaxQueue,
+                                               self.Submitted, self.Processed, self.Dropped, self.Errors)
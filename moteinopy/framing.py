@@ -0,0 +1,223 @@
+"""
+The protocols spoken between moteinopy and the base over the serial port.
+
+Both protocols carry the same frames, the BaseSketch explains their contents:
+    to the base:    (send2id)(ack_requested)(retries)(payload)
+    from the base:  (senderID)(send2id)(rssi)(payload)
+
+HexProtocol is the original one, every byte is sent as two HEX characters and
+each frame is a line. CobsProtocol (BaseSketch v3.0) sends the bytes
+themselves followed by a CRC16 and COBS encodes the lot so that a zero byte
+only ever marks the end of a frame. That halves the traffic and corrupted
+frames are dropped instead of being handed to the nodes.
+
+Both keep what they have been fed in one buffer that is reused, and each
+complete frame is validated and decoded in one go. The network then turns
+the frames from the base into Frames.
+"""
+import binascii
+import logging
+import struct
+
+__author__ = 'SteinarrHrafn'
+
+logger = logging.getLogger(__name__)
+
+
+def crc16(data, crc=0xFFFF):
+    """
+    CRC-16/CCITT-FALSE (polynomial 0x1021, initial value 0xFFFF),
+    the same as _crc_xmodem_update() from avr-libc starting at 0xFFFF
+    :param data: bytes
+    :param crc: int
+    :return: int
+    """
+    return binascii.crc_hqx(bytes(data), crc)
+
+
+def cobs_encode(data):
+    """
+    Consistent Overhead Byte Stuffing, returns data without any zero bytes
+    in it, one byte longer (plus one more for every 254 bytes without a zero).
+    :param data: bytes
+    :return: bytearray
+    """
+    returner = bytearray()
+    blocks = bytes(data).split(b'\x00')
+    last = len(blocks) - 1
+    for i, block in enumerate(blocks):
+        full = False
+        while len(block) >= 0xFE:
+            returner.append(0xFF)
+            returner += block[:0xFE]
+            block = block[0xFE:]
+            full = True
+        # a full block implies no zero, so it only needs an empty one after it if a zero follows
+        if block or not full or i < last:
+            returner.append(len(block) + 1)
+            returner += block
+    return returner
+
+
+def cobs_decode(data):
+    """
+    Reverses cobs_encode(), raises ValueError if data is not valid COBS
+    :param data: bytes
+    :return: bytearray
+    """
+    data = bytearray(data)
+    returner = bytearray()
+    i, n = 0, len(data)
+    while i < n:
+        code = data[i]
+        if code == 0 or i + code > n:
+            raise ValueError("invalid COBS block at byte {}".format(i))
+        block = data[i + 1:i + code]
+        if 0 in block:
+            raise ValueError("zero byte inside a COBS block")
+        returner += block
+        i += code
+        if code < 0xFF and i < n:
+            returner.append(0)
+    return returner
+
+
+class Frame(object):
+    """
+    A frame received by the base: who sent it (Sender), to whom (Target), the RSSI
+    in dBm and the Payload, a memoryview into the frame. The base's own reports
+    have no Target or RSSI.
+    """
+    __slots__ = ('Sender', 'Target', 'RSSI', 'Payload')
+
+    def __init__(self, sender, target, rssi, payload):
+        self.Sender = sender
+        self.Target = target
+        self.RSSI = rssi
+        self.Payload = payload
+
+    def __repr__(self):
+        return "Frame(sender={}, target={}, rssi={}, payload={!r})".format(self.Sender, self.Target, self.RSSI,
+                                                                           bytes(self.Payload))
+
+
+class HexProtocol(object):
+    """
+    Every byte as two HEX characters, frames end with a newline.
+    Lines that aren't HEX are logged as errors, the base only says
+    things like that when something is wrong.
+    """
+    Name = 'hex'
+    ID = 0
+
+    def __init__(self):
+        self._Buffer = bytearray()
+        self.Frames = 0
+        self.Errors = 0
+
+    def encode(self, frame):
+        """
+        :param frame: bytes
+        :return: bytes, ready to write to the serial port
+        """
+        return binascii.hexlify(bytes(frame)) + b'\n'
+
+    def feed(self, data):
+        """
+        Takes whatever was read from the serial port and returns
+        the frames that were completed by it
+        :param data: bytes
+        :return: list of bytearrays
+        """
+        buf = self._Buffer
+        buf += data
+        frames = list()
+        start = 0
+        end = buf.find(b'\n')
+        while end >= 0:
+            line = bytes(buf[start:end]).strip()
+            if line:
+                try:
+                    # checks that it is all HEX while decoding it
+                    frames.append(bytearray(binascii.unhexlify(line)))
+                except (TypeError, ValueError):  # binascii.Error is a ValueError
+                    self.Errors += 1
+                    logger.error("Serial port said: " + repr(line))
+            start = end + 1
+            end = buf.find(b'\n', start)
+        del buf[:start]
+        self.Frames += len(frames)
+        return frames
+
+
+class CobsProtocol(object):
+    """
+    (frame)(CRC16 of frame, little endian), COBS encoded and followed by a zero byte.
+    Frames that fail to decode or whose CRC doesn't match are logged and dropped.
+    """
+    Name = 'cobs'
+    ID = 1
+
+    # no frame is anywhere near this long, a buffer this long means the line is garbage
+    MaxFrameLength = 512
+
+    def __init__(self):
+        self._Buffer = bytearray()
+        self.Frames = 0
+        self.Errors = 0
+
+    def encode(self, frame):
+        """
+        :param frame: bytes
+        :return: bytes, ready to write to the serial port
+        """
+        frame = bytes(frame)
+        return bytes(cobs_encode(frame + struct.pack('<H', crc16(frame)))) + b'\x00'
+
+    def feed(self, data):
+        """
+        Takes whatever was read from the serial port and returns
+        the frames that were completed by it
+        :param data: bytes
+        :return: list of bytearrays
+        """
+        buf = self._Buffer
+        buf += data
+        frames = list()
+        start = 0
+        end = buf.find(b'\x00')
+        while end >= 0:
+            if end > start:
+                frame = self._decode(buf[start:end])
+                if frame is not None:
+                    frames.append(frame)
+            start = end + 1
+            end = buf.find(b'\x00', start)
+        del buf[:start]
+        if len(buf) > self.MaxFrameLength:
+            self.Errors += 1
+            logger.error("Dropped {} bytes from the serial port without a frame end".format(len(buf)))
+            del buf[:]
+        self.Frames += len(frames)
+        return frames
+
+    def _decode(self, chunk):
+        """
+        Returns the frame in chunk (everything between two zeros), or None if it's broken
+        """
+        try:
+            frame = cobs_decode(chunk)
+        except ValueError as e:
+            self.Errors += 1
+            logger.error("Dropped a frame from the serial port, " + str(e))
+            return None
+        if len(frame) < 2 or crc16(frame[:-2]) != struct.unpack('<H', bytes(frame[-2:]))[0]:
+            self.Errors += 1
+            logger.error("Dropped a frame from the serial port with a wrong CRC: " + repr(bytes(frame)))
+            return None
+        del frame[-2:]
+        return frame
+
+
+protocols = {HexProtocol.Name: HexProtocol,
+             CobsProtocol.Name: CobsProtocol}
@@ -1,17 +1,80 @@
 import serial
 import threading
 import time
+import struct
+import binascii
 import logging
 import sys
 import fcntl
 import signal
-from moteinopy.DataTypes import types, Array, Byte, Char, Bool
+import os
+import errno
+import weakref
+import heapq
+import itertools
+from collections import OrderedDict, namedtuple, deque
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # Python 2
+    from collections import MutableMapping
+from moteinopy.DataTypes import types, Array, BitField, Byte, Char, Bool, _bytes2int, _int2bytes
+from moteinopy.framing import protocols, HexProtocol, CobsProtocol, Frame
+from moteinopy.dispatch import Dispatcher
+from moteinopy.writer import SerialWriter
+from moteinopy.scheduler import SendScheduler
+try:
+    import selectors
+except ImportError:  # Python 2, the listener blocks in read() instead
+    selectors = None
+try:
+    import numpy
+except ImportError:  # numpy is only needed for Struct.decode_many()
+    numpy = None
+try:
+    from concurrent.futures import Future
+except ImportError:  # Python 2 needs the futures backport for send_async()
+    Future = None
 __author__ = 'SteinarrHrafn'
 
 logger = logging.getLogger(__name__)
 logging.basicConfig()
 
-CorrectBaseSketchWakeupSign = b"moteinopy basesketch v2.3"
+CorrectBaseSketchWakeupSign = b"moteinopy basesketch v3.0"
+
+# the BaseSketches moteinopy can work with, by their wakeup sign
+BaseSketchVersions = OrderedDict([(b"moteinopy basesketch v2.3", (2, 3)),
+                                  (b"moteinopy basesketch v3.0", (3, 0))])
+
+# the baudrates BaseSketch v3.0 can switch to, the base starts at the first one
+BaseBaudRates = (115200, 230400, 250000, 500000, 1000000)
+
+# what the base echoes back to check the serial link after switching baudrate
+BaudTestPattern = b'\x00\xff\x55\xaa' + bytes(bytearray(range(1, 125)))
+BaudTestTimeout = 1.0  # seconds, the BaseSketch gives up on a new baudrate after this
+
+# bytes, the serial receive buffer of the base, frames can wait there while it is sending
+BaseSerialBuffer = 64
+
+# frames, BaseSketch v3.0 queues this many and tags its ack reports with the frame's seq
+BaseQueueLength = 4
+
+# ms, about how long the base takes to send a frame without an ack request,
+# BaseSketch v2.3 doesn't say when it is done with those
+NoAckAirtime = 15
+
+# the type byte of a node's own struct once the node has messages as well, see Node.add_message()
+OwnStructTypeID = 0
+
+
+def base_protocols(version):
+    """
+    The names of the serial protocols a BaseSketch version speaks, best last
+    :param version: tuple
+    :return: tuple
+    """
+    if version >= (3, 0):
+        return HexProtocol.Name, CobsProtocol.Name
+    return HexProtocol.Name,
 
 # This is so that the code works in both 2.7 and 3.5
 if sys.version_info[0] < 3:  # Python 2?
@@ -54,8 +117,28 @@ class MySerial(object):
         self.isOpen = self.Serial.isOpen
         self.open = self.Serial.open
         self.close = self.Serial.close
-        self.in_waiting = self.Serial.in_waiting
         self.cancel_read = self.Serial.cancel_read
+        self.reset_input_buffer = self.Serial.reset_input_buffer
+
+    @property
+    def in_waiting(self):
+        return self.Serial.in_waiting
+
+    @property
+    def baudrate(self):
+        return self.Serial.baudrate
+
+    @baudrate.setter
+    def baudrate(self, baudrate):
+        self.Serial.baudrate = baudrate
+
+    @property
+    def timeout(self):
+        return self.Serial.timeout
+
+    @timeout.setter
+    def timeout(self, timeout):
+        self.Serial.timeout = timeout
 
     def write(self, s):
         if isinstance(s, unicode):
@@ -67,34 +150,62 @@ class MySerial(object):
 class FakeSerial(object):
     # fake Serial port to use for debugging, if the debugger doesn't have one
     # I recommend using com0com to fake serial ports though.
+    # Anything written to it can be read back 50ms later.
     def __init__(self):
         self.E = threading.Event()
-        self.S = ""
-
-    def read(self):
-        pass
+        self.S = b''
+        self.Lock = threading.Lock()
+        self.Closed = False
+
+    @property
+    def in_waiting(self):
+        return len(self.S)
+
+    def read(self, size=1):
+        while not self.S and not self.Closed:
+            self.E.wait()
+            self.E.clear()
+            time.sleep(0.05)
+        with self.Lock:
+            returner, self.S = self.S[:size], self.S[size:]
+        return returner
 
     def readline(self):
-        self.E.wait()
-        time.sleep(0.05)
-        self.E.clear()
-        return str(self.S)
+        returner = b''
+        while not returner.endswith(b'\n') and not self.Closed:
+            returner += self.read()
+        return returner
 
     def isOpen(self):
-        return True
+        return not self.Closed
 
     def open(self):
-        pass
+        self.Closed = False
 
     def close(self):
-        self.S = ''
+        self.cancel_read()
+
+    def cancel_read(self):
+        self.Closed = True
         self.E.set()
 
     def write(self, s):
-        self.S = s
+        if isinstance(s, unicode):
+            s = s.encode('ascii')
+        with self.Lock:
+            self.S += bytes(s)
         self.E.set()
 
 
+def _strip_zeros(raw):
+    """
+    Trailing zero bytes don't need to be sent, the receiving end fills them back in
+    :param raw: bytes
+    :return: bytes
+    """
+    return raw.rstrip(b'\x00') or raw[:1]
+
+
 class Struct(object):
     """
     This is a class for parsing a struct through a serial port
@@ -107,9 +218,11 @@ class Struct(object):
 
             incoming = mystruct.decode(str_from_serial)
 
+    Bitfields are declared like in C, e.g. "byte mode:3; bool flags[8]:1;",
+    see DataTypes.BitField
     """
     _disallowed_partnames = ['block', 'max_wait', 'expect_response', 'diction',
-                             'Sender', 'SenderName', 'RSSI', 'SenderID']
+                             'Sender', 'SenderName', 'RSSI', 'SenderID', 'MessageType']
 
     _UnsupportedDataTypeErrorString = "Struct definition string \"{}\" contains an error, maybe a" \
                                       " missing ';' or perhaps an unsupported datatype. " \
@@ -120,12 +233,20 @@ class Struct(object):
         self.NofBytes = 0
         self.StructString = structstring
         self._dissect_structstring(structstring)
-        self.LengthInHex = sum([2*part[0].NofBytes for part in self.Parts])
+        self._compile()
+        self.LengthInHex = 2*self.NofBytes
 
     def _dissect_structstring(self, structstring):
-        lines = structstring.rstrip(';').split(';')  # remove the last ';' and split by the other ones
+        # remove the last ';' and split by the other ones
+        lines = normalize_structstring(structstring).rstrip(';').split(';')
         for line in lines:
-            temp = line.rsplit(' ', 1)  # split by whitespaces
+            _bits = None
+            if ':' in line:  # a bitfield
+                line, _bits = line.rsplit(':', 1)
+                if not _bits.isdigit():
+                    raise ValueError(self._UnsupportedDataTypeErrorString.format(structstring))
+                _bits = int(_bits)
+            temp = line.strip().rsplit(' ', 1)  # split by whitespaces
             if '[' in temp[1]:  # if we are dealing with an array
                 ttemp = temp[1].split('[')
                 _typename = temp[0].strip()
@@ -139,76 +260,628 @@ class Struct(object):
                     raise ValueError(self._UnsupportedDataTypeErrorString.format(_typename))
                 _type = types[_typename]
                 _name = temp[1]
+            if _bits is not None:
+                if isinstance(_type, Array):
+                    _type = BitField(_type.SubType, _bits, _type.N)
+                else:
+                    _type = BitField(_type, _bits)
             if _name in self._disallowed_partnames:
                 raise ValueError(_name + " is not allowed as a variable name in a struct. ")
             self.Parts.append((_type, _name))
+        # structs are shared between nodes (see get_struct()) so don't let the parts change
+        self.Parts = tuple(self.Parts)
         # also store parts as a dict
         self.Parts_dict = dict()
         for (Type, Name) in self.Parts:
             self.Parts_dict[Name] = Type
 
+    def _compile(self):
+        """
+        Compiles the parts into a single little endian struct.Struct so that
+        encoding and decoding a whole payload is one pack() or unpack() call.
+        Every part maps to Count consecutive items of the packed tuple,
+        self._Fields holds (Name, Index, Count, ToStruct, FromStruct, Encode, Decode)
+        for each part, where Encode and Decode are translation lookup tables or None.
+
+        Consecutive bitfields share one item, a bytes string that is handled as
+        an int while packing and unpacking. Their Count is 0 and their ToStruct
+        and FromStruct shift the bits into and out of place.
+        """
+        _format = '<'
+        defaults = list()
+        self._Fields = list()
+        self._FieldCodecs = dict()
+        self._BitGroups = list()  # (Index, NofBytes, Offset, [(Type, Name, shift), ..])
+        group = None
+        for (Type, Name) in self.Parts:
+            if isinstance(Type, BitField):
+                if group is None:
+                    group = (len(defaults), 0, struct.calcsize(_format), list())
+                    defaults.append(0)
+                index, shift, offset, members = group
+                self._Fields.append((Name, index, 0,
+                                     lambda v, T=Type, shift=shift: T.ToStruct(v) << shift,
+                                     lambda i, T=Type, shift=shift: T.FromStruct(i >> shift),
+                                     None, None))
+                members.append((Type, Name, shift))
+                group = (index, shift + Type.Width, offset, members)
+                continue
+            if group is not None:
+                _format += self._close_bitgroup(group)
+                group = None
+            self._Fields.append((Name, len(defaults), Type.Count, Type.ToStruct, Type.FromStruct, None, None))
+            self._FieldCodecs[Name] = (struct.Struct('<' + Type.Format), struct.calcsize(_format),
+                                       Type.Count, Type.FromStruct)
+            _format += Type.Format
+            defaults.extend([Type.Default]*Type.Count)
+        if group is not None:
+            _format += self._close_bitgroup(group)
+        self._Codec = struct.Struct(_format)
+        self._Fields = tuple(self._Fields)
+        self._Defaults = tuple(defaults)
+        self.NofBytes = self._Codec.size
+        self._DType = None
+
+        # units that sparse updates are made of, a part or a group of bitfields
+        self._SparseUnits = list()  # (names, offset, NofBytes)
+        groups = dict((members[0][1], (members, offset, nofbytes))
+                      for (_, nofbytes, offset, members) in self._BitGroups)
+        for (Type, Name) in self.Parts:
+            if Name in groups:
+                members, offset, nofbytes = groups[Name]
+                self._SparseUnits.append((tuple(member[1] for member in members), offset, nofbytes))
+            elif not isinstance(Type, BitField):
+                codec, offset, _, _ = self._FieldCodecs[Name]
+                self._SparseUnits.append(((Name,), offset, codec.size))
+        self._SparseMaskBytes = (len(self._SparseUnits) + 7)//8
+
+    def _close_bitgroup(self, group):
+        """
+        Registers a group of consecutive bitfields, returns its format
+        """
+        index, bits, offset, members = group
+        nofbytes = (bits + 7)//8
+        _format = str(nofbytes) + 's'
+        self._BitGroups.append((index, nofbytes, offset, members))
+        for (_, Name, _), field in zip(members, self._Fields[-len(members):]):
+            self._FieldCodecs[Name] = (struct.Struct('<' + _format), offset, 0, field[4])
+        return _format
+
     def __str__(self):
         return "Struct(" + self.StructString + ")"
 
-    def encode(self, values_dict):
+    def compile_translations(self, tables):
         """
-        This function will encode the struct into a HEX string.
+        Merges translation tables into this struct's fields so that pack() and
+        unpack() can translate while they go through the parts.
+        Returns None if none of the tables concern this struct, that way
+        nodes without translations don't pay anything for them.
+
+        :param tables: dict of part name -> TranslationTable
+        :return: list or None
+        """
+        if not any(Name in tables for (_, Name) in self.Parts):
+            return None
+        fields = list()
+        for field in self._Fields:
+            if field[0] in tables:
+                table = tables[field[0]]
+                field = field[:5] + (table.Encode, table.Decode)
+            fields.append(field)
+        return fields
+
+    def _pack_error(self, items):
+        """
+        Called when packing failed, finds the part that didn't fit and raises a
+        ValueError naming it.
+        """
+        for (Type, Name), (_, index, count, _, _, _, _) in zip(self.Parts, self._Fields):
+            if count == 0:  # bitfields are checked by BitField.ToStruct()
+                continue
+            try:
+                struct.pack('<' + Type.Format, *items[index:index + count])
+            except struct.error as e:
+                raise ValueError(str(e) + " when parsing {}={}, perhaps a translation as gone awry?"
+                                 "".format(Name, items[index] if count == 1 else items[index:index + count]))
+        raise ValueError("Unable to pack " + str(items) + " into " + str(self))
+
+    def pack(self, values_dict, translations=None):
+        """
+        This function will pack the struct into bytes.
         Not all values of the struct must be contained in values_dict,
         those that are not present will be assumed to be 0
 
         :param values_dict: dict
-        :return: str
+        :param translations: list, as returned by compile_translations()
+        :return: bytes
         """
-        returner = str()
-        for (Type, Name) in self.Parts:
+        items = list(self._Defaults)
+        for (Name, index, count, to_struct, _, encode, _) in translations or self._Fields:
             if Name in values_dict:
-                # print(Type, Name, values_dict[Name])
-                try:
-                    returner += Type.hexprints(values_dict[Name])
-                except ValueError as e:
-                    reraise(type(e),
-                            type(e)(str(e) +
-                                    " when parsing {}={}, perhaps a translation as gone awry?"
-                                    "".format(Name, values_dict[Name])),
-                            sys.exc_info()[2])
-            else:
-                returner += Type.hexprints()  # hexprints() assumes value is 0
+                value = values_dict[Name]
+                if encode is not None:
+                    try:
+                        value = encode.get(value, value)
+                    except TypeError:  # unhashable, a list for an array
+                        pass
+                if to_struct is not None:
+                    try:
+                        value = to_struct(value)
+                    except (TypeError, ValueError) as e:
+                        reraise(ValueError,
+                                ValueError(str(e) +
+                                           " when parsing {}={}, perhaps a translation as gone awry?"
+                                           "".format(Name, value)),
+                                sys.exc_info()[2])
+                if count == 1:
+                    items[index] = value
+                elif count == 0:  # bitfield
+                    items[index] |= value
+                else:
+                    items[index:index + count] = value
+        for (index, nofbytes, _, _) in self._BitGroups:
+            items[index] = _int2bytes(items[index], nofbytes)
+        try:
+            return self._Codec.pack(*items)
+        except struct.error:
+            self._pack_error(items)
+
+    def unpack(self, raw, translations=None):
+        """
+        This function will unpack the struct from bytes and return a dict with
+        the corresponding values. Missing trailing bytes are assumed to be 0 and
+        anything beyond the length of the struct is ignored.
 
-        # don't return trailing pairs of zeroes
-        while len(returner) > 2 and returner[-2:] == "00":
-            returner = returner[:-2]
+        :param raw: bytes
+        :param translations: list, as returned by compile_translations()
+        :return: dict
+        """
+        if len(raw) < self.NofBytes:
+            raw = bytes(raw) + b'\x00'*(self.NofBytes - len(raw))
+        items = self._Codec.unpack_from(raw)
+        if self._BitGroups:
+            items = list(items)
+            for (index, _, _, _) in self._BitGroups:
+                items[index] = _bytes2int(items[index])
+        returner = dict()
+        for (Name, index, count, _, from_struct, _, decode) in translations or self._Fields:
+            if count <= 1:
+                value = items[index]
+            else:
+                value = items[index:index + count]
+            if from_struct is not None:
+                value = from_struct(value)
+            if decode is not None:
+                try:
+                    value = decode.get(value, value)
+                except TypeError:
+                    pass
+            returner[Name] = value
         return returner
 
-    def decode(self, s):
+    def unpack_field(self, raw, name, decode=None):
+        """
+        Unpacks a single part from raw, raw must be at least NofBytes long.
+        decode is the part's translation lookup table, if any.
+
+        :param raw: bytes
+        :param name: str
+        :param decode: dict
+        :return: object
+        """
+        codec, offset, count, from_struct = self._FieldCodecs[name]
+        items = codec.unpack_from(raw, offset)
+        if count == 0:  # bitfield
+            value = _bytes2int(items[0])
+        else:
+            value = items[0] if count == 1 else items
+        if from_struct is not None:
+            value = from_struct(value)
+        if decode is not None:
+            try:
+                value = decode.get(value, value)
+            except TypeError:
+                pass
+        return value
+
+    def pack_sparse(self, values_dict, translations=None):
+        """
+        Packs only the parts present in values_dict, as a sparse update:
+            (mask)(the present parts)
+        where bit i of the little endian mask says whether the i-th part is present.
+        Bitfields that share bytes count as one part and must be given together.
+
+        :param values_dict: dict
+        :param translations: list, as returned by compile_translations()
+        :return: bytes
+        """
+        raw = self.pack(values_dict, translations)
+        mask = 0
+        chunks = list()
+        for k, (names, offset, nofbytes) in enumerate(self._SparseUnits):
+            given = [name in values_dict for name in names]
+            if any(given):
+                if not all(given):
+                    raise ValueError("Bitfields " + str(names) + " share bytes so a sparse update "
+                                     "must contain all of them or none")
+                mask |= 1 << k
+                chunks.append(raw[offset:offset + nofbytes])
+        return _int2bytes(mask, self._SparseMaskBytes) + b''.join(chunks)
+
+    def unpack_sparse(self, raw, translations=None):
+        """
+        Unpacks a sparse update, see pack_sparse(), into a dict
+        with only the parts that were present.
+
+        :param raw: bytes
+        :param translations: list, as returned by compile_translations()
+        :return: dict
+        """
+        mask = _bytes2int(raw[:self._SparseMaskBytes])
+        position = self._SparseMaskBytes
+        full = bytearray(self.NofBytes)
+        present = list()
+        for k, (names, offset, nofbytes) in enumerate(self._SparseUnits):
+            if mask >> k & 1:
+                if position + nofbytes > len(raw):
+                    raise ValueError("sparse update is too short for its mask")
+                full[offset:offset + nofbytes] = raw[position:position + nofbytes]
+                position += nofbytes
+                present.extend(names)
+        d = self.unpack(bytes(full), translations)
+        return dict((name, d[name]) for name in present)
+
+    def encode_sparse(self, values_dict, translations=None):
+        """
+        Encodes a sparse update, see pack_sparse(), into a HEX string
+        :param values_dict: dict
+        :param translations: list, as returned by compile_translations()
+        :return: str
+        """
+        return binascii.hexlify(self.pack_sparse(values_dict, translations)).decode('ascii')
+
+    def decode_sparse(self, s, translations=None):
+        """
+        Decodes a sparse update, see pack_sparse(), from a HEX string
+        :param s: str
+        :param translations: list, as returned by compile_translations()
+        :return: dict
+        """
+        return self.unpack_sparse(binascii.unhexlify(s), translations)
+
+    def encode(self, values_dict, translations=None):
+        """
+        This function will encode the struct into a HEX string.
+        Not all values of the struct must be contained in values_dict,
+        those that are not present will be assumed to be 0
+
+        :param values_dict: dict
+        :param translations: list, as returned by compile_translations()
+        :return: str
+        """
+        return binascii.hexlify(_strip_zeros(self.pack(values_dict, translations))).decode('ascii')
+
+    def decode(self, s, translations=None):
         """
         This function will decode the struct recieved as a HEX string and return
         a dict with the corresponding values.
-        The input string must be sufficiently long to contain the entire struct
+        Missing trailing zeros are filled in.
 
         :param s: str
+        :param translations: list, as returned by compile_translations()
         :return: dict
         """
+        return self.unpack(binascii.unhexlify(s), translations)
 
-        # fill in missing trailing zeros
-        if len(s) < self.LengthInHex:
-            s = s + ("0"*(self.LengthInHex - len(s))).encode('ascii')
-        print("struct decode(", s, ")")
-        returner = dict()
+    @property
+    def dtype(self):
+        """
+        A numpy structured dtype with the same parts as the struct,
+        arrays become sub-arrays and char arrays become fixed length bytes.
+        Bitfields get the dtype of their type so with bitfields the dtype
+        doesn't have the same layout as the struct.
+        """
+        if self._DType is None:
+            if numpy is None:
+                raise ImportError("Struct.dtype requires numpy, install it with 'pip install numpy'")
+            self._DType = numpy.dtype([(str(Name), Type.DType) for (Type, Name) in self.Parts])
+        return self._DType
+
+    def decode_many(self, frames, raw=False):
+        """
+        Decodes many frames at once into a numpy structured array with one
+        record per frame, see Struct.dtype. Frames are HEX strings, as they
+        come from the serial port, unless raw is True in which case they are bytes.
+        Just like decode(), short frames are padded with zeros and long ones cut.
+        Translations are not applied.
+
+        :param frames: list
+        :param raw: bool
+        :return: numpy.ndarray
+        """
+        dtype = self.dtype
+        if raw:
+            n = self.NofBytes
+            buf = b''.join([bytes(f[:n]).ljust(n, b'\x00') for f in frames])
+        else:
+            n = self.LengthInHex
+            hex_frames = list()
+            for f in frames:
+                if isinstance(f, unicode):
+                    f = f.encode('ascii')
+                hex_frames.append(bytes(f[:n]).ljust(n, b'0'))
+            buf = binascii.unhexlify(b''.join(hex_frames))
+        if not self._BitGroups:
+            return numpy.frombuffer(bytearray(buf), dtype=dtype)
+
+        # unpack the bitfields column by column
+        raw_dtype = list()
+        groups = iter(self._BitGroups)
+        in_group = False
         for (Type, Name) in self.Parts:
-            returner[Name] = Type.hex2dec(s[:2*Type.NofBytes])
-            s = s[2*Type.NofBytes:]
+            if not isinstance(Type, BitField):
+                raw_dtype.append((str(Name), Type.DType))
+            elif not in_group:
+                raw_dtype.append(('_bits' + str(len(raw_dtype)), 'u1', (next(groups)[1],)))
+            in_group = isinstance(Type, BitField)
+        raw_array = numpy.frombuffer(bytearray(buf), dtype=numpy.dtype(raw_dtype))
+        returner = numpy.zeros(len(raw_array), dtype=dtype)
+        bits_columns = [name for name in raw_array.dtype.names if name.startswith('_bits')]
+        for name in raw_array.dtype.names:
+            if not name.startswith('_bits'):
+                returner[name] = raw_array[name]
+        for column, (_, _, _, members) in zip(bits_columns, self._BitGroups):
+            group_bytes = raw_array[column]
+            for (Type, Name, shift) in members:
+                if Type.N is None:
+                    returner[Name] = self._numpy_bitfield(Type, group_bytes, shift)
+                else:
+                    for k in range(Type.N):
+                        returner[Name][:, k] = self._numpy_bitfield(Type, group_bytes, shift + k*Type.Bits)
         return returner
 
+    @staticmethod
+    def _numpy_bitfield(Type, group_bytes, shift):
+        """
+        Picks a single bitfield element, Type.Bits bits at shift, out of every
+        row of the 2d uint8 array group_bytes
+        """
+        first, last = shift//8, (shift + Type.Bits - 1)//8
+        value = numpy.zeros(len(group_bytes), dtype=numpy.uint64)
+        for k, column in enumerate(range(first, last + 1)):
+            value |= group_bytes[:, column].astype(numpy.uint64) << numpy.uint64(8*k)
+        value = (value >> numpy.uint64(shift % 8)) & numpy.uint64(2**Type.Bits - 1)
+        if Type.SubType.ReturnType is bool:
+            return value != 0
+        value = value.astype(numpy.int64)
+        if Type._Signed:
+            value[value > Type._Max] -= 2**Type.Bits
+        return value
+
+
+def normalize_structstring(structstring):
+    """
+    Returns structstring with whitespace and semicolons normalized, so that
+    e.g. "int a;byte  b [3]" and "int a; byte b[3];" give the same string
+
+    :param structstring: str
+    :return: str
+    """
+    lines = list()
+    for line in structstring.split(';'):
+        line = ' '.join(line.split())
+        if line:
+            lines.append(line.replace(' [', '[').replace(' :', ':').replace(': ', ':'))
+    return '; '.join(lines) + ';'
+
+
+_struct_registry = dict()
+_struct_registry_lock = threading.Lock()
+
+
+def get_struct(structstring):
+    """
+    Returns the Struct for structstring. Structs are cached by their normalized
+    structstring so every node with the same layout shares the same Struct
+    instead of building its own.
+
+    :param structstring: str
+    :return: Struct
+    """
+    try:
+        return _struct_registry[structstring]
+    except KeyError:
+        pass
+    normalized = normalize_structstring(structstring)
+    with _struct_registry_lock:
+        if normalized not in _struct_registry:
+            _struct_registry[normalized] = Struct(normalized)
+        _struct_registry[structstring] = _struct_registry[normalized]
+    return _struct_registry[normalized]
+
+
+class Record(MutableMapping):
+    """
+    A dict compatible view of a received payload. Parts are only decoded
+    (and translated) when they are accessed for the first time so a receive
+    function that only reads one part only pays for that one.
+
+    Nodes hand these to their receive functions instead of a dict when
+    lazy_records is True, use dict(record) to get a plain dict.
+    """
+    def __init__(self, struct, raw, decode_tables=None):
+        """
+        :param struct: Struct
+        :param raw: bytes
+        :param decode_tables: dict of part name -> translation lookup table
+        """
+        if len(raw) < struct.NofBytes:
+            raw = bytes(raw) + b'\x00'*(struct.NofBytes - len(raw))
+        self._Struct = struct
+        self._Raw = raw
+        self._DecodeTables = decode_tables or dict()
+        self._Values = dict()
+        self._Extra = list()  # keys that are not parts, in insertion order
+        self._Deleted = set()
+
+    def __getitem__(self, key):
+        try:
+            return self._Values[key]
+        except KeyError:
+            if key not in self._Struct.Parts_dict or key in self._Deleted:
+                raise
+        value = self._Struct.unpack_field(self._Raw, key, self._DecodeTables.get(key))
+        self._Values[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self._Struct.Parts_dict:
+            self._Deleted.discard(key)
+        elif key not in self._Values:
+            self._Extra.append(key)
+        self._Values[key] = value
+
+    def __delitem__(self, key):
+        if key in self._Struct.Parts_dict and key not in self._Deleted:
+            self._Deleted.add(key)
+            self._Values.pop(key, None)
+        else:
+            del self._Values[key]
+            self._Extra.remove(key)
+
+    def __contains__(self, key):
+        if key in self._Struct.Parts_dict:
+            return key not in self._Deleted
+        return key in self._Values
+
+    def __iter__(self):
+        for (_, Name) in self._Struct.Parts:
+            if Name not in self._Deleted:
+                yield Name
+        for key in self._Extra:
+            yield key
+
+    def __len__(self):
+        return len(self._Struct.Parts) - len(self._Deleted) + len(self._Extra)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def copy(self):
+        return dict(self)
+
+
+def _freeze(value):
+    """
+    Returns a hashable copy of value that also tells apart values that are
+    equal but encode differently, e.g. 1, 1.0 and True.
+    Raises TypeError if that can't be done.
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple, tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return dict, frozenset((k, _freeze(v)) for k, v in value.items())
+    hash(value)
+    return type(value), value
+
+
+class PayloadCache(object):
+    """
+    A least recently used cache of frames (not yet encoded by the network's
+    protocol), keyed by the node and the values sent. It is cleared when
+    translations change. Hits and Misses count lookups.
+    """
+    def __init__(self, max_size=128):
+        self.MaxSize = max_size
+        self.Hits = 0
+        self.Misses = 0
+        self._Cache = OrderedDict()
+        self._Lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._Cache)
+
+    def __str__(self):
+        return "PayloadCache({}/{} frames, {} hits, {} misses)".format(len(self), self.MaxSize,
+                                                                     self.Hits, self.Misses)
+
+    @staticmethod
+    def key(node, message, request_ack, retries, args, kwargs, _struct):
+        """
+        Returns the cache key for sending args and kwargs with node,
+        or None if the values can't be used as a key
+        """
+        try:
+            values = list()
+            for key, value in kwargs.items():
+                if key in _struct.Parts_dict or key == 'diction':
+                    values.append((key, _freeze(value)))
+            return (node.ID, None if message is None else message.TypeID, node.sparse_updates,
+                    bool(request_ack), retries, _freeze(args), frozenset(values))
+        except TypeError:  # something unhashable
+            return None
+
+    def get(self, key):
+        if key is None:
+            return None
+        with self._Lock:
+            try:
+                value = self._Cache.pop(key)
+            except KeyError:
+                self.Misses += 1
+                return None
+            self._Cache[key] = value  # now the most recently used
+            self.Hits += 1
+            return value
+
+    def put(self, key, value):
+        if key is None:
+            return
+        with self._Lock:
+            self._Cache[key] = value
+            while len(self._Cache) > self.MaxSize:
+                self._Cache.popitem(last=False)
+
+    def clear(self):
+        with self._Lock:
+            self._Cache.clear()
+
+
+class TranslationTable(object):
+    """
+    The compiled lookup tables for the translations of one part.
+    Encode only holds keys that are not of the part's ReturnType, so
+    that e.g. node.send(1) isn't translated when there is a translation
+    ("one", 1), while Decode translates everything received.
+
+    Tables are shared between all nodes that have the same translations,
+    see MoteinoNetwork._get_translation_table(), and the nodes and messages
+    that use one keep it (in _Tables) for as long as they do.
+    """
+    def __init__(self, return_type, translations):
+        self.Encode = dict()
+        for key, value in translations.items():
+            if type(key) is not return_type:
+                self.Encode[key] = value
+        self.Decode = dict(translations)
+
 
 class Node(object):  # maybe rename this to Node?..... Finally done! :D
 
     def __init__(self, network, _id, structstring, name=None):
         self.ID = _id
-        self.Struct = Struct(structstring)
+        self.Struct = get_struct(structstring) if structstring is not None else None
+        self.Messages = dict()
+        self._MessageTable = None  # indexed by type byte once the node has messages
         self.LastSent = dict()
         self.Network = network
         self.Name = 'Node-' + str(self.ID) if name is None else name
         self.Translations = dict()
+        self._CompiledTranslations = None
+        self._DecodeTables = dict()
+        self._Tables = dict()
+        self.lazy_records = None  # None means the network's lazy_records is used
+        self.sparse_updates = False  # see Struct.pack_sparse()
         self.ReceiveFunction = lambda d: network.ReceiveFunction(d)
         self.AckFunction = lambda d: network.AckFunction(d)
         self.NoAckFunction = lambda d: network.NoAckFunction(d)
@@ -216,6 +889,7 @@ class Node(object):  # maybe rename this to Node?..... Finally done! :D
         self.default_max_wait = None
         self.default_retries = None
         self.default_request_ack = None
+        self.default_priority = None
 
     def __str__(self):
         return "Node({name}) with id({i}={i_hex}) and {struct}".format(name=self.Name,
@@ -244,25 +918,83 @@ class Node(object):  # maybe rename this to Node?..... Finally done! :D
         if no_ack is not None:
             self.NoAckFunction = no_ack
 
-    def _translate(self, part, key, from_network=False):
+    def _compile_translations_for(self, _struct):
         """
-        Looks for a translation, returns the key if no translation is found
-        :param part: string
-        :param key: object
-        :return: object
+        Compiles self.Translations into lookup tables that _struct applies
+        while encoding and decoding, returns them as well as the TranslationTables
+        :param _struct: Struct
+        :return: (list or None, dict, dict)
+        """
+        tables = dict()
+        for part, translations in self.Translations.items():
+            if part in _struct.Parts_dict:
+                tables[part] = self.Network._get_translation_table(_struct.Parts_dict[part].ReturnType,
+                                                                   translations)
+        return _struct.compile_translations(tables), \
+            dict((part, table.Decode) for part, table in tables.items()), tables
+
+    def _compile_translations(self):
+        if self.Struct is not None:
+            self._CompiledTranslations, self._DecodeTables, self._Tables = \
+                self._compile_translations_for(self.Struct)
+        for message in self.Messages.values():
+            message._CompiledTranslations, message._DecodeTables, message._Tables = \
+                self._compile_translations_for(message.Struct)
+
+    def _structs(self):
+        """
+        returns all the structs of the node, its own and those of its messages
+        """
+        structs = [message.Struct for message in self.Messages.values()]
+        if self.Struct is not None:
+            structs.append(self.Struct)
+        return structs
+
+    def add_message(self, type_id, structstring, name=None):
+        """
+        Adds a message type to the node. Nodes can have several messages, each with
+        its own struct, and every frame to and from the node then starts with a type
+        byte saying which message it is. That way each frame only carries the bytes
+        of its own message instead of the largest layout. If the node has a struct
+        of its own as well, that one goes with the type byte OwnStructTypeID (0),
+        which no message can then have.
+
+        example:
+
+        node = mynetwork.add_node(10, None, "node1")
+        status = node.add_message(1, "int temperature; unsigned long uptime;", "Status")
+        command = node.add_message(2, "byte led;", "Command")
+
+        status.bind(receive=print_status)
+        command.send(led=1)
+
+        Frames received from the node are dispatched on the type byte and the
+        receive function gets a 'MessageType' entry with the message's name.
+
+        :param type_id: int
+        :param structstring: str
+        :param name: str
+        :return: Message
         """
-        if part in self.Translations:
-            # print("key({}) is in Translations".format(key))
-            if key in self.Translations[part]:
-                # print("value is in Translations[key]")
-                # print("StructPart: {}, type: {}, => {}"
-                #       "".format(self.Struct.Parts_dict[part].ReturnType,
-                #                    type(key),
-                #                 self.Struct.Parts_dict[part].ReturnType is type(key)))
-                if from_network or self.Struct.Parts_dict[part].ReturnType is not type(key):
-                    return self.Translations[part][key]
-        # print "no translation, just returning value: " + str(value)
-        return key
+        if not 0 <= type_id <= 255:
+            raise ValueError("Message type_id must be a byte but was " + str(type_id))
+        if self._MessageTable is None:
+            self._MessageTable = [None]*256
+        if self._MessageTable[type_id] is not None:
+            raise ValueError("{} already has a message with type_id {}".format(self.Name, type_id))
+        if type_id == OwnStructTypeID and self.Struct is not None:
+            raise ValueError("type_id {} is for {}'s own struct".format(type_id, self.Name))
+        message = Message(self, type_id, structstring, name)
+        if message.Name in self.Messages:
+            raise ValueError("{} already has a message called {}".format(self.Name, message.Name))
+        self.Messages[message.Name] = message
+        self._MessageTable[type_id] = message
+        message._CompiledTranslations, message._DecodeTables, message._Tables = \
+            self._compile_translations_for(message.Struct)
+        if self.Network.PayloadCache is not None:
+            self.Network.PayloadCache.clear()  # the node's own struct may need its type byte now
+        logger.debug("%s added to %s", message, self.Name)
+        return message
 
     def add_translation(self, part, *args):
         """
@@ -296,7 +1028,7 @@ class Node(object):  # maybe rename this to Node?..... Finally done! :D
         :return:
         """
 
-        if part not in self.Struct.Parts_dict:
+        if not any(part in _struct.Parts_dict for _struct in self._structs()):
             logger.warning("Translation regarding part {part} was added to {node}. "
                            "However, the Node's struct doesn't contain such a part, "
                            "I doubt you wanted to do this (P.S part names are case "
@@ -308,6 +1040,9 @@ class Node(object):  # maybe rename this to Node?..... Finally done! :D
         for (key, value) in args:
             self.Translations[part][key] = value
             self.Translations[part][value] = key
+        self._compile_translations()
+        if self.Network.PayloadCache is not None:
+            self.Network.PayloadCache.clear()
 
         logger.debug("Translation(s): " + str(args) + " added regarding " + part + " for " + self.Name)
 
@@ -331,14 +1066,67 @@ class Node(object):  # maybe rename this to Node?..... Finally done! :D
             what2send = {'a': 100, 'b' = [1, 2, 3, 4, 5, 6, 7, 8]}
             node.send(diction=what2send)
 
+        If node.sparse_updates is True only the parts that are passed are sent,
+        together with a mask saying which ones they are, see Struct.pack_sparse()
+        and applySparseUpdate() in the Node_Skeleton sketch.
+
         :return: bool
         """
-        # ResponseExpected gets passed through Network value
-        self.Network.ResponseExpected = False  # Default is False
+        return self._send(None, args, kwargs)
+
+    def _send(self, message, args, kwargs):
+        """
+        Sends the node's own struct if message is None, otherwise the message
+        """
+        response_expected = False
         if 'expect_response' in kwargs:
-            self.Network.ResponseExpected = kwargs['expect_response']
+            response_expected = kwargs['expect_response']
         elif 'response_expected' in kwargs:
-            self.Network.ResponseExpected = kwargs['response_expected']
+            response_expected = kwargs['response_expected']
+
+        frame, max_wait, request_ack, diction = self._frame(message, args, kwargs)
+        # an expected response still goes to the receive function, the send only waits for it
+        transaction = self._transaction(request_ack, diction, kwargs, response_expected=response_expected,
+                                        capture=False)
+        self.Network._write2serial(frame, max_wait, transaction=transaction)
+        return bool(transaction.Acked)
+
+    def _transaction(self, request_ack, diction, kwargs, **options):
+        """
+        Makes the _Transaction for a send, with the priority and deadline
+        (in ms from now) from kwargs if they are there
+        """
+        deadline = kwargs.get('deadline')
+        if deadline is not None:
+            deadline = time.time() + deadline/float(1000)
+        return _Transaction(self.ID, request_ack, diction, priority=self._priority(kwargs), deadline=deadline,
+                            **options)
+
+    def _priority(self, kwargs):
+        """
+        The priority of a send, from kwargs or the defaults
+        """
+        priority = kwargs.get('priority', self.default_priority)
+        if priority is None:
+            priority = self.Network.default_priority
+        return priority
+
+    def _frame(self, message, args, kwargs):
+        """
+        Returns the frame that sends the node's own struct (if message is None)
+        or the message (the network encodes it when it is written), how long to wait for the radio,
+        whether an ack is requested and the diction that was sent. Sets LastSent.
+        :return: bytes, int, bool, dict
+        """
+        if message is None:
+            if self.Struct is None:
+                raise ValueError("{} has no struct of its own, send one of its messages "
+                                 "instead, e.g. node.Messages[name].send()".format(self.Name))
+            _struct, translations, prefix = self.Struct, self._CompiledTranslations, b''
+            if self._MessageTable is not None:
+                prefix = bytes(bytearray((OwnStructTypeID,)))
+        else:
+            _struct, translations, prefix = message.Struct, message._CompiledTranslations, message._TypeByte
 
         max_wait = self.default_max_wait
         if 'max_wait' in kwargs:
@@ -349,62 +1137,116 @@ class Node(object):  # maybe rename this to Node?..... Finally done! :D
             request_ack = kwargs['request_ack']
         elif 'ack_requested' in kwargs:
             request_ack = kwargs['ack_requested']
-
-        diction = dict()
-        if 'diction' in kwargs:
-            diction = kwargs['diction']
+        if request_ack is None:
+            request_ack = self.Network.default_request_ack
 
         retries = self.default_retries
         if 'retries' in kwargs:
             retries = kwargs['retries']
+        if retries is None:
+            retries = self.Network.default_retries
+
+        cache = self.Network.PayloadCache
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.key(self, message, request_ack, retries, args, kwargs, _struct)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                self.LastSent, frame = cached
+                return frame, max_wait, request_ack, self.LastSent
+
+        diction = dict()
+        if 'diction' in kwargs:
+            diction = kwargs['diction']
 
         for i, arg in enumerate(args):
-            part = self.Struct.Parts[i][1]
-            diction[part] = self._translate(part, arg)
+            diction[_struct.Parts[i][1]] = arg
 
         for (key, value) in kwargs.items():
-            if key in self.Struct.Parts_dict:
-                diction[key] = self._translate(key, value)
+            if key in _struct.Parts_dict:
+                diction[key] = value
 
-        logger.info("sending: " + str(diction))
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("sending: " + str(diction))
 
         diction['send2id'] = self.ID
         diction['Sender'] = self
+        if message is not None:
+            diction['MessageType'] = message.Name
 
         self.LastSent = diction
-        self.Network.send2base(send2id=self.ID,
-                               request_ack=request_ack,
-                               retries=retries,
-                               payload=self.Struct.encode(diction),
-                               max_wait=max_wait)
-        return bool(self.Network.AckReceived)  # pass as bool to force a new copy
+        if self.sparse_updates:
+            payload = prefix + _struct.pack_sparse(diction, translations)
+        else:
+            payload = prefix + _strip_zeros(_struct.pack(diction, translations))
+        frame = self.Network._format_frame(self.ID, request_ack, retries, payload)
+        if cache_key is not None:
+            cache.put(cache_key, (dict(diction), frame))
+        return frame, max_wait, request_ack, diction
 
-    def send2parent(self, payload):
+    def send2parent(self, payload, rssi=None):
         """
-        :param payload: string
+        :param payload: bytes, what the node sent
+        :param rssi: int, how well the base heard it, default is network.RSSI
         :return: None
         """
-        _d = self.Struct.decode(payload)
-        logger.debug(str(_d) + " received from " + str(self))
+        decoded = self.decode_payload(payload, rssi)
+        if decoded is None:
+            return
+        d, receive_function = decoded
+
+        if not self.Network._answer(self.ID, d, payload):
+            receive_function(d)
+
+    def decode_payload(self, payload, rssi=None):
+        """
+        Decodes what the node sent into a dict (or a Record if lazy_records)
+        with the useful entries added and finds the function that should receive it.
+        Returns None (after logging it) if it can't be decoded.
+        :param payload: bytes
+        :param rssi: int, default is network.RSSI
+        :return: (dict, function)
+        """
+        receive_function = self.ReceiveFunction
+        message = None
+        if self._MessageTable is not None:
+            type_id = bytearray(payload[:1])
+            if type_id:
+                message = self._MessageTable[type_id[0]]
+            if message is None and not (type_id and type_id[0] == OwnStructTypeID and self.Struct is not None):
+                logger.warning("{} sent a message of unknown type, the raw data was: {}"
+                               "".format(self.Name, repr(bytes(payload))))
+                return None
+            payload = payload[1:]
+        if message is not None:
+            _struct, translations, decode_tables = message.Struct, message._CompiledTranslations, \
+                message._DecodeTables
+            if message.ReceiveFunction is not None:
+                receive_function = message.ReceiveFunction
+        elif self.Struct is None:
+            logger.warning("{} has neither a struct nor messages, the raw data was: {}"
+                           "".format(self.Name, repr(bytes(payload))))
+            return None
+        else:
+            _struct, translations, decode_tables = self.Struct, self._CompiledTranslations, self._DecodeTables
+
+        lazy = self.lazy_records if self.lazy_records is not None else self.Network.lazy_records
+        if lazy:
+            d = Record(_struct, bytes(payload), decode_tables)
+        else:
+            d = _struct.unpack(payload, translations)
 
-        # translate and add useful entries
-        d = dict()
-        for part, key in list(_d.items()):
-            d[part] = self._translate(part, key, from_network=True)
+        # add useful entries
+        if message is not None:
+            d['MessageType'] = message.Name
         d['SenderID'] = self.ID
         d['SenderName'] = self.Name
         d['Sender'] = self
-        d['RSSI'] = int(self.Network.RSSI)
+        d['RSSI'] = int(self.Network.RSSI if rssi is None else rssi)
 
-        logger.info(str(d) + " received from " + str(self))
-
-        if not self.Network.ReceiveWithSendAndReceive:
-            self.Network.stop_waiting_for_radio()
-            self.ReceiveFunction(d)
-        else:
-            self.Network.SendAndReceiveDictHolder = d
-            self.Network.ReceiveWithSendAndReceive = False
-            self.Network.stop_waiting_for_radio()
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(str(d) + " received from " + str(self))
+        return d, receive_function
 
     def send_and_receive(self, *args, **kwargs):
         """
@@ -412,16 +1254,35 @@ class Node(object):  # maybe rename this to Node?..... Finally done! :D
         The network and your thread will hang until the node responds.
         This function will then return the response instead of the network
         executing the node's receiving function.
+
+        Any number of threads can be waiting for answers at the same time, each
+        gets the first frame from its node after sending (that isn't somebody
+        else's answer). If the node echoes some part of what it was sent, say
+        a sequence number, pass tag='Seq' and only a frame with the same Seq
+        is taken as the answer, the others go to the receive function.
         :return: dict
         """
-        self.Network.ReceiveWithSendAndReceive = True
-        temp = id(self.Network.SendAndReceiveDictHolder)
-        kwargs['expect_response'] = True
-        self.send(*args, **kwargs)
-        if id(self.Network.SendAndReceiveDictHolder) != temp:
-            return dict(self.Network.SendAndReceiveDictHolder)  # force new instance
-        else:
+        return self._send_and_receive(None, args, kwargs)
+
+    def send_async(self, *args, **kwargs):
+        """
+        Like send() but returns right away with a concurrent.futures.Future
+        that resolves to a SendResult(acked, rssi, rtt) once the base reports
+        whether the node acked, see MoteinoNetwork.send_async()
+        :return: concurrent.futures.Future
+        """
+        return self.Network.send_async(self, *args, **kwargs)
+
+    def _send_and_receive(self, message, args, kwargs):
+        frame, max_wait, request_ack, diction = self._frame(message, args, kwargs)
+        tag = kwargs.get('tag')
+        if tag is not None:
+            tag = (tag, diction.get(tag, 0))  # parts that aren't passed are sent as 0
+        transaction = self._transaction(request_ack, diction, kwargs, response_expected=True, tag=tag)
+        self.Network._write2serial(frame, max_wait, transaction=transaction)
+        if transaction.Response is None:
             return None
+        return dict(transaction.Response)  # force new instance
 
     def list_translations(self):
         s = "Translation routines for {}".format(self)
@@ -432,6 +1293,127 @@ class Node(object):  # maybe rename this to Node?..... Finally done! :D
         print(s)
 
 
+class Message(object):
+    """
+    One of the messages of a node, see Node.add_message()
+    """
+    def __init__(self, node, type_id, structstring, name=None):
+        self.Node = node
+        self.TypeID = type_id
+        self.Name = 'Message-' + str(type_id) if name is None else name
+        self.Struct = get_struct(structstring)
+        self.ReceiveFunction = None  # None means the node's receive function is used
+        self._TypeByte = bytes(bytearray((type_id,)))
+        self._CompiledTranslations = None
+        self._DecodeTables = dict()
+        self._Tables = dict()
+
+    def __str__(self):
+        return "Message({name}) with type_id({t}) and {struct}".format(name=self.Name,
+                                                                     t=self.TypeID,
+                                                                     struct=str(self.Struct))
+
+    def __repr__(self):
+        return self.__str__()
+
+    def bind(self, receive=None):
+        """
+        Binds a function to be run instead of the node's receive function
+        when this message is received
+        :param receive: function
+        """
+        if receive is not None:
+            self.ReceiveFunction = receive
+
+    def send(self, *args, **kwargs):
+        """
+        Sends this message to the node, takes the same arguments as Node.send()
+        :return: bool
+        """
+        return self.Node._send(self, args, kwargs)
+
+    def send_and_receive(self, *args, **kwargs):
+        """
+        Sends this message and waits for the response, see Node.send_and_receive()
+        :return: dict
+        """
+        return self.Node._send_and_receive(self, args, kwargs)
+
+    def send_async(self, *args, **kwargs):
+        """
+        Sends this message without waiting, see Node.send_async()
+        :return: concurrent.futures.Future
+        """
+        return self.Node.Network.send_async(self, *args, **kwargs)
+
+
+# What the future from send_async() resolves to. acked is None if no ack was
+# requested, rssi is in dBm as the base reported it (None if it never reported)
+# and rtt is the time in ms from writing the frame until the base reported the ack
+SendResult = namedtuple('SendResult', 'acked rssi rtt')
+
+
+class _Transaction(object):
+    """
+    One send and what it waits for: the base's report of whether the node acked
+    (if an ack was requested) and the node's answer (if a response is expected).
+    Answers are matched to it by the node ID and, if tag is a (part, value)
+    tuple, by that part of the answer having that value.
+    If capture is False the answer also goes to the receive function.
+    If callbacks is False the ack and no_ack functions aren't run for it.
+    priority and deadline (a time.time()) are for the network's SendScheduler,
+    Stale is set if the deadline passed before it was the send's turn.
+    Seq is set when it is encoded, if it requests an ack.
+    """
+    def __init__(self, node_id, request_ack, diction=None, response_expected=False, tag=None,
+                 capture=True, callbacks=True, priority=SendScheduler.NORMAL, deadline=None):
+        self.NodeID = node_id
+        self.RequestAck = request_ack
+        self.Diction = diction
+        self.Priority = priority
+        self.Deadline = deadline
+        self.Stale = False
+        self.Tag = tag
+        self.Capture = capture
+        self.Callbacks = callbacks
+        self.AckEvent = threading.Event()
+        self.Acked = None
+        self.RSSI = None
+        self.Seq = None
+        self.SentTime = None
+        self.AckTime = None
+        self.ResponseEvent = threading.Event() if response_expected else None
+        self.Response = None
+
+    def resolve_ack(self, acked, rssi):
+        self.Acked = bool(acked)
+        self.RSSI = rssi
+        self.AckTime = time.time()
+        self.AckEvent.set()
+
+    def matches(self, node_id, d):
+        if node_id != self.NodeID or self.ResponseEvent is None or self.ResponseEvent.is_set():
+            return False
+        return self.Tag is None or d.get(self.Tag[0]) == self.Tag[1]
+
+    def resolve_response(self, d):
+        self.Response = d
+        self.ResponseEvent.set()
+
+    def result(self):
+        """
+        :return: SendResult
+        """
+        if not self.RequestAck and not self.Stale:
+            return SendResult(None, None, None)
+        if self.Stale:
+            return SendResult(False, None, None)
+        if not self.Acked:
+            logger.warning("No ack received when " + str(self.Diction) + " was sent")
+            return SendResult(False, self.RSSI, None)
+        return SendResult(True, self.RSSI, (self.AckTime - self.SentTime)*1000)
+
+
 class BaseMoteino(Node):
     def __init__(self, network, _id):
         """
@@ -440,127 +1422,232 @@ class BaseMoteino(Node):
         :param _id: int
         :return:
         """
-        Node.__init__(self, network, _id, "byte send2id;bool AckReceived;byte rssi;", 'BaseMoteino')
+        structstring = "byte send2id;bool AckReceived;byte rssi;"
+        if network._BaseV3:
+            structstring += "byte seq;"  # which frame the report is about
+        Node.__init__(self, network, _id, structstring, 'BaseMoteino')
 
     def  send2parent(self, payload):
-        d = self.Struct.decode(payload)
+        d = self.Struct.unpack(payload)
         if d['send2id'] not in self.Network.nodes:
-            raise ValueError("send2id={} not in known nodes".format(d['send2id']))  # this should never happen
+            # a frame written with send2base() or print2serial() to a node we don't know
+            logger.warning("The base reported on send2id={} which is not a known node".format(d['send2id']))
+            self.Network.stop_waiting_for_radio()
+            return
         sender = self.Network.nodes[d['send2id']]
         self.Network.AckReceived = d['AckReceived']
         self.Network.RSSI = d['rssi']
+        last_sent = sender.LastSent
+        transaction = self.Network._acked(sender.ID, d.get('seq'))
+        if transaction is not None:
+            if not transaction.RequestAck:
+                return  # a flow token, the base is done with a frame that didn't request an ack
+            transaction.resolve_ack(d['AckReceived'], d['rssi'] - 0x7f)
+            if transaction.Diction is not None:
+                last_sent = transaction.Diction
+            if not transaction.Callbacks:
+                return
+        elif d.get('seq'):
+            logger.info("The base reported on a send that had stopped waiting, " + str(d))
+            return
+        else:
+            self.Network.stop_waiting_for_radio()  # a frame written with print2serial()
         if d['AckReceived']:
-            logger.info("Ack received when " + str(sender.LastSent) + " was sent")
-
-            if not self.Network.ResponseExpected:
-                self.Network.stop_waiting_for_radio()
-            sender.AckFunction(dict(sender.LastSent))
+            logger.info("Ack received when " + str(last_sent) + " was sent")
+            self.Network.Dispatcher.submit_ordered(sender.ID, sender.AckFunction, dict(last_sent))
         else:
-            logger.warning("No ack received when " + str(sender.LastSent) + " was sent")
-            self.Network.ReceiveWithSendAndReceive = False
-            self.Network.stop_waiting_for_radio()
-            sender.NoAckFunction(dict(sender.LastSent))
+            logger.warning("No ack received when " + str(last_sent) + " was sent")
+            self.Network.Dispatcher.submit_ordered(sender.ID, sender.NoAckFunction, dict(last_sent))
 
     def report(self):
-        self.Network.ReceiveWithSendAndReceive = True
-        self.Network.ResponseExpected = True
-        temp = id(self.Network.SendAndReceiveDictHolder)
-        self.Network.print2serial(Byte.hex(self.ID))
-        if id(self.Network.SendAndReceiveDictHolder) != temp:
-            return int(self.Network.SendAndReceiveDictHolder["rssi"]),\
-                   self.Network.SendAndReceiveDictHolder['temperature']
-        else:
+        transaction = _Transaction(self.Network.BaseReporter.ID, False, response_expected=True)
+        self.Network._write2serial(bytearray((self.ID,)), transaction=transaction)
+        if transaction.Response is None:
             return None, None
+        return int(transaction.Response["rssi"]), transaction.Response['temperature']
 
 
-class Send2ParentThread(threading.Thread):
+def handle_frame(network, frame):
     """
-    This is the thread that interprets the struct recieved by the moteino network
-    and runs the recieve, no_ack or ack function. The user is allowed to hijack this
-    thread from the recieve, no_ack or ack functions.
+    Runs the recieve, no_ack or ack function for a frame received from the base.
+    Frames from nodes are handled by the network's Dispatcher, the user
+    is allowed to hijack its worker from the recieve function (even to
+    send_and_receive(), answers are matched by the ListeningThread) but that
+    worker can't handle anything else (from the nodes in its shards) in the meantime.
+    :param network: MoteinoNetwork
+    :param frame: Frame
     """
-    def __init__(self, network, incoming):
-        threading.Thread.__init__(self, name="moteinopy.Send2ParentThread")
-        self.Incoming = incoming
-        self.Network = network
+    # We use the sender ID to get a pointer to the sender (an instance of the Node class)
+    sender_id = frame.Sender
+
+    if sender_id == 0xFF:
+        # Special case for basereporter
+        network.BaseReporter.send2parent(frame.Payload)
+
+    elif network.PromiscousMode:
+        # Promiscous mode will just print all info
+        print("A Node with ID=" + str(sender_id) + " sent: " +
+              binascii.hexlify(bytes(frame.Payload)).decode('ascii') + " to ID=" +
+              "" + str(frame.Target) + ", rssi=" + str(frame.RSSI))
+
+    elif sender_id not in network.nodes:
+        logger.warning("Something must be wrong because BaseMoteino just recieved a message "
+                       "from moteino with ID: " + str(sender_id) + " but no such node has "
+                       "been registered to the network. Btw the raw data was: " + repr(bytes(frame.Payload)))
+    elif sender_id == network.Base.ID:
+        network.Base.send2parent(frame.Payload)
+    else:
+        # the target would always be the base here
+        network.RSSI = frame.RSSI
+        network.nodes[sender_id].send2parent(frame.Payload, frame.RSSI)
 
-    def run(self):
-        # The first byte from the hex string is the sender ID.
-        # We use that to get a pointer to the sender (an instance of the Node class)
-
-        sender_id = Byte.hex2dec(self.Incoming[:2])
-
-        if sender_id == 0xFF:
-            # Special case for basereporter
-            self.Network.BaseReporter.send2parent(self.Incoming[2:])
-
-        elif self.Network.PromiscousMode:
-            # Promiscous mode will just print all info
-            print("A Node with ID=" + str(sender_id) + " sent: " + self.Incoming[6:] + " to ID=" +
-                  "" + str(Byte.hex2dec(self.Incoming[2:4])) + ", rssi=" + str(Byte.hex(self.Incoming[4:6])-0x7f))
-
-        elif sender_id not in self.Network.nodes:
-            logger.warning("Something must be wrong because BaseMoteino just recieved a message "
-                           "from moteino with ID: " + str(sender_id) + " but no such node has "
-                           "been registered to the network. Btw the raw data was: " + str(self.Incoming))
-        elif sender_id == self.Network.Base.ID:
-            self.Network.Base.send2parent(self.Incoming[2:])
-        else:
-            # send2id is at self.Incoming[2:4] but whould always be BaseID here.
-            self.Network.RSSI = Byte.hex2dec(self.Incoming[4:6]) - 0x7f
-            self.Network.nodes[sender_id].send2parent(self.Incoming[6:])
 
+def parse_frame(network, incoming):
+    """
+    Turns a frame received from the base into a Frame,
+    or returns None (after logging it) if it is too short
+    :param network: MoteinoNetwork
+    :param incoming: bytearray
+    :return: Frame
+    """
+    view = memoryview(incoming)
+    sender_id = incoming[0]
+    if sender_id == 0xFF or sender_id == network.Base.ID:
+        # the base reporting, about itself or the frames it sent
+        return Frame(sender_id, None, None, view[1:])
+    n = len(incoming)
+    if not network._BaseV3:
+        if n >= 3:
+            return Frame(sender_id, incoming[1], incoming[2] - 0x7f, view[3:])
+    # BaseSketch v3.0 says how many bytes were received
+    elif n > 3 and n >= 4 + incoming[3]:
+        return Frame(sender_id, incoming[1], incoming[2] - 0x7f, view[4:4 + incoming[3]])
+    logger.warning("Frame from moteino with ID: " + str(sender_id) + " is shorter than "
+                   "it says it is, the raw data was: " + repr(bytes(incoming)))
+    return None
 
-def is_hex_string(s):
-    # If anyone happens to read this, feel free to implement a better way
-    # of checking if a string only conteins hex characters
-    if not s:
-        return False
-    for c in s:
-        if c not in "0123456789abcdefgABCDEFG":
-            return False
-    return True
 
 class ListeningThread(threading.Thread):
     """
-    A thread that listens to the Serial port. When something (that ends with a newline) is recieved
-    the thread will start up a Send2Parent thread and go back to listening to the Serial port
+    A thread that listens to the Serial port. It waits (with selectors, where the
+    port has a file descriptor) until something arrives and then reads everything
+    that is waiting, ReadChunk bytes at a time, into a buffer that is reused.
+    That is fed to the network's protocol and every frame that completes is
+    handed to the network's Dispatcher as a Frame, in order for each sender,
+    except frames from the base (acks and reports) which are handled right away
+    so that they are never stuck behind slow receive functions. So are answers
+    that a send_and_receive() is waiting for, it may be running on the worker
+    they would wait for.
     """
+    ReadChunk = 4096
+
     def __init__(self, network, listen2):
         threading.Thread.__init__(self, name="moteinopy.ListeningThread")
         self.Network = network
         self.Listen2 = listen2
         self.Stop = False
+        self._Wakeup = None
 
     def stop(self, sig=None, frame=None):
         logger.debug("Listening thread attempting to stop itself")
         self.Stop = True
+        wakeup = self._Wakeup
+        if wakeup is not None:
+            try:
+                os.write(wakeup[1], b'x')
+            except OSError:  # it just stopped on its own
+                pass
         self.Listen2.cancel_read()
 
+    def _fileno(self):
+        """
+        :return: int, the file descriptor of the serial port, or None if it can't be selected
+        """
+        if selectors is None or not hasattr(self.Listen2, 'Serial') or not hasattr(os, 'readv'):
+            return None
+        try:
+            return self.Listen2.Serial.fileno()
+        except (AttributeError, IOError, ValueError):
+            return None
+
     def run(self):
         logger.debug("Serial listening thread started")
-        incoming = ''
-        while True:
-            try:
-                # print "entering readline"
-                incoming = self.Listen2.readline().rstrip()  # use [:-1]?
-                # print "out of readline"
-            except serial.SerialException as e:
-                logger.debug("Serial exception occured: " + str(e))
-                if not self.Stop:
-                    logger.warning("serial exception ocurred: " + str(e))
-                    break
-            if self.Stop:
-                break
+        fd = self._fileno()
+        try:
+            if fd is None:
+                self._read_blocking()
             else:
-                logger.debug("Serial port said: " + str(incoming))
-                if is_hex_string(incoming):
-                    Send2ParentThread(self.Network, incoming).start()
-                else:
-                    logger.error("Serial port said: " + str(incoming))
+                self._read_selecting(fd)
+        except (serial.SerialException, OSError) as e:
+            logger.debug("Serial exception occured: " + str(e))
+            if not self.Stop:
+                logger.warning("serial exception ocurred: " + str(e))
         logger.info("Serial listening thread shutting down")
         self.Listen2.close()
 
+    def _read_blocking(self):
+        while not self.Stop:
+            # block until something arrives, then take everything that is waiting
+            incoming = self.Listen2.read(1)
+            waiting = self.Listen2.in_waiting
+            if waiting:
+                incoming += self.Listen2.read(waiting)
+            if self.Stop:
+                break
+            self._handle(incoming)
+
+    def _read_selecting(self, fd):
+        self._Wakeup = os.pipe()
+        buf = bytearray(self.ReadChunk)
+        view = memoryview(buf)
+        selector = selectors.DefaultSelector()
+        selector.register(fd, selectors.EVENT_READ)
+        selector.register(self._Wakeup[0], selectors.EVENT_READ)
+        try:
+            while not self.Stop:
+                ready = [key.fd for (key, _) in selector.select()]
+                if self.Stop or self._Wakeup[0] in ready:
+                    break
+                try:
+                    n = os.readv(fd, [buf])
+                except OSError as e:
+                    if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                        continue
+                    raise
+                if not n:
+                    raise serial.SerialException("the serial port was closed")
+                self._handle(view[:n])
+        finally:
+            selector.close()
+            for end in self._Wakeup:
+                os.close(end)
+            self._Wakeup = None
+
+    def _handle(self, incoming):
+        network = self.Network
+        for incoming_frame in network._Protocol.feed(incoming):
+            logger.debug("Serial port said: %r", incoming_frame)
+            if not incoming_frame:
+                continue
+            frame = parse_frame(network, incoming_frame)
+            if frame is None:
+                continue
+            if frame.Sender == 0xFF or frame.Sender == network.Base.ID:
+                try:
+                    handle_frame(network, frame)
+                except Exception:
+                    # the listener must keep going whatever a report says
+                    logger.exception("Failed to handle a report from the base: " + repr(bytes(frame.Payload)))
+            elif network._Transactions and frame.Sender in network.nodes and not network.PromiscousMode:
+                # a send is waiting for an answer, perhaps on the worker this frame would
+                # wait for, so it is matched here and only the rest goes to the Dispatcher
+                network.RSSI = frame.RSSI
+                decoded = network.nodes[frame.Sender].decode_payload(frame.Payload, frame.RSSI)
+                if decoded is not None and not network._answer(frame.Sender, decoded[0], frame.Payload):
+                    network.Dispatcher.submit_ordered(frame.Sender, decoded[1], decoded[0])
+            else:
+                network.Dispatcher.submit_ordered(frame.Sender, handle_frame, network, frame)
+
 RF69_315MHZ = 31
 RF69_433MHZ = 43
 RF69_868MHZ = 86
@@ -628,6 +1715,62 @@ class MoteinoNetwork(object):
                         code to hang. In that case it is useful to pass
                         init_base=False.
 
+            lazy_records - default is False. If True the receive functions get
+                           a Record instead of a dict, parts are then only
+                           decoded when they are accessed. Can also be set
+                           for each node with node.lazy_records
+
+            payload_cache_size - default is 0. If larger the network keeps a
+                                 PayloadCache of that many frames, so sending
+                                 the same thing again skips packing the struct.
+
+            protocol - default is None, which picks the best protocol the
+                       BaseSketch on the base speaks, 'cobs' (binary frames
+                       with a CRC) for v3.0, 'hex' for v2.3.
+                       Pass 'hex' to use HEX lines anyway, see moteinopy.framing
+
+            baudrate - default is 115200, the baudrate the base starts at
+
+            max_baudrate - default is 1000000. BaseSketch v3.0 switches
+                           to the highest baudrate (see BaseBaudRates) that is
+                           not above this, that the serial port supports and
+                           that passes a test. The one chosen is in
+                           network.BaudRate and the throughput measured during
+                           the test, in bytes per second, in network.SerialThroughput.
+                           Pass None to stay at baudrate.
+
+            dispatch_workers - default is 4, the number of threads that run
+                               the receive, ack and no_ack functions, see
+                               moteinopy.dispatch.Dispatcher. Everything from
+                               one node is handled in order by the same worker,
+                               different nodes are handled in parallel.
+
+            dispatch_shards - default is None, one for each worker. Nodes are
+                              divided between the shards by their ID and each
+                              worker serves its own shards.
+
+            dispatch_shard_of - default is None, a function that gets a node ID
+                                and returns the shard for it, instead of
+                                ID % dispatch_shards
+
+            dispatch_queue_size - default is 1000, how many received frames
+                                  can wait in each shard
+
+            dispatch_overflow - default is 'block', what to do when the queue
+                                is full: 'block' reading from the serial port,
+                                'drop-oldest' or 'drop-newest'. network.Dispatcher
+                                counts what was dropped.
+
+            send_fairness - default is 'node', sends wait for their turn with
+                            network.Scheduler (see moteinopy.scheduler.SendScheduler)
+                            and within a priority class the nodes take turns.
+                            Pass 'caller' to have the sending threads take turns instead.
+
+        Sends can be given a priority ('high', 'normal' or 'low', default is
+        network.default_priority or node.default_priority) and a deadline, in ms,
+        after which a send that is still waiting for its turn is dropped:
+
+            mynetwork.send("alarm", Siren=1, priority='high', deadline=200)
 
     """
 
@@ -647,7 +1790,17 @@ class MoteinoNetwork(object):
                  init_base=True,
                  baudrate=115200,
                  logger_level=logging.WARNING,
-                 override_serial_lock=False):
+                 override_serial_lock=False,
+                 lazy_records=False,
+                 payload_cache_size=0,
+                 protocol=None,
+                 max_baudrate=1000000,
+                 dispatch_workers=4,
+                 dispatch_queue_size=1000,
+                 dispatch_overflow=Dispatcher.BLOCK,
+                 dispatch_shards=None,
+                 dispatch_shard_of=None,
+                 send_fairness='node'):
         """
 
         :param port: str
@@ -657,6 +1810,17 @@ class MoteinoNetwork(object):
         :param base_id: int
         :param encryption_key: str
         :param init_base: bool
+        :param lazy_records: bool
+        :param payload_cache_size: int
+        :param protocol: str
+        :param baudrate: int
+        :param max_baudrate: int
+        :param dispatch_workers: int
+        :param dispatch_queue_size: int
+        :param dispatch_overflow: str
+        :param dispatch_shards: int
+        :param dispatch_shard_of: function
+        :param send_fairness: str
         :return:
         """
 
@@ -669,30 +1833,59 @@ class MoteinoNetwork(object):
         else:
             self._Serial = MySerial(port=port, baudrate=baudrate, override_serial_lock=override_serial_lock)
 
+        if protocol is not None and protocol not in protocols:
+            raise ValueError("Unknown protocol '{}', use one of {}".format(protocol, sorted(protocols)))
+        if send_fairness not in ('node', 'caller'):
+            raise ValueError("send_fairness must be 'node' or 'caller', not '{}'".format(send_fairness))
+        self.BaseSketchVersion = None
+        self.BaudRate = baudrate
+        self.SerialThroughput = None
         if init_base:
-            self._initiate_base(frequency, high_power, network_id, base_id, encryption_key, promiscous_mode)
+            protocol = self._initiate_base(frequency, high_power, network_id, base_id, encryption_key,
+                                           promiscous_mode, protocol, max_baudrate)
         else:
             logger.info("Initialisation of base skipped")
+        self._Protocol = protocols[protocol or HexProtocol.Name]()
+        # BaseSketch v3.0 says how long the frames it received are, queues the frames
+        # it gets and reports on each one (by its seq) when it is done with it
+        self._BaseV3 = self.BaseSketchVersion is not None and self.BaseSketchVersion >= (3, 0)
 
         # threading objects
-        self._SerialLock = threading.Lock()
+        self.Dispatcher = Dispatcher(dispatch_workers, dispatch_queue_size, dispatch_overflow,
+                                     shards=dispatch_shards, shard_of=dispatch_shard_of)
+        self.Scheduler = SendScheduler()
+        self._SendFairness = send_fairness
         self._WaitForRadioEvent = threading.Event()
+        self.Writer = SerialWriter(self._Serial)
+        self._Sender = None  # the threads behind send_async(), started when first needed
+        self._SenderLock = threading.Lock()
+        self._SenderTurn = threading.Lock()  # the Sender's workers take turns in the order of the heap
+        self._SenderWakeups = 0  # _send_next() jobs that haven't started yet
+        self._AsyncSends = list()  # heap of the sends from send_async() waiting for the Sender
+        self._AsyncOrder = itertools.count()
+        self._AckTransactions = OrderedDict()  # seq -> the sends the base hasn't reported on yet, in order
+        self._Seq = 0
+        self._Transactions = list()  # the sends waiting for answers
+        self._TransactionLock = threading.Lock()
+        self._WindowCondition = threading.Condition(self._TransactionLock)  # notified when a report comes
+        self._Backlog = deque()  # (when the base should be done with it, length) of frames without an ack request
 
         # operating variables
-        self.ReceiveWithSendAndReceive = False
         self.print_when_acks_recieved = False
         self._network_is_shutting_down = False
         self.PromiscousMode = promiscous_mode
+        self.lazy_records = lazy_records
+        self.PayloadCache = PayloadCache(payload_cache_size) if payload_cache_size else None
 
         # Network attributes
         self.nodes = dict()
         self.nodes_list = list()
         self._serial_listening_thread = None
         self._serial_listening_thread_is_active = False
-        self.SendAndReceiveDictHolder = None
         self.AckReceived = False
         self.NodeCounter = 0
         self.GlobalTranslations = dict()
+        self._TranslationTables = weakref.WeakValueDictionary()  # dropped when no node uses them any more
         self.RSSI = 0
 
         # Base is technically a node on the network that informs us of wheter or not ACKs are
@@ -710,6 +1903,7 @@ class MoteinoNetwork(object):
         self.default_max_wait = 500
         self.default_retries = 3
         self.default_request_ack = True
+        self.default_priority = SendScheduler.NORMAL
 
         self.start_listening()
 
@@ -722,18 +1916,20 @@ class MoteinoNetwork(object):
                        network_id=1,
                        base_id=1,
                        encryption_key="0123456789abcdef",
-                       promiscous_mode=False):
-
-        self._Serial.write('X')     # send reset sign
-        logger.debug("Restarting base")
-        time.sleep(0.6)  # sleep  for 0.6 seconds, bootloader uses 0.5 seconds
-        logger.debug("Waiting for wakeup sign from base...")
-        incoming = self._Serial.readline().rstrip()
-        if not incoming == CorrectBaseSketchWakeupSign:
+                       promiscous_mode=False,
+                       protocol=None,
+                       max_baudrate=None):
+        """
+        Restarts the base and sends it the operating values.
+        Returns the name of the protocol agreed on.
+        """
+        incoming = self._restart_base()
+        supported = base_protocols(self.BaseSketchVersion)
+        if protocol is None:
+            protocol = supported[-1]
+        elif protocol not in supported:
             self._Serial.close()
-            raise AssertionError("moteinopy requires the correct BaseSketch to be present on the base"
-                                 "Currently it requires version 2.3, Find the BaseSketch on the"
-                                 "GitHub site: https://github.com/Steinarr134/moteinopy/tree/master/MoteinoSketches")
+            raise ValueError("The base has {} which doesn't speak the '{}' protocol".format(incoming, protocol))
         logger.debug("... got it, base with " + str(incoming) + " seems to be present, sending operating values...")
         encryption_key_hex = ""
         if encryption_key == '':
@@ -746,17 +1942,103 @@ class MoteinoNetwork(object):
                            Byte.hex(network_id) + \
                            Bool.hex(high_power) + \
                            encryption_key_hex + \
-                           Bool.hex(promiscous_mode) + "\n"
+                           Bool.hex(promiscous_mode)
+        if self.BaseSketchVersion < (3, 0):
+            self._send_init_string(init_string + "\n")
+        else:
+            init_string += Byte.hex(protocols[protocol].ID)
+            # try the fastest baudrates first, the first one (which the base starts at) needs no test
+            baudrates = [i for i, rate in enumerate(BaseBaudRates)
+                         if i > 0 and max_baudrate is not None and rate <= max_baudrate and self._port_supports(rate)]
+            for i in reversed(baudrates):
+                self._send_init_string(init_string + Byte.hex(i) + "\n")
+                if self._check_baudrate(BaseBaudRates[i]):
+                    break
+                self._restart_base()
+            else:
+                self._send_init_string(init_string + Byte.hex(0) + "\n")
+            logger.info("Serial link to the base runs at {} baud, {} bytes per second measured"
+                        "".format(self.BaudRate, self.SerialThroughput))
+        logger.debug("... base is ready and speaks the '" + protocol + "' protocol!")
+        return protocol
+
+    def _restart_base(self):
+        """
+        Restarts the base and waits for its wakeup sign, which is returned
+        """
+        # send reset sign, the zero first ends any COBS frame the base might be in the middle of
+        self._Serial.write(b'\x00X')
+        logger.debug("Restarting base")
+        time.sleep(0.6)  # sleep  for 0.6 seconds, bootloader uses 0.5 seconds
+        logger.debug("Waiting for wakeup sign from base...")
+        incoming = self._Serial.readline().rstrip()
+        if incoming not in BaseSketchVersions:
+            self._Serial.close()
+            raise AssertionError("moteinopy requires the correct BaseSketch to be present on the base"
+                                 "Currently it requires version 2.3 or newer, Find the BaseSketch on the"
+                                 "GitHub site: https://github.com/Steinarr134/moteinopy/tree/master/MoteinoSketches")
+        self.BaseSketchVersion = BaseSketchVersions[incoming]
+        return incoming
+
+    def _send_init_string(self, init_string):
         self._Serial.write(init_string)
         logger.debug("base init string: " + init_string)
         logger.debug("waiting for ready sign from base...")
         incoming = self._Serial.readline().rstrip()
         assert incoming == b"Ready"
-        logger.debug("... got it, base is ready!")
+        logger.debug("... got it")
+
+    def _port_supports(self, baudrate):
+        """
+        Whether or not the serial port can be set to baudrate
+        """
+        current = self._Serial.baudrate
+        try:
+            self._Serial.baudrate = baudrate
+        except (ValueError, IOError, serial.SerialException):
+            return False
+        finally:
+            self._Serial.baudrate = current
+        return True
+
+    def _check_baudrate(self, baudrate):
+        """
+        Called when the base has said "Ready" after being asked to switch to baudrate.
+        The base then echoes BaudTestPattern back and only stays at the new
+        baudrate if it gets a 'Y' after that, otherwise it goes back to the
+        first one in BaseBaudRates after BaudTestTimeout.
+        :param baudrate: int
+        :return: bool, whether the link works at the new baudrate
+        """
+        timeout = self._Serial.timeout
+        self._Serial.baudrate = baudrate
+        self._Serial.timeout = BaudTestTimeout
+        t = time.time()
+        self._Serial.write(BaudTestPattern)
+        echo = self._Serial.read(len(BaudTestPattern))
+        elapsed = time.time() - t
+        if echo == BaudTestPattern:
+            self._Serial.write(b'Y')
+            self._Serial.timeout = timeout
+            self.BaudRate = baudrate
+            self.SerialThroughput = int(len(BaudTestPattern)/elapsed)
+            return True
+
+        logger.warning("The serial link failed the test at {} baud, falling back".format(baudrate))
+        self._Serial.write(b'N')
+        self._Serial.baudrate = BaseBaudRates[0]
+        self._Serial.timeout = timeout
+        # wait until the base has given up on the new baudrate as well
+        time.sleep(2*BaudTestTimeout + 0.1)
+        self._Serial.reset_input_buffer()
+        return False
 
     def shut_down(self):
         self.stop_waiting_for_radio()
         self.stop_listening()
+        self.Dispatcher.stop(timeout=1)
+        if self._Sender is not None:
+            self._Sender.stop(timeout=1)
 
     # def __del__(self):
     #     self.shut_down()
@@ -800,7 +2082,7 @@ class MoteinoNetwork(object):
         :param send2id: int
         :param request_ack: bool
         :param retries: int
-        :param payload: str
+        :param payload: str, HEX
         :param max_wait: int
         """
         if request_ack is None:
@@ -808,15 +2090,270 @@ class MoteinoNetwork(object):
         if retries is None:
             retries = self.default_retries
 
-        sendstr = Byte.hex(send2id) + Bool.hex(request_ack) + Byte.hex(retries) + payload
-        self.print2serial(sendstr, max_wait)
+        self._write2serial(self._format_frame(send2id, request_ack, retries, binascii.unhexlify(payload)),
+                           max_wait)
+
+    def _format_frame(self, send2id, request_ack, retries, payload):
+        """
+        Returns the frame that sends payload, see _encode()
+        :param payload: bytes
+        :return: bytes
+        """
+        return bytes(bytearray((send2id, bool(request_ack), retries)) + payload)
+
+    def _encode(self, frame, transaction=None):
+        """
+        Returns frame as it should be written to the serial port. BaseSketch v3.0
+        gets the seq of transaction (0 if it has none) after the header. Transactions
+        that request an ack get a seq in any case and with BaseSketch v3.0 the ones
+        that don't get one as well, the base reports on those when it is done with
+        them so we know when it has room for more.
+        :param frame: bytes
+        :param transaction: _Transaction
+        :return: bytes
+        """
+        seq = 0
+        if transaction is not None and (transaction.RequestAck or self._BaseV3 and len(frame) >= 3):
+            seq = transaction.Seq = self._next_seq()
+        if self._BaseV3 and len(frame) >= 3:
+            frame = bytes(frame[:3]) + bytes(bytearray((seq,))) + bytes(frame[3:])
+        return self._Protocol.encode(frame)
+
+    def _next_seq(self):
+        """
+        Returns the next seq, 1-255, that no send waiting for its report has
+        """
+        with self._TransactionLock:
+            for _ in range(255):
+                self._Seq = self._Seq % 255 + 1
+                if self._Seq not in self._AckTransactions:
+                    break
+            return self._Seq
 
     def print2serial(self, sendstr, max_wait=None):
-        with self._SerialLock:
-            self._Serial.write(sendstr + '\n')
-            logger.debug("sent: " + sendstr + "   to the serial port")
-            self._WaitForRadioEvent.clear()
-            self._wait_for_radio(max_wait=max_wait)
+        """
+        Writes a frame, given as a HEX string, to the base
+        :param sendstr: str
+        :param max_wait: int
+        """
+        self._write2serial(binascii.unhexlify(sendstr), max_wait)
+
+    def _write2serial(self, frame, max_wait=None, transaction=None, acquired=False):
+        """
+        Writes frame to the base, one at a time, and waits for the radio. Without a
+        transaction that means max_wait (or until stop_waiting_for_radio()). With one
+        the serial port is held until the base reports the ack, if one was requested,
+        and then its answer, if one is expected, is waited for without holding it,
+        so other threads can send meanwhile. All of it within max_wait.
+        A frame without an ack request returns as soon as it is written, once
+        the base has room for it (see _pace() and _wait_for_window()).
+        BaseSketch v3.0 queues frames and says which one each report is
+        about, so there the serial port is only held until the frame is written
+        (once the base has room for it) and the report is waited for without it.
+        If acquired the caller already has transaction's turn from the Scheduler.
+        :param frame: bytes
+        :param max_wait: int
+        :param transaction: _Transaction
+        :param acquired: bool
+        :return: _Transaction
+        """
+        if max_wait is None:
+            max_wait = self.default_max_wait
+        if transaction is None:
+            self.Scheduler.acquire()
+            try:
+                data = self._encode(frame)
+                request_ack = len(frame) < 3 or bool(bytearray(frame)[1])
+                self._pace(len(data), request_ack)
+                self.Writer.write(data)
+                logger.debug("sent: %r   to the serial port", frame)
+                if request_ack:
+                    self._WaitForRadioEvent.clear()
+                    self._wait_for_radio(max_wait=max_wait)
+            finally:
+                self.Scheduler.release()
+            return None
+
+        deadline = time.time() + max_wait/float(1000)
+        if transaction.ResponseEvent is not None:
+            # registered before writing, the answer can come before the ack is handled
+            with self._TransactionLock:
+                self._Transactions.append(transaction)
+        try:
+            if not acquired and not self._acquire(transaction):
+                return transaction
+            pipelined = self._BaseV3 and transaction.RequestAck
+            try:
+                data = self._encode(frame, transaction)
+                ahead = 0
+                if self._BaseV3 and transaction.Seq is not None:
+                    ahead = self._wait_for_window()
+                else:
+                    self._pace(len(data), transaction.RequestAck)
+                self._write_transaction(data, transaction)
+                if transaction.RequestAck and not pipelined:
+                    self._settle(transaction, max_wait)
+            finally:
+                self.Scheduler.release()
+            if pipelined:
+                # the frames ahead of it in the base go first
+                self._settle(transaction, max_wait*(1 + ahead))
+                deadline += ahead*max_wait/float(1000)
+            if transaction.ResponseEvent is not None and (transaction.Acked or not transaction.RequestAck):
+                transaction.ResponseEvent.wait(max(0, deadline - time.time()))
+        finally:
+            if transaction.ResponseEvent is not None:
+                with self._TransactionLock:
+                    self._Transactions.remove(transaction)
+        return transaction
+
+    def _acquire(self, transaction, key=None):
+        """
+        Waits for the Scheduler to give transaction its turn, marks it Stale if it doesn't
+        :return: bool, whether it got the turn
+        """
+        if key is None:
+            key = transaction.NodeID if self._SendFairness == 'node' else threading.current_thread().ident
+        if self.Scheduler.acquire(key, transaction.Priority, transaction.Deadline):
+            return True
+        logger.warning("Dropped " + str(transaction.Diction) + ", its deadline passed before its turn")
+        transaction.Stale = True
+        transaction.Acked = False
+        return False
+
+    def _write_transaction(self, data, transaction, flush=True):
+        """
+        Writes the encoded frame of transaction, or only queues it in the Writer if
+        not flush, the serial port must be held
+        """
+        if transaction.Seq is not None:
+            with self._TransactionLock:
+                self._AckTransactions[transaction.Seq] = transaction
+        transaction.SentTime = time.time()
+        if flush:
+            self.Writer.write(data)
+        else:
+            self.Writer.queue(data)
+        logger.debug("sent: %r   to the serial port", data)
+
+    def _wait_for_window(self):
+        """
+        Waits until the base has room for another frame, BaseSketch v3.0
+        queues BaseQueueLength of them
+        :return: int, the number of frames the base hasn't reported on yet
+        """
+        with self._WindowCondition:
+            while len(self._AckTransactions) >= BaseQueueLength:
+                timeout = self._expire_flow_tokens()
+                if len(self._AckTransactions) >= BaseQueueLength:
+                    self._WindowCondition.wait(timeout)
+            return len(self._AckTransactions)
+
+    def _expire_flow_tokens(self):
+        """
+        Forgets the frames without an ack request that the base hasn't reported on
+        within default_max_wait, nobody waits for their flow tokens so the ones that
+        don't come expire. _WindowCondition must be held
+        :return: float, seconds until the next one expires (None if none will)
+        """
+        timeout = None
+        expires = time.time() - self.default_max_wait/float(1000)
+        for seq, transaction in list(self._AckTransactions.items()):
+            if not transaction.RequestAck:
+                if transaction.SentTime < expires:
+                    logger.debug("No flow token came for " + str(transaction.Diction))
+                    del self._AckTransactions[seq]
+                elif timeout is None:
+                    timeout = transaction.SentTime - expires
+        return timeout
+
+    def _pace(self, length, request_ack=False):
+        """
+        Waits until the base has room for length more bytes when it doesn't tell
+        us (with flow tokens). Frames without an ack request are assumed to take
+        NoAckAirtime ms each to send and the ones it can't be done with yet must
+        fit in its serial buffer. A frame that requests an ack waits until the
+        base should be done with all of them, the report on it then comes in time.
+        :param length: int, bytes
+        :param request_ack: bool
+        """
+        wait = self._pace_wait(length, request_ack)
+        while wait:
+            time.sleep(wait)
+            wait = self._pace_wait(length, request_ack)
+
+    def _pace_wait(self, length, request_ack):
+        """
+        Returns how many seconds to wait before a frame fits in the base, see
+        _pace(), or 0 if it fits now (it is then counted as written)
+        :param length: int, bytes
+        :param request_ack: bool
+        :return: float
+        """
+        backlog = self._Backlog
+        limit = 0 if request_ack else BaseSerialBuffer - length
+        now = time.time()
+        while backlog and backlog[0][0] <= now:
+            backlog.popleft()
+        if backlog and sum(n for (_, n) in backlog) > limit:
+            return backlog[0][0] - now
+        if not request_ack:
+            start = max(now, backlog[-1][0]) if backlog else now
+            backlog.append((start + NoAckAirtime/float(1000), length))
+        return 0
+
+    def _settle(self, transaction, max_wait):
+        """
+        Waits (at most max_wait) for the base to report whether transaction was acked
+        """
+        if not transaction.AckEvent.wait(max_wait/float(1000)):
+            with self._TransactionLock:
+                if self._AckTransactions.get(transaction.Seq) is transaction:
+                    del self._AckTransactions[transaction.Seq]
+                    self._WindowCondition.notify_all()
+            if not transaction.AckEvent.is_set():
+                logger.warning("The base didn't report whether " + str(transaction.Diction) + " was acked")
+        if not transaction.Acked:
+            transaction.Acked = False
+
+    def _acked(self, node_id, seq=None):
+        """
+        Returns the transaction an ack report about node_id is for, if it is one of ours
+        :param seq: int, the seq the report has, BaseSketch v3.0 only
+        :return: _Transaction or None
+        """
+        with self._TransactionLock:
+            if seq is None:
+                # older bases report on the frames in the order they were written
+                transaction = next(iter(self._AckTransactions.values()), None)
+            else:
+                transaction = self._AckTransactions.get(seq)
+            if transaction is None or transaction.NodeID != node_id:
+                return None
+            del self._AckTransactions[transaction.Seq]
+            self._WindowCondition.notify_all()
+            return transaction
+
+    def _answer(self, node_id, d, payload=None):
+        """
+        Gives d, just received from node_id, to the first send waiting for it
+        :param payload: bytes, what node_id sent
+        :return: bool, True if it shouldn't go to the receive function
+        """
+        transaction = self._match(node_id, d)
+        return transaction is not None and transaction.Capture
+
+    def _match(self, node_id, d):
+        """
+        Resolves the first send waiting for d from node_id with it
+        :return: _Transaction or None
+        """
+        with self._TransactionLock:
+            for transaction in self._Transactions:
+                if transaction.matches(node_id, d):
+                    transaction.resolve_response(d)
+                    return transaction
+        return None
 
     def add_global_translation(self, part, *args):
         if part not in self.GlobalTranslations:
@@ -828,8 +2365,24 @@ class MoteinoNetwork(object):
         for node in self.nodes_list:
             if node is not self.Base:
                 node.add_translation(part, *args)
+        if self.PayloadCache is not None:
+            self.PayloadCache.clear()
         logger.debug("Global translation {t} added regarding {part}".format(t=args, part=part))
 
+    def _get_translation_table(self, return_type, translations):
+        """
+        Returns a TranslationTable for translations, nodes that share
+        translations (e.g. through add_global_translation) share the table
+        :param return_type: type
+        :param translations: dict
+        :return: TranslationTable
+        """
+        key = (return_type, frozenset(translations.items()))
+        table = self._TranslationTables.get(key)
+        if table is None:
+            table = self._TranslationTables[key] = TranslationTable(return_type, translations)
+        return table
+
     def _add_node(self, node):
         """
         A private method that adds node to the networks list of nodes
@@ -840,16 +2393,17 @@ class MoteinoNetwork(object):
         self.nodes[node.ID] = node
         self.nodes_list.append(node)
         if node.Name == "BaseMoteino":
-            logger.debug(str(node) + " added to the network")
+            logger.debug("%s added to the network", node)
         else:
-            logger.info(str(node) + " added to the network.")
+            logger.info("%s added to the network.", node)
 
         for part, args in list(self.GlobalTranslations.items()):
             node.add_translation(part, *args)
 
     def add_node(self, _id, structstring, name=None):
         """
-        This function defines a node on the network
+        This function defines a node on the network.
+        structstring can be None if the node only uses messages, see Node.add_message()
         :param name: str
         :param _id: int
         :param structstring: str
@@ -858,10 +2412,9 @@ class MoteinoNetwork(object):
         #     raise ValueError("Node ID can't be 255 (0xFF) because that " +
         #                      "is reserved for sending to all nodes at once")
 
-        for node in self.nodes_list:
-            if node.ID == _id:
-                raise ValueError("You just added a node that had the same ID"
-                                 " as " + node.Name)
+        if _id in self.nodes and self.nodes[_id].ID == _id:
+            raise ValueError("You just added a node that had the same ID"
+                             " as " + self.nodes[_id].Name)
 
         d = Node(network=self,
                  _id=_id,
@@ -908,6 +2461,217 @@ class MoteinoNetwork(object):
         else:
             raise ValueError("send2 must be string, int or Node but was " + str(type(send2)))
 
+    def _resolve_node(self, send2):
+        """
+        :param send2: Node, Message, name or ID
+        :return: (Node, Message or None)
+        """
+        if isinstance(send2, Message):
+            return send2.Node, send2
+        if isinstance(send2, Node):
+            return send2, None
+        if type(send2) is str or type(send2) is int:
+            if send2 not in self.nodes:
+                raise ValueError("Attempted to send to a node that had not been "
+                                 "properly declared, send2 was: {}".format(send2))
+            return self.nodes[send2], None
+        raise ValueError("send2 must be string, int, Node or Message but was " + str(type(send2)))
+
+    def send_async(self, send2, *args, **kwargs):
+        """
+        Sends without blocking. Takes the same arguments as send() (send2 can
+        also be one of a node's Messages) and returns a concurrent.futures.Future
+        that resolves to a SendResult(acked, rssi, rtt):
+
+            futures = [mynetwork.send_async(node, Command=1) for node in lights]
+            for future in concurrent.futures.as_completed(futures):
+                print(future.result().acked)
+
+        The sends wait in a heap, as many of them as there are, and are written
+        by the Sender's threads: with BaseSketch v3.0 one for each frame the base
+        can hold (BaseQueueLength) so that many are waiting for their acks at once,
+        with older bases one that waits for each ack (max_wait at most) before
+        the next one goes out. The most urgent one that is waiting goes next: the highest priority, then the
+        earliest deadline (counted from when send_async() was called), then the
+        one made first. A send whose deadline passes while it waits is dropped,
+        its result is not acked. The ack and no_ack functions are not called for
+        them. A send that is cancelled before its turn is never written.
+
+        :param send2: str, int, Node or Message
+        :return: concurrent.futures.Future
+        """
+        if Future is None:
+            raise ImportError("send_async() needs concurrent.futures, "
+                              "on Python 2 install it with: pip install futures")
+        node, message = self._resolve_node(send2)
+        priority = node._priority(kwargs)
+        if priority not in SendScheduler.Priorities:
+            raise ValueError("Unknown priority '{}', use one of {}".format(priority, SendScheduler.Priorities))
+        deadline = kwargs.get('deadline')
+        if deadline is not None:
+            deadline = time.time() + deadline/float(1000)
+        future = Future()
+        entry = (SendScheduler.Priorities.index(priority), float('inf') if deadline is None else deadline,
+                 next(self._AsyncOrder), (node, message, args, kwargs, priority, deadline, future))
+        with self._SenderLock:
+            if self._Sender is None:
+                self._Sender = Dispatcher(workers=BaseQueueLength if self._BaseV3 else 1,
+                                          max_queue=BaseQueueLength, name="moteinopy.Sender")
+            heapq.heappush(self._AsyncSends, entry)
+            # the jobs send until the heap is empty, so there only need to be enough
+            # of them waiting for every worker, and submitting one never blocks
+            wake = self._SenderWakeups < BaseQueueLength
+            if wake:
+                self._SenderWakeups += 1
+        if wake and not self._Sender.submit(self._send_next):
+            with self._SenderLock:
+                self._SenderWakeups -= 1
+                self._AsyncSends.remove(entry)
+                heapq.heapify(self._AsyncSends)
+            future.set_exception(RuntimeError("The network is shutting down"))
+        return future
+
+    def _send_next(self):
+        """
+        Writes the sends from send_async(), the most urgent first, and resolves
+        their futures until there are none left. The ones whose deadline has
+        passed are dropped on the way.
+        """
+        with self._SenderLock:
+            self._SenderWakeups -= 1
+        while True:
+            with self._SenderTurn:
+                # popped and queued for the serial port in the same order
+                with self._SenderLock:
+                    if not self._AsyncSends:
+                        return
+                    node, message, args, kwargs, priority, deadline, future = heapq.heappop(self._AsyncSends)[-1]
+                if not future.set_running_or_notify_cancel():
+                    continue  # cancelled
+                if deadline is not None and deadline < time.time():
+                    logger.warning("Dropped a send to {}, its deadline passed before its turn".format(node.Name))
+                    self.Scheduler.Stats[priority].Dropped += 1
+                    future.set_result(SendResult(False, None, None))
+                    continue
+                try:
+                    frame, max_wait, request_ack, diction = node._frame(message, args, kwargs)
+                    transaction = node._transaction(request_ack, diction, kwargs, callbacks=False)
+                    transaction.Deadline = deadline
+                    acquired = self._acquire(transaction)
+                except Exception as e:
+                    future.set_exception(e)
+                    continue
+            try:
+                if acquired:
+                    self._write2serial(frame, max_wait, transaction=transaction, acquired=True)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            future.set_result(transaction.result())
+
+    def send_many(self, sends, max_wait=None, priority=None, deadline=None):
+        """
+        Sends a batch, e.g. to set all the lights at once:
+
+            results = mynetwork.send_many([(light, {'Command': 1}) for light in lights])
+            failed = [node for (node, result) in results if not result.acked]
+
+        sends is a list of (send2, values) where send2 is anything send() takes (or
+        one of a node's Messages) and values is a dict of parts (send options like
+        request_ack can be in it too) or a list of them in order. Everything is
+        packed before anything is written (the seqs are added as the frames are
+        written) and then the frames are written back
+        to back while holding the serial port, so other threads wait until the
+        batch is done. The next frame is written while the base is still busy
+        sending the one before when it fits in the base's serial buffer (see
+        BaseSerialBuffer), or in its queue with BaseSketch v3.0 (see
+        BaseQueueLength), so the base doesn't wait for us in between. Frames
+        without an ack request are paced as with send().
+        The ack and no_ack functions are not called.
+
+        The batch takes its turn with the Scheduler as one send, with the given
+        priority and deadline (ms from now), and takes turns as the calling thread.
+        If the deadline passes first nothing is sent and every result is not acked.
+        Sends of a higher priority that come along in the meantime go out between
+        the frames of the batch.
+
+        :param sends: list of (str, int, Node or Message, dict or list)
+        :param max_wait: int, for each frame, default is each node's default
+        :param priority: str, see SendScheduler, default is network.default_priority
+        :param deadline: int
+        :return: list of (Node, SendResult), in the same order as sends
+        """
+        batch = list()
+        for send2, values in sends:
+            node, message = self._resolve_node(send2)
+            if isinstance(values, dict):
+                args, kwargs = (), dict(values)
+            else:
+                args, kwargs = tuple(values), dict()
+            if max_wait is not None:
+                kwargs.setdefault('max_wait', max_wait)
+            frame, wait, request_ack, diction = node._frame(message, args, kwargs)
+            if wait is None:
+                wait = self.default_max_wait
+            transaction = _Transaction(node.ID, request_ack, diction, callbacks=False)
+            batch.append((node, frame, wait, transaction))
+
+        turn = _Transaction(None, False, priority=priority or self.default_priority,
+                            deadline=None if deadline is None else time.time() + deadline/float(1000))
+        if not self._acquire(turn, key=threading.current_thread().ident):
+            for _, _, _, transaction in batch:
+                transaction.Stale = True
+            return [(node, transaction.result()) for node, _, _, transaction in batch]
+        try:
+            waiting = deque()  # (transaction, frame length, max_wait), not reported on yet
+            buffered = 0  # the first one waiting is being sent by the base, the rest are in its serial buffer
+            for node, frame, wait, transaction in batch:
+                if self.Scheduler.preempted(turn.Priority):
+                    # more urgent sends go first, the rest of the batch waits for another turn
+                    self.Writer.flush()
+                    while waiting:
+                        earlier, _, earlier_wait = waiting.popleft()
+                        self._settle(earlier, earlier_wait)
+                    buffered = 0
+                    self.Scheduler.release()
+                    self.Scheduler.acquire(threading.current_thread().ident, turn.Priority)
+                # the seq is picked now, with the turn, so no other send can have it
+                data = self._encode(frame, transaction)
+                if self._BaseV3 and transaction.Seq is not None:
+                    if len(self._AckTransactions) >= BaseQueueLength:
+                        self.Writer.flush()
+                        # let the base work through half of its queue, the frames that fit then are written together
+                        while waiting and len(self._AckTransactions) > BaseQueueLength//2:
+                            earlier, _, earlier_wait = waiting.popleft()
+                            self._settle(earlier, earlier_wait)
+                        self._wait_for_window()  # the rest are other threads' frames
+                else:
+                    if waiting and (not transaction.RequestAck or buffered + len(data) > BaseSerialBuffer):
+                        self.Writer.flush()
+                        # let the base work through half of its buffer, the frames that fit then are written together
+                        while waiting and (not transaction.RequestAck or buffered + len(data) > BaseSerialBuffer or
+                                           buffered > BaseSerialBuffer//2):
+                            earlier, _, earlier_wait = waiting.popleft()
+                            if waiting:
+                                buffered -= waiting[0][1]
+                            self._settle(earlier, earlier_wait)
+                    self._pace(len(data), transaction.RequestAck)
+                # the frames ahead of it in the base go first
+                ahead = len(self._AckTransactions)
+                # frames that fit are queued and written together when it is time to wait
+                self._write_transaction(data, transaction, flush=transaction.Seq is None)
+                if transaction.RequestAck:
+                    if waiting:
+                        buffered += len(data)
+                    waiting.append((transaction, len(data), wait*(1 + ahead)))
+            self.Writer.flush()
+            for transaction, _, wait in waiting:
+                self._settle(transaction, wait)
+        finally:
+            self.Scheduler.release()
+
+        return [(node, transaction.result()) for node, _, _, transaction in batch]
+
     def start_listening(self):  # starts a thread that listens to the serial port
         if not self._serial_listening_thread_is_active:
             self._serial_listening_thread = ListeningThread(network=self, listen2=self._Serial)
@@ -971,9 +2735,9 @@ def look_for_base(port, baudrate=115200, override_serial_lock=False):
         return False, "Base doesn't seem to be present on '{}'. " \
                       "nothing is being transmitted over the serial port".format(port)
 
-    stuff = s.read(s.in_waiting).split('\n')[0]
+    stuff = s.read(s.in_waiting).split(b'\n')[0]
 
-    if stuff.rstrip() == CorrectBaseSketchWakeupSign:
+    if stuff.rstrip() in BaseSketchVersions:
         return True, "Success, base is present on '{}'".format(port)
     else:
         return False, "Base doesn't seem present on '{}', " \
@@ -0,0 +1,412 @@
+"""
+Several bases, each on its own serial port (and usually its own network ID),
+run as one network:
+
+    network = MultiBaseNetwork([dict(port='/dev/ttyUSB0', name='house', network_id=1),
+                                dict(port='/dev/ttyUSB1', name='barn', network_id=2)])
+    light = network.add_node(10, "byte Command;", "light")
+    pump = network.add_node(20, "byte Command;", "pump", base='barn')
+    light.send(Command=1)
+    print(network.utilisation())
+
+Every base knows every node, so whatever any of them receives goes to the
+same receive functions, with a 'Base' entry saying which base heard it (a
+reply is given to the send_and_receive() waiting for it, through whichever
+base it was sent, and a record heard by two bases is only received once). A send
+goes through the node's own base, if it was given one, or else through the
+base that last heard the node best (by RSSI), bases that heard it about as
+well share the load.
+"""
+import threading
+import time
+import logging
+from collections import OrderedDict, namedtuple
+from moteinopy.moteino import MoteinoNetwork
+
+__author__ = 'SteinarrHrafn'
+
+logger = logging.getLogger(__name__)
+
+# How busy a base is, see MultiBaseNetwork.utilisation(). sends is the number of sends
+# routed through it and received the number of frames it received, bytes_per_second is
+# what was written to it and serial_load that as a share of what its serial port can
+# take, all since the counters were reset. queue_depth is the number of sends waiting
+# for it, or for its reports, right now.
+BaseUtilisation = namedtuple('BaseUtilisation', 'sends received bytes_per_second serial_load queue_depth')
+
+
+def _load(network):
+    """
+    The number of sends waiting for network's serial port or its reports
+    """
+    return network.Scheduler.QueueDepth + len(network._AckTransactions)
+
+
+class _BaseNetwork(MoteinoNetwork):
+    """
+    One of the bases of a MultiBaseNetwork, tells it what it hears
+    """
+    def __init__(self, manager, name, **kwargs):
+        self.Manager = manager
+        self.Name = name
+        self.Sends = 0
+        MoteinoNetwork.__init__(self, **kwargs)
+
+    def _answer(self, node_id, d, payload=None):
+        d['Base'] = self.Name
+        self.Manager._heard(self, node_id, d['RSSI'])
+        return self.Manager._answer(self, node_id, d, payload)
+
+
+class MultiNode(object):
+    """
+    A node of a MultiBaseNetwork. It has a Node on every base (Nodes, by the name
+    of the base) and sends through the one the network routes it to. Base is
+    the name of the base it always uses, None lets the network decide.
+    The receive functions get the Node of the base that heard it as 'Sender'.
+    """
+    def __init__(self, network, nodes, base=None):
+        self.Network = network
+        self.Nodes = OrderedDict(zip(network.Bases, nodes))
+        self.ID = nodes[0].ID
+        self.Name = nodes[0].Name
+        self.Base = base
+        self.Messages = dict()
+
+    def __str__(self):
+        return "MultiNode({name}) with id({i}) on {bases}".format(name=self.Name, i=self.ID,
+                                                                  bases=", ".join(self.Nodes))
+
+    def __repr__(self):
+        return self.__str__()
+
+    def _target(self):
+        """
+        :return: Node, on the base the send should go through
+        """
+        return self.Network._routed(self).nodes[self.ID]
+
+    def bind(self, receive=None, ack=None, no_ack=None):
+        """
+        See Node.bind(), binds the functions on every base
+        """
+        for node in self.Nodes.values():
+            node.bind(receive, ack, no_ack)
+
+    def add_translation(self, part, *args):
+        """
+        See Node.add_translation()
+        """
+        for node in self.Nodes.values():
+            node.add_translation(part, *args)
+
+    def add_message(self, type_id, structstring, name=None):
+        """
+        See Node.add_message()
+        :return: MultiMessage
+        """
+        message = MultiMessage(self, [node.add_message(type_id, structstring, name) for node in self.Nodes.values()])
+        self.Messages[message.Name] = message
+        return message
+
+    def send(self, *args, **kwargs):
+        """
+        See Node.send()
+        :return: bool
+        """
+        return self._target().send(*args, **kwargs)
+
+    def send_and_receive(self, *args, **kwargs):
+        """
+        See Node.send_and_receive()
+        :return: dict
+        """
+        return self._target().send_and_receive(*args, **kwargs)
+
+    def send_async(self, *args, **kwargs):
+        """
+        See Node.send_async()
+        :return: concurrent.futures.Future
+        """
+        return self._target().send_async(*args, **kwargs)
+
+
+class MultiMessage(object):
+    """
+    One of the messages of a MultiNode, see Node.add_message()
+    """
+    def __init__(self, node, messages):
+        self.Node = node
+        self.Messages = messages
+        self.TypeID = messages[0].TypeID
+        self.Name = messages[0].Name
+
+    def _target(self):
+        return self.Node._target().Messages[self.Name]
+
+    def bind(self, receive=None):
+        for message in self.Messages:
+            message.bind(receive)
+
+    def send(self, *args, **kwargs):
+        return self._target().send(*args, **kwargs)
+
+    def send_and_receive(self, *args, **kwargs):
+        return self._target().send_and_receive(*args, **kwargs)
+
+    def send_async(self, *args, **kwargs):
+        return self._target().send_async(*args, **kwargs)
+
+
+class MultiBaseNetwork(object):
+    """
+    Runs several bases as one network with one set of nodes. The arguments are:
+
+            bases - a list with a dict for each base, of the arguments MoteinoNetwork
+                    takes (port, network_id, base_id, ...) and a 'name' if the base
+                    should have another name than its port
+
+            rssi_margin - default is 3, in dB. Bases that heard a node within this
+                          of the best one share its sends, the least busy one
+                          (see utilisation()) takes the next one
+
+            heard_timeout - default is 600, in seconds. What a base heard longer
+                            ago than this doesn't count when routing. Sends to a node
+                            that no base has heard go through network.DefaultBase
+
+            duplicate_window - default is 100, in ms. When another base receives
+                               the same record from the same node within this it
+                               is not received again
+
+            anything else is passed on to every MoteinoNetwork, e.g. frequency
+
+    network.Bases has the MoteinoNetwork of each base, by its name.
+    """
+    def __init__(self, bases, rssi_margin=3, heard_timeout=600, duplicate_window=100, **kwargs):
+        """
+        :param bases: list of dicts
+        :param rssi_margin: int
+        :param heard_timeout: float
+        :param duplicate_window: int
+        """
+        if not bases:
+            raise ValueError("A MultiBaseNetwork needs at least one base")
+        self.RSSIMargin = rssi_margin
+        self.HeardTimeout = heard_timeout
+        self.DuplicateWindow = duplicate_window
+        self.Bases = OrderedDict()
+        self.nodes = dict()
+        self.nodes_list = list()
+        self._Heard = dict()  # node ID -> base name -> (rssi, time.time())
+        self._Recent = dict()  # node ID -> (base name, payload, time.time()) of the last frame received
+        self._Lock = threading.Lock()
+        try:
+            for base in bases:
+                options = dict(kwargs)
+                options.update(base)
+                name = options.pop('name', None) or str(options.get('port'))
+                if name in self.Bases:
+                    raise ValueError("There are two bases called '{}', give them names".format(name))
+                self.Bases[name] = _BaseNetwork(self, name, **options)
+        except Exception:
+            self.shut_down()
+            raise
+        self.DefaultBase = next(iter(self.Bases))
+
+    def __str__(self):
+        return "MultiBaseNetwork({} nodes)\n\t".format(len(self.nodes_list)) + \
+               "\n\t".join("{}: {}".format(name, utilisation) for name, utilisation in self.utilisation().items())
+
+    def shut_down(self):
+        for network in self.Bases.values():
+            network.shut_down()
+
+    def add_node(self, _id, structstring, name=None, base=None):
+        """
+        Adds a node to every base, see MoteinoNetwork.add_node()
+        :param _id: int
+        :param structstring: str
+        :param name: str
+        :param base: str, the name of the base that sends to it should always go through
+        :return: MultiNode
+        """
+        if base is not None and base not in self.Bases:
+            raise ValueError("There is no base called '{}', the bases are {}".format(base, list(self.Bases)))
+        if _id in self.nodes or (name is not None and name in self.nodes):
+            raise ValueError("You just added a node that had the same ID or name as " +
+                             self.nodes.get(_id, self.nodes.get(name)).Name)
+        node = MultiNode(self, [network.add_node(_id, structstring, name) for network in self.Bases.values()], base)
+        self.nodes[node.ID] = node
+        self.nodes[node.Name] = node
+        self.nodes_list.append(node)
+        return node
+
+    def add_global_translation(self, part, *args):
+        for network in self.Bases.values():
+            network.add_global_translation(part, *args)
+
+    def bind_default(self, receive=None, ack=None, no_ack=None):
+        """
+        See MoteinoNetwork.bind_default(), binds the functions on every base
+        """
+        for network in self.Bases.values():
+            network.bind_default(receive, ack, no_ack)
+
+    def _resolve(self, send2):
+        """
+        :param send2: MultiNode, MultiMessage, name or ID
+        :return: MultiNode or MultiMessage
+        """
+        if isinstance(send2, (MultiNode, MultiMessage)):
+            return send2
+        if type(send2) is str or type(send2) is int:
+            if send2 not in self.nodes:
+                raise ValueError("Attempted to send to a node that had not been "
+                                 "properly declared, send2 was: {}".format(send2))
+            return self.nodes[send2]
+        raise ValueError("send2 must be string, int, MultiNode or MultiMessage but was " + str(type(send2)))
+
+    def route(self, send2):
+        """
+        Returns the base that a send to send2 would go through now
+        :param send2: MultiNode, MultiMessage, name or ID
+        :return: MoteinoNetwork
+        """
+        node = self._resolve(send2)
+        if isinstance(node, MultiMessage):
+            node = node.Node
+        if node.Base is not None:
+            return self.Bases[node.Base]
+        now = time.time()
+        with self._Lock:
+            heard = [(rssi, name) for name, (rssi, t) in self._Heard.get(node.ID, dict()).items()
+                     if now - t < self.HeardTimeout]
+        if not heard:
+            return self.Bases[self.DefaultBase]
+        best = max(rssi for (rssi, _) in heard)
+        candidates = [self.Bases[name] for (rssi, name) in sorted(heard, reverse=True) if rssi >= best - self.RSSIMargin]
+        return min(candidates, key=_load)
+
+    def _routed(self, node):
+        """
+        route() for a send that is about to go out, counts it
+        """
+        network = self.route(node)
+        with self._Lock:
+            network.Sends += 1
+        return network
+
+    def send(self, send2, *args, **kwargs):
+        """
+        See MoteinoNetwork.send()
+        :return: bool
+        """
+        return self._resolve(send2).send(*args, **kwargs)
+
+    def send_and_receive(self, send2, *args, **kwargs):
+        """
+        See MoteinoNetwork.send_and_receive()
+        :return: dict
+        """
+        return self._resolve(send2).send_and_receive(*args, **kwargs)
+
+    def send_async(self, send2, *args, **kwargs):
+        """
+        See MoteinoNetwork.send_async()
+        :return: concurrent.futures.Future
+        """
+        return self._resolve(send2).send_async(*args, **kwargs)
+
+    def send_many(self, sends, **kwargs):
+        """
+        See MoteinoNetwork.send_many(), the sends are divided between the bases
+        they are routed to, which send their shares at the same time
+        :return: list of (MultiNode, SendResult), in the same order as sends
+        """
+        shares = OrderedDict()
+        for i, (send2, values) in enumerate(sends):
+            target = self._resolve(send2)
+            node = target.Node if isinstance(target, MultiMessage) else target
+            network = self._routed(node)
+            send2 = network.nodes[node.ID]
+            if isinstance(target, MultiMessage):
+                send2 = send2.Messages[target.Name]
+            shares.setdefault(network, list()).append((i, send2, values))
+
+        results = [None]*len(sends)
+        errors = list()
+
+        def send_share(network, share):
+            try:
+                sent = network.send_many([(send2, values) for (_, send2, values) in share], **kwargs)
+                for (i, _, _), (node, result) in zip(share, sent):
+                    results[i] = (self.nodes[node.ID], result)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=send_share, args=item, name="moteinopy.MultiBase.send_many")
+                   for item in shares.items()]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return results
+
+    def utilisation(self):
+        """
+        :return: OrderedDict, base name -> BaseUtilisation
+        """
+        returner = OrderedDict()
+        for name, network in self.Bases.items():
+            writer = network.Writer
+            capacity = network.BaudRate/10.  # bytes per second, 8 bits and a start and a stop bit each
+            returner[name] = BaseUtilisation(network.Sends, network._Protocol.Frames, writer.BytesPerSecond,
+                                             writer.BytesPerSecond/capacity, _load(network))
+        return returner
+
+    def reset_counters(self):
+        for network in self.Bases.values():
+            network.Sends = 0
+            network._Protocol.Frames = 0
+            network.Writer.reset_counters()
+
+    def _heard(self, network, node_id, rssi):
+        with self._Lock:
+            self._Heard.setdefault(node_id, dict())[network.Name] = (rssi, time.time())
+
+    def _answer(self, network, node_id, d, payload):
+        """
+        Gives d, which network just received from node_id, to the first send waiting
+        for it on any base (a reply can be heard by another base than the one the
+        send went through), unless another base just received it
+        :param payload: bytes, what node_id sent
+        :return: bool, True if it shouldn't go to the receive function
+        """
+        if self._duplicate(network, node_id, payload):
+            return True
+        for base in [network] + [base for base in self.Bases.values() if base is not network]:
+            transaction = base._match(node_id, d)
+            if transaction is not None:
+                return transaction.Capture
+        return False
+
+    def _duplicate(self, network, node_id, payload):
+        """
+        Whether payload, which network just received from node_id, was just received by another base
+        :return: bool
+        """
+        if payload is None:
+            return False
+        payload = bytes(payload)
+        now = time.time()
+        with self._Lock:
+            recent = self._Recent.get(node_id)
+            self._Recent[node_id] = (network.Name, payload, now)
+        if recent is None or recent[0] == network.Name or recent[1] != payload:
+            return False
+        if now - recent[2] > self.DuplicateWindow/1000.:
+            return False
+        logger.debug("%s also heard %r from node %s", network.Name, payload, node_id)
+        return True
@@ -0,0 +1,216 @@
+"""
+Decides whose turn it is to use the serial port, instead of whichever thread
+happens to grab a lock first, so that an alarm doesn't wait behind a bulk
+configuration push.
+"""
+import threading
+import time
+import logging
+from collections import OrderedDict, deque
+
+__author__ = 'SteinarrHrafn'
+
+logger = logging.getLogger(__name__)
+
+
+class WaitStats(object):
+    """
+    How long the sends of one priority class waited for their turn, in ms
+    """
+    def __init__(self, priority):
+        self.Priority = priority
+        self.Sent = 0
+        self.Dropped = 0
+        self.TotalWait = 0.
+        self.MaxWait = 0.
+
+    @property
+    def MeanWait(self):
+        return self.TotalWait/self.Sent if self.Sent else 0.
+
+    def record(self, wait):
+        self.Sent += 1
+        self.TotalWait += wait
+        self.MaxWait = max(self.MaxWait, wait)
+
+    def __str__(self):
+        return "{}: {} sent, {} dropped, waited {:.1f} ms on average and {:.1f} ms at most" \
+               "".format(self.Priority, self.Sent, self.Dropped, self.MeanWait, self.MaxWait)
+
+
+class _Turn(object):
+    """
+    A send waiting for its turn, a thread waiting on Condition in acquire()
+    or, from request(), a callback
+    """
+    def __init__(self, lock, key, priority, deadline, callback=None):
+        self.Condition = threading.Condition(lock)
+        self.Key = key
+        self.Priority = priority
+        self.Deadline = deadline
+        self.Callback = callback
+        self.Start = time.time()
+        self.Granted = False
+        self.Dropped = False
+
+
+class SendScheduler(object):
+    """
+    Gives the serial port to one send at a time, acquire() waits for the turn
+    and release() hands the port to the next one:
+
+        - sends of a higher priority class ('high', then 'normal', then 'low')
+          always go first
+
+        - within a class the keys (the network uses node IDs, or the sending
+          threads, see MoteinoNetwork's send_fairness) take turns, so one node
+          or caller with a lot to send doesn't hold up the others
+
+        - a send that is still waiting when its deadline passes is dropped
+
+    Stats has a WaitStats for each class. Callers that can't block (coroutines)
+    use request() and cancel() instead of acquire().
+    """
+    HIGH = 'high'
+    NORMAL = 'normal'
+    LOW = 'low'
+    Priorities = (HIGH, NORMAL, LOW)
+
+    def __init__(self):
+        self._Lock = threading.Lock()
+        self._Busy = False
+        # priority -> key -> the turns waiting under that key, the keys take turns in order
+        self._Waiting = dict((priority, OrderedDict()) for priority in self.Priorities)
+        self.Stats = OrderedDict((priority, WaitStats(priority)) for priority in self.Priorities)
+
+    @property
+    def QueueDepth(self):
+        return sum(len(turns) for keys in self._Waiting.values() for turns in keys.values())
+
+    def preempted(self, priority):
+        """
+        Whether sends of a higher priority class are waiting, something that
+        holds the serial port for a long time should release it then
+        :param priority: str
+        :return: bool
+        """
+        for higher in self.Priorities[:self.Priorities.index(priority)]:
+            if self._Waiting[higher]:
+                return True
+        return False
+
+    def acquire(self, key=None, priority=NORMAL, deadline=None):
+        """
+        Waits for the turn to use the serial port
+        :param key: the node ID or the caller, whatever takes turns
+        :param priority: str, one of SendScheduler.Priorities
+        :param deadline: float, a time.time() after which the send is dropped
+        :return: bool, False if the send was dropped
+        """
+        if priority not in self._Waiting:
+            raise ValueError("Unknown priority '{}', use one of {}".format(priority, self.Priorities))
+        stats = self.Stats[priority]
+        start = time.time()
+        with self._Lock:
+            if not self._Busy:
+                self._Busy = True
+                stats.record(0.)
+                return True
+            turn = _Turn(self._Lock, key, priority, deadline)
+            self._queue(turn)
+            while not turn.Granted and not turn.Dropped:
+                timeout = None
+                if deadline is not None:
+                    timeout = deadline - time.time()
+                    if timeout <= 0:
+                        self._unqueue(turn)
+                        turn.Dropped = True
+                        break
+                turn.Condition.wait(timeout)
+            if turn.Dropped:
+                stats.Dropped += 1
+                return False
+            stats.record((time.time() - start)*1000)
+            return True
+
+    def request(self, callback, key=None, priority=NORMAL, deadline=None):
+        """
+        acquire() without waiting. If the serial port is free the returned turn is
+        Granted right away, otherwise callback(granted) is called when the turn
+        comes (True) or the send is dropped because its deadline passed (False).
+        It is called by whoever releases the port, with the scheduler's lock
+        held, so it must be quick. A turn that is still waiting can be cancel()ed.
+        :param callback: function
+        :return: _Turn
+        """
+        if priority not in self._Waiting:
+            raise ValueError("Unknown priority '{}', use one of {}".format(priority, self.Priorities))
+        with self._Lock:
+            turn = _Turn(self._Lock, key, priority, deadline, callback)
+            if not self._Busy:
+                self._Busy = True
+                turn.Granted = True
+                self.Stats[priority].record(0.)
+            else:
+                self._queue(turn)
+            return turn
+
+    def cancel(self, turn):
+        """
+        Stops a turn from request() from waiting, e.g. when its deadline passes
+        :return: bool, False if it was granted or dropped already
+        """
+        with self._Lock:
+            if turn.Granted or turn.Dropped:
+                return False
+            self._unqueue(turn)
+            turn.Dropped = True
+            self.Stats[turn.Priority].Dropped += 1
+            return True
+
+    def _queue(self, turn):
+        keys = self._Waiting[turn.Priority]
+        if turn.Key not in keys:
+            keys[turn.Key] = deque()
+        keys[turn.Key].append(turn)
+
+    def _unqueue(self, turn):
+        keys = self._Waiting[turn.Priority]
+        keys[turn.Key].remove(turn)
+        if not keys[turn.Key]:
+            del keys[turn.Key]
+
+    def release(self):
+        """
+        Gives the serial port to the next send
+        """
+        with self._Lock:
+            now = time.time()
+            for priority in self.Priorities:
+                keys = self._Waiting[priority]
+                while keys:
+                    key = next(iter(keys))
+                    turns = keys.pop(key)
+                    turn = turns.popleft()
+                    if turns:
+                        keys[key] = turns  # to the back of the line
+                    if turn.Deadline is not None and turn.Deadline < now:
+                        turn.Dropped = True
+                        if turn.Callback is None:
+                            turn.Condition.notify()
+                        else:
+                            self.Stats[priority].Dropped += 1
+                            turn.Callback(False)
+                        continue
+                    turn.Granted = True
+                    if turn.Callback is None:
+                        turn.Condition.notify()
+                    else:
+                        self.Stats[priority].record((now - turn.Start)*1000)
+                        turn.Callback(True)
+                    return
+            self._Busy = False
+
+    def __str__(self):
+        return "SendScheduler({} waiting)\n\t".format(self.QueueDepth) + \
+               "\n\t".join(str(stats) for stats in self.Stats.values())
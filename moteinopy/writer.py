@@ -0,0 +1,106 @@
+"""
+Writes frames to the serial port through a buffer that is allocated once and
+reused. Frames can be queued and then written together with a single write()
+call, which is what MoteinoNetwork.send_many() does while the base has room
+for them, and the writer counts the bytes and write() calls so the effect
+can be seen.
+"""
+import threading
+import time
+import logging
+
+__author__ = 'SteinarrHrafn'
+
+logger = logging.getLogger(__name__)
+
+
+class SerialWriter(object):
+    """
+    Everything written to the base goes through here (except while it is being
+    initiated), frames are ready to write bytes from the network's protocol.
+
+    Counters: Frames, BytesWritten and Writes (calls to the serial port's write()),
+    BytesPerSecond and WritesPerSecond are averages since the writer was made
+    or reset_counters() was called.
+    """
+    def __init__(self, port, size=512):
+        """
+        :param port: MySerial or FakeSerial
+        :param size: int, bytes, larger frames are written on their own
+        """
+        self.Port = port
+        self._Buffer = bytearray(size)
+        self._View = memoryview(self._Buffer)
+        self._Length = 0
+        self._Lock = threading.Lock()
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.Frames = 0
+        self.BytesWritten = 0
+        self.Writes = 0
+        self.Since = time.time()
+
+    @property
+    def BytesPerSecond(self):
+        return self.BytesWritten/max(time.time() - self.Since, 1e-6)
+
+    @property
+    def WritesPerSecond(self):
+        return self.Writes/max(time.time() - self.Since, 1e-6)
+
+    @property
+    def Queued(self):
+        """
+        The number of bytes waiting for flush()
+        """
+        return self._Length
+
+    def queue(self, frame):
+        """
+        Puts frame in the buffer, to be written with the next flush()
+        :param frame: bytes
+        """
+        with self._Lock:
+            self._queue(frame)
+
+    def flush(self):
+        """
+        Writes everything that has been queued with one write()
+        """
+        with self._Lock:
+            self._flush()
+
+    def write(self, frame):
+        """
+        Writes frame, together with anything that has been queued
+        :param frame: bytes
+        """
+        with self._Lock:
+            self._queue(frame)
+            self._flush()
+
+    def _queue(self, frame):
+        n = len(frame)
+        self.Frames += 1
+        if self._Length + n > len(self._Buffer):
+            self._flush()
+            if n > len(self._Buffer):
+                self._write(frame)
+                return
+        self._Buffer[self._Length:self._Length + n] = frame
+        self._Length += n
+
+    def _flush(self):
+        if self._Length:
+            self._write(self._View[:self._Length])
+            self._Length = 0
+
+    def _write(self, data):
+        self.Port.write(data)
+        self.Writes += 1
+        self.BytesWritten += len(data)
+
+    def __str__(self):
+        return "SerialWriter({} frames, {} bytes in {} writes, {:.0f} bytes/s, {:.1f} writes/s)" \
+               "".format(self.Frames, self.BytesWritten, self.Writes, self.BytesPerSecond, self.WritesPerSecond)
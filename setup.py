@@ -95,6 +95,7 @@ if __name__ == '__main__':
         # $ pip install -e .[dev,test]
         extras_require={
             'dev': [],
+            'numpy': ['numpy'],
             'test': [],
         },
 